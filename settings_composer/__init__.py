@@ -1,6 +1,10 @@
+import os
+import sys
+
+from . import environment
 from .manager import ACTION_NAMES, SettingsManager
 
-__all__ = ACTION_NAMES
+__all__ = list(ACTION_NAMES)
 
 
 settings_manager = SettingsManager()
@@ -23,6 +27,76 @@ def load(*module_names):
     )
 
 
+def load_if(condition, *module_names):
+    """
+    Load one or more modules only if condition(settings) is true. The
+    condition is called with the settings composed so far, at the point the
+    modules would be loaded, so modules that aren't needed are never imported.
+    """
+    settings_manager.add_action(
+        'load',
+        module_names=module_names,
+        condition=condition
+    )
+
+
+def load_for_role(role_names, *module_names):
+    """
+    Load one or more modules only in processes running one of the named roles
+    (such as 'web', 'worker' or 'cron'), as set by SETTINGS_COMPOSER_ROLE.
+    Processes without a role load them regardless.
+    """
+    load_if(has_role(role_names), *module_names)
+
+
+def has_role(role_names):
+    """
+    Return a condition for load_if which is true if the current process is
+    running one of the named roles, or has no role.
+    """
+    if hasattr(role_names, 'split'):  # A single role name
+        role_names = [role_names]
+    role_names = frozenset(role_names)
+
+    def condition(settings):
+        role_name = environment.get_role_name()
+        return not role_name or role_name in role_names
+    condition.__name__ = 'has_role({0})'.format(', '.join(sorted(role_names)))
+    return condition
+
+
+def load_file(*paths):
+    """
+    Load one or more JSON, TOML or dotenv files and apply settings from them.
+    Relative paths are relative to the module calling this function. Files are
+    loaded in the same way (and at the same point) as modules.
+    """
+    directory = os.path.dirname(sys._getframe(1).f_globals.get('__file__', ''))
+    settings_manager.add_action(
+        'load',
+        file_paths=tuple(os.path.join(directory, path) for path in paths)
+    )
+
+
+def load_store(store_name, *setting_names, **options):
+    """
+    Load one or more settings from a key-value store registered with
+    settings_composer.stores.register_store. Each setting is read from the key
+    of the same name, with an optional prefix (such as 'sites/site_1/').
+    Settings missing from the store are left as they are.
+    """
+    prefix = options.pop('prefix', '')
+    if options:
+        raise TypeError(
+            "load_store() got an unexpected keyword argument '{0}'".format(sorted(options)[0])
+        )
+    settings_manager.add_action(
+        'load',
+        store_name=store_name,
+        store_keys=tuple((name, prefix + name) for name in setting_names)
+    )
+
+
 def set(**settings):
     """
     Apply keyword settings directly (useful within function scope). Can also be
@@ -91,15 +165,68 @@ def exclude_from_setting(setting_name, items):
     )
 
 
-def clean(function):
+def clean(function, reads=None, writes=None):
     """
     Execute a function after all primary modules have been loaded. The function
     must take the current settings dictionary as an argument.
 
     Use this to perform clean-up actions or logic-based decisions, such as
     checking whether DEBUG is turned on once all settings have been loaded.
+
+    Functions that declare the names of the settings they read and those their
+    actions write can be run concurrently with other such functions they don't
+    conflict with, if SETTINGS_COMPOSER_CLEAN_THREADS is set. They are then
+    passed a read-only view of just the settings they read.
     """
-    settings_manager.add_action(
-        'clean',
-        function=function
+    kwargs = {'function': function}
+    if reads is not None or writes is not None:
+        kwargs.update(reads=tuple(reads or ()), writes=tuple(writes or ()))
+    settings_manager.add_action('clean', **kwargs)
+
+
+def merge_strategy(setting_name, strategy):
+    """
+    Choose how a setting is combined with values passed to extend_setting,
+    update_setting and exclude_from_setting. The strategy can be the name of a
+    built-in strategy ('default', 'ordered_set' or 'deep_merge'), the name of
+    a registered strategy, or a MergeStrategy instance. Unlike the actions
+    above, this takes effect immediately.
+    """
+    settings_manager.set_merge_strategy(setting_name, strategy)
+
+
+def schema(**rules):
+    """
+    Declare what valid values of settings look like, using
+    settings_composer.validation.Setting. Every rule is checked once all of
+    the settings have been composed, and all invalid settings are reported
+    together.
+    """
+    settings_manager.add_schema(rules)
+
+
+# These functions operate on settings that have already been composed, such as
+# the settings dictionary passed to collect_settings, or django.conf.settings.
+
+def apply_runtime_switch(target_settings, group_name, switch_name):
+    """
+    Apply a switch to composed settings without recomposing them. Only the
+    settings the switch changes are touched, and their sources are updated.
+    """
+    return settings_manager.apply_runtime_switch(
+        target_settings,
+        group_name,
+        switch_name
+    )
+
+
+def revert_runtime_switch(target_settings, group_name, switch_name):
+    """
+    Revert the most recent application of a switch, restoring the settings it
+    changed to their prior values and sources.
+    """
+    return settings_manager.revert_runtime_switch(
+        target_settings,
+        group_name,
+        switch_name
     )
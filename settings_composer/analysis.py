@@ -0,0 +1,737 @@
+import ast
+import json
+import os
+import sys
+
+from collections import namedtuple
+
+from .files import FILE_PARSERS
+from .manager import ACTION_NAMES
+
+
+Issue = namedtuple('Issue', ['kind', 'module_name', 'lineno', 'message'])
+
+
+# Actions which take the name of an existing setting as their first argument
+MODIFYING_ACTION_NAMES = ('extend_setting', 'update_setting', 'exclude_from_setting')
+
+# Functions which load modules only under some condition. Their first
+# argument is the condition, which can't be evaluated statically, so the
+# modules are assumed to be loaded
+CONDITIONAL_LOAD_NAMES = ('load_if', 'load_for_role')
+
+# Functions other than actions whose calls are recorded
+FUNCTION_NAMES = CONDITIONAL_LOAD_NAMES + ('load_file',)
+
+# The order in which actions are processed once a module has been loaded
+STANDARD_ACTION_NAMES = (
+    'set',
+    'create_switch',
+    'apply_switch',
+    'extend_setting',
+    'update_setting',
+    'exclude_from_setting',
+)
+
+
+def _literal(node):
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, SyntaxError, TypeError):
+        return None
+
+
+def _is_string(value):
+    try:
+        return isinstance(value, basestring)
+    except NameError:
+        return isinstance(value, str)
+
+
+def find_module_file(module_name, search_path=None):
+    """
+    Locate the source file of a module without importing it (or any of its
+    parent packages).
+    """
+    parts = module_name.split('.')
+    for path_entry in search_path or sys.path:
+        base = os.path.join(path_entry or os.curdir, *parts)
+        for candidate in (os.path.join(base, '__init__.py'), base + '.py'):
+            if os.path.isfile(candidate):
+                return os.path.abspath(candidate)
+    return None
+
+
+def get_root_dir(module_name, file_path):
+    """
+    Return the directory a module is imported from (the sys.path entry it
+    was found in), given the module's file.
+    """
+    root_dir = os.path.dirname(file_path)
+    parts = module_name.split('.')
+    if os.path.basename(file_path) != '__init__.py':
+        parts = parts[:-1]
+    for part in parts:
+        root_dir = os.path.dirname(root_dir)
+    return root_dir
+
+
+def iter_package_modules(package_name, package_file):
+    """
+    Yield the name and file of every module within a package, including the
+    package itself.
+    """
+    package_dir = os.path.dirname(package_file)
+    for dir_path, dir_names, file_names in os.walk(package_dir):
+        dir_names[:] = sorted(
+            name for name in dir_names
+            if os.path.isfile(os.path.join(dir_path, name, '__init__.py'))
+        )
+        relative_parts = os.path.relpath(dir_path, package_dir).split(os.sep)
+        relative_parts = [part for part in relative_parts if part != os.curdir]
+        for file_name in sorted(file_names):
+            if not file_name.endswith('.py'):
+                continue
+            parts = [package_name] + relative_parts
+            if file_name != '__init__.py':
+                parts.append(file_name[:-3])
+            yield '.'.join(parts), os.path.join(dir_path, file_name)
+
+
+def iter_subpackage_names(package_file, subpackage_name):
+    """
+    Yield the names of the modules directly within a subpackage (such as
+    'env' or 'sites').
+    """
+    subpackage_dir = os.path.join(os.path.dirname(package_file), subpackage_name)
+    if not os.path.isdir(subpackage_dir):
+        return
+    for name in sorted(os.listdir(subpackage_dir)):
+        path = os.path.join(subpackage_dir, name)
+        if name.endswith('.py') and name != '__init__.py':
+            yield name[:-3]
+        elif os.path.isfile(os.path.join(path, '__init__.py')):
+            yield name
+
+
+class ModuleAnalyser(ast.NodeVisitor):
+    """
+    Collects the uppercase assignments and settings composer actions from the
+    syntax tree of a single settings module. Actions called from within a
+    function are marked as deferred, as they can only run as (or from) a clean
+    action.
+    """
+
+    def __init__(self, module_name, is_package):
+        self.package_name = module_name if is_package else module_name.rpartition('.')[0]
+        self.composer_names = set()  # Names bound to the settings_composer module
+        self.action_names = {}  # Names bound directly to action functions
+        self.function_depth = 0
+        self.summary = {
+            'assignments': [],
+            'star_imports': [],
+            'imports': [],  # Modules (or names within modules) imported normally
+            'calls': [],
+            'dynamic_calls': [],  # Lines of loads and switches with runtime targets
+            'is_empty': True,
+        }
+
+    def analyse(self, tree):
+        self.summary['is_empty'] = not any(
+            not (isinstance(node, ast.Expr) and _is_string(_literal(node.value)))
+            for node in tree.body
+        )
+        self.visit(tree)
+        return self.summary
+
+    # Imports
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            if alias.name == 'settings_composer':
+                self.composer_names.add(alias.asname or alias.name)
+            self.summary['imports'].append(alias.name)
+
+    def visit_ImportFrom(self, node):
+        module_name = node.module or ''
+        if node.level:
+            base = self.package_name.split('.')
+            if node.level > 1:
+                base = base[:-(node.level - 1)]
+            module_name = '.'.join([part for part in base + [module_name] if part])
+        self.summary['imports'].append(module_name)
+        for alias in node.names:
+            if alias.name != '*':
+                # Could be a submodule as well as a name within the module
+                self.summary['imports'].append('{0}.{1}'.format(module_name, alias.name))
+            if alias.name == '*':
+                if self.function_depth == 0:
+                    self.summary['star_imports'].append(module_name)
+            elif module_name == 'settings_composer' and (
+                    alias.name in ACTION_NAMES or alias.name in FUNCTION_NAMES):
+                self.action_names[alias.asname or alias.name] = alias.name
+
+    # Definitions
+
+    def visit_FunctionDef(self, node):
+        self.function_depth += 1
+        self.generic_visit(node)
+        self.function_depth -= 1
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+    visit_Lambda = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        # Class bodies do not contribute settings
+        self.function_depth += 1
+        self.generic_visit(node)
+        self.function_depth -= 1
+
+    def visit_Assign(self, node):
+        if self.function_depth == 0:
+            for target in node.targets:
+                self.add_assignment_target(target)
+        self.generic_visit(node)
+
+    def visit_AnnAssign(self, node):
+        if self.function_depth == 0 and node.value is not None:
+            self.add_assignment_target(node.target)
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node):
+        if self.function_depth == 0:
+            self.add_assignment_target(node.target)
+        self.generic_visit(node)
+
+    def add_assignment_target(self, target):
+        if isinstance(target, ast.Name) and target.id.isupper():
+            self.summary['assignments'].append(target.id)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                self.add_assignment_target(element)
+
+    # Actions
+
+    def get_action_name(self, func):
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+            if func.value.id in self.composer_names and (
+                    func.attr in ACTION_NAMES or func.attr in FUNCTION_NAMES):
+                return func.attr
+        elif isinstance(func, ast.Name):
+            return self.action_names.get(func.id)
+        return None
+
+    def visit_Call(self, node):
+        action_name = self.get_action_name(node.func)
+        if action_name is not None:
+            if action_name in CONDITIONAL_LOAD_NAMES:
+                call = self.get_call_details('load', node, first_arg=1)
+                action_name = 'load'
+                if self.has_dynamic_target(action_name, node, first_arg=1):
+                    self.summary['dynamic_calls'].append(node.lineno)
+            else:
+                call = self.get_call_details(action_name, node)
+                if self.has_dynamic_target(action_name, node):
+                    self.summary['dynamic_calls'].append(node.lineno)
+            if call is not None:
+                call['action'] = action_name
+                call['lineno'] = node.lineno
+                call['deferred'] = self.function_depth > 0
+                self.summary['calls'].append(call)
+        self.generic_visit(node)
+
+    def has_dynamic_target(self, action_name, node, first_arg=0):
+        """
+        Return whether a call loads a module or file, or defines a module
+        switch, that can only be determined at runtime.
+        """
+        if action_name in ('load', 'load_file'):
+            return any(not _is_string(_literal(arg)) for arg in node.args[first_arg:])
+        if action_name == 'create_switch':
+            args = list(node.args)
+            for index, name in enumerate(('group_name', 'switch_name', 'module_or_settings')):
+                for keyword in node.keywords:
+                    if keyword.arg == name and len(args) <= index:
+                        args.append(keyword.value)
+            if len(args) > 2 and isinstance(args[2], ast.Dict):
+                return False  # Settings, rather than a module
+            return any(not _is_string(_literal(arg)) for arg in args[:3])
+        return False
+
+    def get_call_details(self, action_name, node, first_arg=0):
+        """
+        Extract the statically known arguments of an action call. Calls with
+        arguments that can only be determined at runtime are ignored.
+        """
+        args = [_literal(arg) for arg in node.args[first_arg:]]
+        keywords = dict(
+            (keyword.arg, keyword.value) for keyword in node.keywords if keyword.arg
+        )
+        if action_name == 'load':
+            module_names = [arg for arg in args if _is_string(arg)]
+            return {'module_names': module_names} if module_names else None
+        if action_name == 'load_file':
+            paths = [arg for arg in args if _is_string(arg)]
+            return {'paths': paths} if paths else None
+        if action_name == 'set':
+            return {'setting_names': sorted(keywords)} if keywords else None
+        if action_name in ('create_switch', 'apply_switch'):
+            for index, name in enumerate(('group_name', 'switch_name', 'module_or_settings')):
+                if name in keywords and len(args) <= index:
+                    args.append(_literal(keywords[name]))
+            if len(args) < 2 or not (_is_string(args[0]) and _is_string(args[1])):
+                return None
+            details = {'group_name': args[0], 'switch_name': args[1]}
+            if action_name == 'create_switch':
+                definition = args[2] if len(args) > 2 else None
+                if _is_string(definition):
+                    details['switch_module_name'] = definition
+                    details['setting_names'] = []
+                elif isinstance(definition, dict):
+                    details['switch_module_name'] = None
+                    details['setting_names'] = sorted(definition)
+                else:
+                    details['switch_module_name'] = None
+                    details['setting_names'] = None  # Not statically known
+            return details
+        if action_name in MODIFYING_ACTION_NAMES:
+            setting_name = args[0] if args else _literal(keywords.get('setting_name'))
+            return {'setting_name': setting_name} if _is_string(setting_name) else None
+        return None
+
+
+class AnalysisCache(object):
+    """
+    Caches the analysis of each file against its modification time and size,
+    optionally persisting it to disk so that re-runs only parse changed files.
+    """
+
+    VERSION = 5
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.changed = False
+        if path and os.path.isfile(path):
+            try:
+                with open(path) as cache_file:
+                    data = json.load(cache_file)
+            except (IOError, OSError, ValueError):
+                data = {}
+            if data.get('version') == self.VERSION:
+                self.entries = data.get('entries', {})
+
+    def get_summary(self, module_name, file_path):
+        stat = os.stat(file_path)
+        key = [stat.st_mtime, stat.st_size, module_name]
+        entry = self.entries.get(file_path)
+        if entry is not None and entry['key'] == key:
+            return entry['summary']
+        with open(file_path) as source_file:
+            source = source_file.read()
+        tree = ast.parse(source, file_path)
+        summary = ModuleAnalyser(
+            module_name,
+            os.path.basename(file_path) == '__init__.py'
+        ).analyse(tree)
+        self.entries[file_path] = {'key': key, 'summary': summary}
+        self.changed = True
+        return summary
+
+    def save(self):
+        if self.path and self.changed:
+            with open(self.path, 'w') as cache_file:
+                json.dump({'version': self.VERSION, 'entries': self.entries}, cache_file)
+            self.changed = False
+
+
+class PermutationChecker(object):
+    """
+    Walks the modules reached by a single permutation in (approximately) the
+    order the settings manager would apply them, recording problems.
+    """
+
+    def __init__(self, analyser):
+        self.analyser = analyser
+        self.defined_settings = set()
+        self.definitions = {}
+        self.reached_modules = set()
+        self.deferred_calls = []
+        self.issues = []
+        # (referring module name, module name, how it was reached)
+        self.edges = set()
+        # Modules that load modules (or define module switches) that can only
+        # be determined at runtime
+        self.dynamic_modules = set()
+
+    def check(self, module_names):
+        for module_name in module_names:
+            self.run_tasks([(self.visit_module, (module_name,))])
+        self.process_deferred_calls()
+        return self.issues
+
+    def process_deferred_calls(self):
+        while self.deferred_calls:
+            module_name, calls, path = self.deferred_calls.pop(0)
+            self.run_tasks(self.process_calls(module_name, calls, path, deferred=True))
+
+    def add_issue(self, kind, module_name, lineno, message):
+        self.issues.append(Issue(kind, module_name, lineno, message))
+
+    # As in the settings manager, modules are walked with an explicit stack
+    # of (method, args) tasks rather than by recursing, so that deep trees
+    # are checked in constant Python stack space. Each task carries the path
+    # of modules that led to it, so that cyclic loads can be reported.
+
+    def run_tasks(self, tasks):
+        work_stack = list(reversed(tasks))
+        while work_stack:
+            method, args = work_stack.pop()
+            tasks = method(*args)
+            if tasks:
+                work_stack.extend(reversed(tasks))
+
+    def get_visit_tasks(self, module_name, referrer, kind, lineno, path):
+        if module_name in path:
+            self.edges.add((referrer, module_name, kind))
+            self.add_issue(
+                'cyclic_load',
+                referrer,
+                lineno,
+                "Loading {module_name} would load it again ({cycle})".format(
+                    module_name=module_name,
+                    cycle=' -> '.join(path[path.index(module_name):] + (module_name,))
+                )
+            )
+            return []
+        return [(self.visit_module, (module_name, referrer, kind, path))]
+
+    def visit_module(self, module_name, referrer=None, kind='root', path=()):
+        self.edges.add((referrer, module_name, kind))
+        summary = self.analyser.get_summary(module_name)
+        if summary is None:
+            return None  # Missing modules are skipped by the settings manager too
+        self.reached_modules.add(module_name)
+        if summary['dynamic_calls']:
+            self.dynamic_modules.add(module_name)
+        self.visit_imports(module_name, summary)
+        path = path + (module_name,)
+        calls = [call for call in summary['calls'] if not call['deferred']]
+        tasks = []
+        for call in calls:
+            if call['action'] == 'load':
+                for loaded_module_name in call['module_names']:
+                    tasks.extend(self.get_visit_tasks(
+                        loaded_module_name, module_name, 'load', call['lineno'], path
+                    ))
+        deferred_calls = [call for call in summary['calls'] if call['deferred']]
+        return tasks + [(self.finish_module, (module_name, calls, deferred_calls, path))]
+
+    def finish_module(self, module_name, calls, deferred_calls, path):
+        self.defined_settings.update(self.analyser.get_defined_settings(module_name))
+        tasks = self.process_calls(module_name, calls, path)
+        if deferred_calls:
+            tasks.append((self.defer_calls, (module_name, deferred_calls, path)))
+        return tasks
+
+    def defer_calls(self, module_name, calls, path):
+        self.deferred_calls.append((module_name, calls, path))
+
+    def visit_imports(self, module_name, summary):
+        """
+        Mark the project modules a module imports normally as reached, as
+        changes to them change the module's settings. Their own actions
+        aren't processed, as the settings manager only applies the actions of
+        modules it loads.
+        """
+        pending = [(module_name, summary)]
+        while pending:
+            module_name, summary = pending.pop()
+            for imported_module_name in summary['imports']:
+                imported_summary = self.analyser.get_project_summary(imported_module_name)
+                if imported_summary is None:
+                    continue
+                self.edges.add((module_name, imported_module_name, 'import'))
+                if imported_module_name not in self.reached_modules:
+                    self.reached_modules.add(imported_module_name)
+                    pending.append((imported_module_name, imported_summary))
+
+    def process_calls(self, module_name, calls, path, deferred=False):
+        tasks = []
+        if deferred:
+            # Loads within clean functions are processed first, like any other
+            for call in calls:
+                if call['action'] == 'load':
+                    for loaded_module_name in call['module_names']:
+                        tasks.extend(self.get_visit_tasks(
+                            loaded_module_name, module_name, 'load', call['lineno'], path
+                        ))
+        for action_name in STANDARD_ACTION_NAMES:
+            for call in calls:
+                if call['action'] == action_name:
+                    tasks.append((getattr(self, 'check_' + action_name), (module_name, call, path)))
+        return tasks
+
+    def check_set(self, module_name, call, path):
+        self.defined_settings.update(call['setting_names'])
+
+    def check_create_switch(self, module_name, call, path):
+        key = (call['group_name'], call['switch_name'])
+        if key in self.definitions:
+            self.add_issue(
+                'duplicate_switch',
+                module_name,
+                call['lineno'],
+                "Switch {group_name}: {switch_name} already defined in {other_module_name}".format(
+                    group_name=key[0],
+                    switch_name=key[1],
+                    other_module_name=self.definitions[key]['module_name']
+                )
+            )
+            return
+        self.definitions[key] = dict(call, module_name=module_name)
+
+    def check_apply_switch(self, module_name, call, path):
+        key = (call['group_name'], call['switch_name'])
+        definition = self.definitions.get(key)
+        if definition is None:
+            self.add_issue(
+                'undefined_switch',
+                module_name,
+                call['lineno'],
+                "Switch {group_name}: {switch_name} is not defined".format(
+                    group_name=key[0],
+                    switch_name=key[1]
+                )
+            )
+        elif definition.get('setting_names'):
+            self.defined_settings.update(definition['setting_names'])
+        elif definition['switch_module_name']:
+            return self.get_visit_tasks(
+                definition['switch_module_name'], module_name, 'switch', call['lineno'], path
+            )
+        return None
+
+    def visit_unapplied_switches(self):
+        """
+        Visit the modules of switches that are defined but never applied, as
+        SETTINGS_COMPOSER_SWITCHES could apply any of them.
+        """
+        visited_keys = set()
+        while True:
+            keys = [
+                key for key, definition in sorted(self.definitions.items())
+                if definition['switch_module_name'] and key not in visited_keys
+            ]
+            if not keys:
+                return
+            for key in keys:
+                visited_keys.add(key)
+                definition = self.definitions[key]
+                if definition['switch_module_name'] not in self.reached_modules:
+                    self.run_tasks([(
+                        self.visit_module,
+                        (definition['switch_module_name'], definition['module_name'], 'switch')
+                    )])
+            self.process_deferred_calls()
+
+    def check_modification(self, module_name, call, verb):
+        if call['setting_name'] not in self.defined_settings:
+            self.add_issue(
+                'undefined_setting',
+                module_name,
+                call['lineno'],
+                "Can't {verb} {setting_name} (not defined)".format(
+                    verb=verb,
+                    setting_name=call['setting_name']
+                )
+            )
+
+    def check_extend_setting(self, module_name, call, path):
+        self.check_modification(module_name, call, 'extend')
+
+    def check_update_setting(self, module_name, call, path):
+        self.check_modification(module_name, call, 'update')
+
+    def check_exclude_from_setting(self, module_name, call, path):
+        self.check_modification(module_name, call, 'exclude from')
+
+
+class SettingsTreeAnalyser(object):
+    """
+    Checks every site/environment permutation of a settings package, and the
+    package as a whole. Settings modules are parsed rather than executed, so
+    the whole tree can be checked without side effects.
+    """
+
+    def __init__(self, settings_module_name, search_path=None, cache_path=None):
+        self.settings_module_name = settings_module_name
+        self.search_path = search_path
+        self.cache = AnalysisCache(cache_path)
+        self.package_file = find_module_file(settings_module_name, search_path)
+        if self.package_file is None:
+            raise ValueError(
+                "Settings Composer: Can't find settings module {module_name}".format(
+                    module_name=settings_module_name
+                )
+            )
+        self.root_dir = get_root_dir(settings_module_name, self.package_file)
+
+    def get_summary(self, module_name):
+        file_path = find_module_file(module_name, self.search_path)
+        if file_path is None:
+            return None
+        return self.cache.get_summary(module_name, file_path)
+
+    def get_project_summary(self, module_name):
+        """
+        Return the summary of a module within the project the settings
+        package belongs to, or None for any other module.
+        """
+        file_path = find_module_file(module_name, [self.root_dir])
+        if file_path is None:
+            return None
+        return self.cache.get_summary(module_name, file_path)
+
+    def get_defined_settings(self, module_name, seen=None):
+        """
+        Return the settings a module defines directly, including any brought
+        in through star imports.
+        """
+        seen = seen or set()
+        seen.add(module_name)
+        summary = self.get_summary(module_name)
+        if summary is None:
+            return set()
+        settings = set(summary['assignments'])
+        for imported_module_name in summary['star_imports']:
+            if imported_module_name not in seen:
+                settings |= self.get_defined_settings(imported_module_name, seen)
+        return settings
+
+    def get_module_paths(self, module_name):
+        """
+        Return the paths of the files that a module's part in a composition
+        depends on: the module itself (wherever it would be, if it doesn't
+        exist yet), its packages, any settings files found alongside it, and
+        the files it loads or star imports.
+        """
+        parts = module_name.split('.')
+        file_path = find_module_file(module_name, self.search_path)
+        root_dir = self.root_dir if file_path is None else get_root_dir(module_name, file_path)
+        base = os.path.join(root_dir, *parts)
+        paths = set([base + '.py', os.path.join(base, '__init__.py')])
+        paths.update(base + extension for extension in FILE_PARSERS)
+        for index in range(1, len(parts)):
+            paths.add(os.path.join(root_dir, *parts[:index] + ['__init__.py']))
+        summary = self.get_summary(module_name)
+        if summary is not None:
+            for call in summary['calls']:
+                if call['action'] == 'load_file':
+                    paths.update(
+                        os.path.normpath(os.path.join(os.path.dirname(file_path), path))
+                        for path in call['paths']
+                    )
+        return paths
+
+    def get_dependency_graph(self, module_names):
+        """
+        Return the modules a permutation reaches (through its own modules,
+        loads, module switches, including switches it defines but doesn't
+        apply, and imports), how each was reached, the paths of every file
+        they depend on, and the modules whose loads or module switches can
+        only be determined at runtime (so could depend on any file).
+        """
+        checker = PermutationChecker(self)
+        checker.check(module_names)
+        checker.visit_unapplied_switches()
+        reached_module_names = set(module_name for referrer, module_name, kind in checker.edges)
+        paths = set()
+        seen = set()
+        pending_module_names = list(reached_module_names)
+        while pending_module_names:
+            module_name = pending_module_names.pop()
+            if module_name in seen:
+                continue
+            seen.add(module_name)
+            paths |= self.get_module_paths(module_name)
+            summary = self.get_summary(module_name)
+            if summary is not None:
+                pending_module_names.extend(summary['star_imports'])
+        return {
+            'modules': sorted(reached_module_names),
+            'edges': sorted(checker.edges, key=lambda edge: (edge[0] or '', edge[1], edge[2])),
+            'paths': sorted(paths),
+            'dynamic_modules': sorted(checker.dynamic_modules),
+        }
+
+    def get_dependency_graphs(self):
+        return [
+            dict(self.get_dependency_graph(module_names), site=site, env=env)
+            for site, env, module_names in self.get_permutations()
+        ]
+
+    def get_affected_permutations(self, changed_paths):
+        """
+        Return the (site, env) of every permutation whose composition could be
+        affected by changes to (including the creation or deletion of) the
+        given files. Permutations with loads or module switches that can
+        only be determined at runtime are affected by any change.
+        """
+        changed_paths = set(os.path.abspath(path) for path in changed_paths)
+        affected_permutations = [
+            (graph['site'], graph['env'])
+            for graph in self.get_dependency_graphs()
+            if changed_paths.intersection(graph['paths'])
+            or (changed_paths and graph['dynamic_modules'])
+        ]
+        self.cache.save()
+        return affected_permutations
+
+    def get_permutations(self):
+        """
+        Return a list of (site, env, module names) for every permutation of
+        site and environment, mirroring loading.collate_settings_modules.
+        """
+        envs = [''] + list(iter_subpackage_names(self.package_file, 'env'))
+        sites = [''] + list(iter_subpackage_names(self.package_file, 'sites'))
+        permutations = []
+        for site in sites:
+            for env in envs:
+                module_names = [self.settings_module_name]
+                if env:
+                    module_names.append('{0}.env.{1}'.format(self.settings_module_name, env))
+                if site:
+                    module_names.append('{0}.sites.{1}'.format(self.settings_module_name, site))
+                if env and site:
+                    module_names.append('{0}.sites.{1}.env.{2}'.format(self.settings_module_name, site, env))
+                permutations.append((site, env, module_names))
+        return permutations
+
+    def check(self):
+        """
+        Return a tuple of the issues found, mapped to the permutations they
+        occur in, and a list of modules that no permutation reaches (through
+        its own modules, loads, module switches, including switches it
+        defines but doesn't apply, or imports).
+        """
+        issues = {}
+        reached_modules = set()
+        for site, env, module_names in self.get_permutations():
+            checker = PermutationChecker(self)
+            checker.check(module_names)
+            checker.visit_unapplied_switches()
+            for issue in checker.issues:
+                issues.setdefault(issue, []).append((site, env))
+            reached_modules |= checker.reached_modules
+        unreachable_modules = [
+            module_name
+            for module_name, file_path in iter_package_modules(
+                self.settings_module_name,
+                self.package_file
+            )
+            if module_name not in reached_modules
+            and not self.cache.get_summary(module_name, file_path)['is_empty']
+        ]
+        self.cache.save()
+        return issues, unreachable_modules
@@ -0,0 +1,166 @@
+import copy
+
+
+def get_function_name(function):
+    return getattr(function, '__name__', repr(function))
+
+
+class IsolatedSettings(object):
+    """
+    A read-only view of the settings for a clean function run concurrently
+    with others, limited to the settings it declared that it reads. Each
+    setting read is a deep copy (made once per function), so changing it in
+    place changes neither the settings nor what other functions read.
+    Values that can't be copied (such as modules) are shared.
+    """
+
+    def __init__(self, settings, function, reads):
+        self._settings = settings
+        self._function = function
+        self._reads = frozenset(reads)
+        self._copies = {}
+
+    def _check(self, name):
+        if name not in self._reads:
+            raise ValueError(
+                "Settings Composer: Clean function '{function_name}' read {name}, which it doesn't declare".format(
+                    function_name=get_function_name(self._function),
+                    name=name
+                )
+            )
+
+    def _copy(self, name):
+        if name not in self._copies:
+            value = self._settings[name]
+            try:
+                self._copies[name] = copy.deepcopy(value)
+            except Exception:
+                self._copies[name] = value
+        return self._copies[name]
+
+    def __getitem__(self, name):
+        self._check(name)
+        return self._copy(name)
+
+    def __contains__(self, name):
+        self._check(name)
+        return name in self._settings
+
+    def get(self, name, default=None):
+        self._check(name)
+        return self._copy(name) if name in self._settings else default
+
+    def keys(self):
+        return [name for name in self._settings if name in self._reads]
+
+    def values(self):
+        return [self._copy(name) for name in self.keys()]
+
+    def items(self):
+        return [(name, self._copy(name)) for name in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+
+def get_written_names(action_name, kwargs):
+    """
+    Return the names of the settings an action changes, or None if that
+    can't be known before it is processed (as with loading a module or
+    applying a switch).
+    """
+    if action_name == 'set':
+        return set(kwargs)
+    if action_name in ('extend_setting', 'update_setting', 'exclude_from_setting'):
+        return set([kwargs['setting_name']])
+    if action_name == 'clean':
+        return set()  # Clean functions added while cleaning run afterwards anyway
+    return None
+
+
+def check_written_names(function, writes, layer):
+    """
+    Make sure the actions a concurrently run clean function added only
+    change the settings it declared that it writes.
+    """
+    for action_name, action_queue in layer.action_queues.items():
+        for kwargs in action_queue:
+            written_names = get_written_names(action_name, kwargs)
+            if written_names is None:
+                raise ValueError(
+                    "Settings Composer: Clean function '{function_name}' can't add a '{action_name}' action "
+                    "when run concurrently, as the settings it changes aren't known".format(
+                        function_name=get_function_name(function),
+                        action_name=action_name
+                    )
+                )
+            undeclared_names = written_names - set(writes)
+            if undeclared_names:
+                raise ValueError(
+                    "Settings Composer: Clean function '{function_name}' changed {names}, which it doesn't declare".format(
+                        function_name=get_function_name(function),
+                        names=u', '.join(sorted(undeclared_names))
+                    )
+                )
+
+
+def group_clean_actions(actions):
+    """
+    Split a queue of (source name, kwargs) clean actions into groups that can
+    each be run concurrently: consecutive actions whose functions declare
+    what they read and write, where none writes a setting that another reads
+    or writes. Functions that don't declare both are grouped on their own.
+    """
+    groups = []
+    group_reads = group_writes = None
+    for source_name, kwargs in actions:
+        reads = kwargs.get('reads')
+        writes = kwargs.get('writes')
+        if reads is None or writes is None:
+            groups.append([(source_name, kwargs)])
+            group_reads = group_writes = None
+            continue
+        reads = set(reads)
+        writes = set(writes)
+        if (
+            group_reads is None
+            or writes & (group_reads | group_writes)
+            or reads & group_writes
+        ):
+            groups.append([])
+            group_reads, group_writes = set(), set()
+        groups[-1].append((source_name, kwargs))
+        group_reads |= reads
+        group_writes |= writes
+    return groups
+
+
+class CleanFunctionRunner(object):
+    """
+    Runs independent clean functions in a pool of threads. Worthwhile for
+    functions that spend their time waiting, such as those that check paths
+    or probe sockets.
+    """
+
+    def __init__(self, thread_count):
+        # Only imported when running clean functions concurrently, as it is slow to import
+        from multiprocessing.pool import ThreadPool
+        self.pool = ThreadPool(thread_count)
+
+    def run(self, calls):
+        """
+        Run (function, args) pairs concurrently, returning their results in
+        order. If any raise an exception, the first one's is raised once they
+        have all finished.
+        """
+        results = [self.pool.apply_async(function, args) for function, args in calls]
+        for result in results:
+            result.wait()
+        return [result.get() for result in results]
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
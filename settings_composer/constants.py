@@ -1,7 +1,22 @@
 SETTINGS_MODULE_VARIABLE_NAME = 'SETTINGS_COMPOSER_MODULE'
 SITE_VARIABLE_NAME = 'SETTINGS_COMPOSER_SITE'
+SITES_VARIABLE_NAME = 'SETTINGS_COMPOSER_SITES'
 ENV_VARIABLE_NAME = 'SETTINGS_COMPOSER_ENV'
+ROLE_VARIABLE_NAME = 'SETTINGS_COMPOSER_ROLE'
 SWITCHES_VARIABLE_NAME = 'SETTINGS_COMPOSER_SWITCHES'
 VERBOSE_VARIABLE_NAME = 'SETTINGS_COMPOSER_VERBOSE'
+PROFILE_VARIABLE_NAME = 'SETTINGS_COMPOSER_PROFILE'
+EVICT_MODULES_VARIABLE_NAME = 'SETTINGS_COMPOSER_EVICT_MODULES'
+PREFETCH_THREADS_VARIABLE_NAME = 'SETTINGS_COMPOSER_PREFETCH_THREADS'
+CLEAN_THREADS_VARIABLE_NAME = 'SETTINGS_COMPOSER_CLEAN_THREADS'
+FILE_CACHE_VARIABLE_NAME = 'SETTINGS_COMPOSER_FILE_CACHE'
+STORE_CACHE_VARIABLE_NAME = 'SETTINGS_COMPOSER_STORE_CACHE'
+VALIDATION_CACHE_VARIABLE_NAME = 'SETTINGS_COMPOSER_VALIDATION_CACHE'
+ACCESS_SAMPLE_RATE_VARIABLE_NAME = 'SETTINGS_COMPOSER_ACCESS_SAMPLE_RATE'
+ACCESS_LOG_VARIABLE_NAME = 'SETTINGS_COMPOSER_ACCESS_LOG'
+DAEMON_SOCKET_VARIABLE_NAME = 'SETTINGS_COMPOSER_DAEMON_SOCKET'
+
+# Prefix shared by all of the above
+VARIABLE_NAME_PREFIX = 'SETTINGS_COMPOSER_'
 
 TRUE_VALUES = ('true', 'yes', 'y', '1')
@@ -0,0 +1,319 @@
+import hashlib
+import importlib
+import json
+import os
+import pickle
+import re
+import socket
+import stat
+import struct
+import sys
+
+from . import constants, environment
+from .helpers import output_if_verbose
+
+
+PROTOCOL_VERSION = 1
+DEFAULT_TIMEOUT = 10.0  # Seconds a client waits for the daemon, including composition
+RESPONSE_HEADER = struct.Struct('>Q')  # Length of the pickled response
+PEER_CREDENTIALS = struct.Struct('3i')  # Process id, user id and group id of the daemon
+
+FILE_SOURCE_PATTERN = re.compile(r"FILE '([^']+)'")
+STORE_SOURCE_PATTERN = re.compile(r"STORE '")
+
+# Variables that only affect the process composing the settings, not the
+# settings. Evicting modules would also hide the files a composition depends on
+PROCESS_VARIABLE_NAMES = (constants.EVICT_MODULES_VARIABLE_NAME,)
+
+
+def get_context_key(context):
+    return json.dumps(sorted(context.items()))
+
+
+def get_watched_paths(settings_module_name, module_names, settings_source):
+    """
+    Return the files and directories a composition depends on: the settings
+    package, the files of the modules that were loaded, and any settings files
+    they loaded from elsewhere.
+    """
+    paths = set()
+    for module_name in set(module_names) | set([settings_module_name]):
+        module = sys.modules.get(module_name)
+        if module is None:
+            continue
+        paths.update(getattr(module, '__path__', None) or ())
+        if getattr(module, '__file__', None):
+            paths.add(os.path.abspath(module.__file__))
+    for sources in settings_source.values():
+        for source in sources:
+            paths.update(os.path.abspath(path) for path in FILE_SOURCE_PATTERN.findall(source))
+    return sorted(paths)
+
+
+def iter_file_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, directory_names, file_names in os.walk(path):
+                directory_names[:] = sorted(name for name in directory_names if name != '__pycache__')
+                for file_name in sorted(file_names):
+                    if not file_name.endswith(('.pyc', '.pyo')):
+                        yield os.path.join(directory, file_name)
+        else:
+            yield path
+
+
+def get_fingerprint(paths):
+    """
+    Return a hash of the modification time and size of every file under the
+    given paths, which changes whenever a file is edited, added or removed.
+    """
+    digest = hashlib.sha1()
+    for path in iter_file_paths(paths):
+        try:
+            file_stat = os.stat(path)
+            entry = u'{0}:{1}:{2}\n'.format(path, file_stat.st_mtime, file_stat.st_size)
+        except OSError:
+            entry = u'{0}:missing\n'.format(path)
+        digest.update(entry.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class Snapshot(object):
+    """
+    The pickled response for one composition context, along with what it
+    depends on. Compositions that load settings from key-value stores are
+    never reused, as their values can change without any file changing.
+    """
+
+    def __init__(self, payload, watched_paths, cacheable=True):
+        self.payload = payload
+        self.watched_paths = watched_paths
+        self.fingerprint = get_fingerprint(watched_paths)
+        self.cacheable = cacheable
+
+    def is_stale(self):
+        return not self.cacheable or get_fingerprint(self.watched_paths) != self.fingerprint
+
+
+class SettingsDaemon(object):
+    """
+    Keeps composed settings warm for short-lived processes, serving a pickled
+    snapshot of them over a Unix socket for each composition context (the
+    settings composer variables the client was started with).
+
+    Settings are composed in the daemon's own process, with its environment
+    overlaid with the client's settings composer variables, so any other
+    environment variables read by settings modules come from the daemon.
+    Snapshots are recomposed when a file they depend on changes: checked on
+    every request, and every poll interval while idle, so that they are ready
+    before they are next needed. Requests are served one at a time.
+    """
+
+    def __init__(self, socket_path, poll_interval=1.0):
+        self.socket_path = socket_path
+        self.poll_interval = poll_interval
+        self.snapshots = {}
+        self.listener = None
+        self.stopped = False
+
+    def compose(self, context):
+        from .loading import collect_settings  # Imported late to avoid a circular import
+        from . import settings_manager
+
+        if hasattr(importlib, 'invalidate_caches'):
+            importlib.invalidate_caches()  # So that new settings modules are found
+        saved_environ = dict(os.environ)
+        settings = {}
+        try:
+            for name in list(os.environ):
+                if name.startswith(constants.VARIABLE_NAME_PREFIX):
+                    del os.environ[name]
+            os.environ.update(context)
+            settings_module_name = environment.get_settings_module_name()
+            collect_settings(settings)
+        except Exception as error:
+            output_if_verbose(u"Settings daemon failed to compose settings: {0}".format(error))
+            settings_module_name = context.get(constants.SETTINGS_MODULE_VARIABLE_NAME, '')
+            payload = {'version': PROTOCOL_VERSION, 'error': u'{0}'.format(error)}
+        else:
+            payload = {'version': PROTOCOL_VERSION, 'settings': settings}
+        finally:
+            os.environ.clear()
+            os.environ.update(saved_environ)
+
+        settings_source = settings.get('SETTINGS_COMPOSER_SOURCE', {})
+        watched_paths = get_watched_paths(
+            settings_module_name,
+            settings_manager.loaded_module_names,
+            settings_source
+        )
+        try:
+            payload = pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)
+        except Exception as error:
+            payload = pickle.dumps(
+                {'version': PROTOCOL_VERSION, 'error': u"Settings can't be pickled: {0}".format(error)},
+                pickle.HIGHEST_PROTOCOL
+            )
+        cacheable = not any(
+            STORE_SOURCE_PATTERN.search(source)
+            for sources in settings_source.values()
+            for source in sources
+        )
+        return Snapshot(payload, watched_paths, cacheable)
+
+    def get_payload(self, context):
+        context = dict(
+            (name, value) for name, value in context.items()
+            if name not in PROCESS_VARIABLE_NAMES
+        )
+        key = get_context_key(context)
+        snapshot = self.snapshots.get(key)
+        if snapshot is None or snapshot.is_stale():
+            snapshot = self.snapshots[key] = self.compose(context)
+        return snapshot.payload
+
+    def refresh(self):
+        """
+        Recompose any snapshots whose files have changed.
+        """
+        for key, snapshot in list(self.snapshots.items()):
+            if snapshot.cacheable and snapshot.is_stale():
+                self.snapshots[key] = self.compose(dict(json.loads(key)))
+
+    def handle(self, connection):
+        request = b''
+        while not request.endswith(b'\n'):
+            chunk = connection.recv(65536)
+            if not chunk:
+                return
+            request += chunk
+        request = json.loads(request.decode('utf-8'))
+        if request.get('version') != PROTOCOL_VERSION:
+            payload = pickle.dumps({'version': PROTOCOL_VERSION, 'error': 'Unsupported protocol version'})
+        else:
+            payload = self.get_payload(request['context'])
+        connection.sendall(RESPONSE_HEADER.pack(len(payload)) + payload)
+
+    def start(self):
+        if os.path.exists(self.socket_path) and stat.S_ISSOCK(os.stat(self.socket_path).st_mode):
+            os.remove(self.socket_path)  # Left behind by a daemon that wasn't stopped
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Responses are unpickled by clients, so only the daemon's user may
+        # connect, from the moment the socket is created
+        previous_umask = os.umask(0o177)
+        try:
+            self.listener.bind(self.socket_path)
+        finally:
+            os.umask(previous_umask)
+        self.listener.listen(64)
+        self.listener.settimeout(self.poll_interval)
+        return self
+
+    def serve_request(self):
+        """
+        Serve a single request, or refresh the snapshots if none arrives
+        within the poll interval.
+        """
+        try:
+            connection, _ = self.listener.accept()
+        except socket.timeout:
+            self.refresh()
+            return
+        try:
+            connection.settimeout(DEFAULT_TIMEOUT)
+            self.handle(connection)
+        except (IOError, OSError, ValueError) as error:
+            output_if_verbose(u"Settings daemon failed to serve a request: {0}".format(error))
+        finally:
+            connection.close()
+
+    def serve_forever(self):
+        while not self.stopped:
+            self.serve_request()
+
+    def stop(self):
+        """
+        Stop serving, once the current request (or poll) has finished.
+        """
+        self.stopped = True
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+def receive_exactly(connection, length):
+    data = b''
+    while len(data) < length:
+        chunk = connection.recv(min(length - len(data), 1 << 20))
+        if not chunk:
+            raise EOFError('connection closed by the settings daemon')
+        data += chunk
+    return data
+
+
+def check_socket_owner(socket_path):
+    """
+    Make sure a daemon's socket, and the directory it is in, belong to the
+    current user, as responses are unpickled, which can run any code.
+    """
+    user_id = os.getuid()
+    for path in (socket_path, os.path.dirname(os.path.abspath(socket_path))):
+        if os.lstat(path).st_uid != user_id:
+            raise ValueError(
+                "Settings Composer: {path} doesn't belong to the current user".format(path=path)
+            )
+
+
+def check_peer_owner(connection):
+    """
+    Make sure the process at the other end of a connection (the daemon) is
+    run by the current user, where the platform can tell.
+    """
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return
+    credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, PEER_CREDENTIALS.size)
+    process_id, user_id, group_id = PEER_CREDENTIALS.unpack(credentials)
+    if user_id != os.getuid():
+        raise ValueError("Settings Composer: The settings daemon is run by another user")
+
+
+def fetch_settings(socket_path, context, timeout=DEFAULT_TIMEOUT):
+    """
+    Fetch composed settings for a context from a settings daemon. Returns
+    None if there is no daemon, or it couldn't compose the settings, so that
+    they can be composed in-process instead. Daemons run by other users (or
+    listening on sockets that belong to them) are ignored.
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(timeout)
+    try:
+        check_socket_owner(socket_path)
+        connection.connect(socket_path)
+        check_peer_owner(connection)
+        request = {'version': PROTOCOL_VERSION, 'context': context}
+        connection.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        length, = RESPONSE_HEADER.unpack(receive_exactly(connection, RESPONSE_HEADER.size))
+        response = pickle.loads(receive_exactly(connection, length))
+    except Exception as error:
+        output_if_verbose(
+            u"Settings daemon at {socket_path} is unavailable ({error}), composing settings".format(
+                socket_path=socket_path,
+                error=error
+            )
+        )
+        return None
+    finally:
+        connection.close()
+    if response.get('version') != PROTOCOL_VERSION or 'settings' not in response:
+        output_if_verbose(
+            u"Settings daemon at {socket_path} couldn't compose settings ({error}), composing settings".format(
+                socket_path=socket_path,
+                error=response.get('error', 'unsupported protocol version')
+            )
+        )
+        return None
+    return response['settings']
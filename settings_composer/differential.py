@@ -0,0 +1,423 @@
+import copy
+import importlib
+import itertools
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+from collections import namedtuple
+
+import settings_composer
+
+from .manager import SettingsManager
+
+
+Mismatch = namedtuple('Mismatch', ['engine_name', 'seed', 'program', 'expected', 'actual', 'reproducer'])
+
+
+# Programs
+#
+# A program describes a tree of settings modules as plain data, so that it can
+# be rendered to source files, composed, and shrunk by removing statements. It
+# is a dictionary of 'roots' (the names of the modules composed, in order) and
+# 'modules' (a list of statements for each module). Statements are lists:
+#
+#   ['assign', name, value]                  NAME = value (or, within a clean
+#                                            function, settings['NAME'] = value)
+#   ['load', [module_name, ...]]
+#   ['set', name, value]
+#   ['create_switch', group_name, switch_name, settings or module_name]
+#   ['apply_switch', group_name, switch_name]
+#   ['extend_setting', name, values]
+#   ['update_setting', name, values]
+#   ['exclude_from_setting', name, items]
+#   ['clean', [statement, ...]]              A clean function, with its body
+#
+# Modules only load modules after them in the tree (and switches only load
+# modules without loads or switches of their own), so composition always
+# terminates.
+
+LIST_NAMES = ['LIST_0', 'LIST_1', 'LIST_2']
+DICT_NAMES = ['DICT_0', 'DICT_1', 'DICT_2']
+INT_NAMES = ['INT_0', 'INT_1']
+GROUP_NAMES = ['alpha', 'beta']
+SWITCH_NAMES = ['on', 'off']
+DICT_KEYS = ['a', 'b', 'c']
+
+
+class ProgramGenerator(object):
+    """
+    Generates random programs. Every program starts with a base module, which
+    defines every setting and the switches of the first group, so that most
+    programs compose successfully. Other switches are created (and settings
+    redefined) at random, so that errors are compared too.
+    """
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.switches = []
+
+    def generate_program(self):
+        rng = self.rng
+        module_names = ['module_{0}'.format(index) for index in range(rng.randint(2, 6))]
+        switch_module_names = ['switch_{0}'.format(index) for index in range(rng.randint(0, 2))]
+        modules = {'base': []}
+        for name in LIST_NAMES + DICT_NAMES + INT_NAMES:
+            modules['base'].append(['assign', name, self.generate_value(name)])
+        for switch_name in SWITCH_NAMES:
+            modules['base'].append(['create_switch', GROUP_NAMES[0], switch_name, self.generate_settings()])
+            self.switches.append((GROUP_NAMES[0], switch_name))
+        for module_name in switch_module_names:
+            modules[module_name] = [
+                self.generate_statement(['assign', 'set', 'extend_setting', 'update_setting'])
+                for index in range(rng.randint(1, 3))
+            ]
+        for index, module_name in enumerate(module_names):
+            modules[module_name] = [
+                self.generate_module_statement(module_names[index + 1:], switch_module_names, 0)
+                for statement_index in range(rng.randint(1, 6))
+            ]
+        return {'roots': ['base'] + module_names[:rng.randint(1, 2)], 'modules': modules}
+
+    def generate_module_statement(self, later_module_names, switch_module_names, depth):
+        kinds = [
+            'assign', 'assign', 'set', 'extend_setting', 'update_setting', 'exclude_from_setting',
+            'create_switch', 'apply_switch',
+        ]
+        if later_module_names:
+            kinds += ['load', 'load']
+        if depth < 3:
+            kinds += ['clean']
+        kind = self.rng.choice(kinds)
+        if kind == 'load':
+            return [kind, self.rng.sample(later_module_names, self.rng.randint(1, min(2, len(later_module_names))))]
+        if kind == 'clean':
+            return [kind, [
+                self.generate_module_statement(later_module_names, switch_module_names, depth + 1)
+                for index in range(self.rng.randint(1, 3))
+            ]]
+        if kind == 'create_switch':
+            key = (self.rng.choice(GROUP_NAMES[1:]), self.rng.choice(SWITCH_NAMES))
+            self.switches.append(key)
+            if switch_module_names and self.rng.random() < 0.4:
+                definition = self.rng.choice(switch_module_names)
+            else:
+                definition = self.generate_settings()
+            return [kind, key[0], key[1], definition]
+        if kind == 'apply_switch':
+            if self.switches and self.rng.random() < 0.9:
+                key = self.rng.choice(self.switches)
+            else:
+                key = (self.rng.choice(GROUP_NAMES), self.rng.choice(SWITCH_NAMES))
+            return [kind, key[0], key[1]]
+        return self.generate_statement([kind])
+
+    def generate_statement(self, kinds):
+        kind = self.rng.choice(kinds)
+        if kind in ('assign', 'set'):
+            name = self.rng.choice(LIST_NAMES + DICT_NAMES + INT_NAMES)
+            return [kind, name, self.generate_value(name)]
+        if kind == 'extend_setting':
+            name = self.rng.choice(LIST_NAMES)
+            return [kind, name, self.generate_value(name)]
+        if kind == 'update_setting':
+            name = self.rng.choice(DICT_NAMES)
+            return [kind, name, self.generate_value(name)]
+        name = self.rng.choice(LIST_NAMES + DICT_NAMES)
+        if name in LIST_NAMES:
+            return [kind, name, self.generate_value(name)]
+        return [kind, name, self.rng.sample(DICT_KEYS, self.rng.randint(1, 2))]
+
+    def generate_value(self, name):
+        rng = self.rng
+        if name in LIST_NAMES:
+            return [rng.randint(0, 5) for index in range(rng.randint(0, 3))]
+        if name in DICT_NAMES:
+            return dict((key, rng.randint(0, 5)) for key in rng.sample(DICT_KEYS, rng.randint(0, 3)))
+        return rng.randint(0, 9)
+
+    def generate_settings(self):
+        names = self.rng.sample(LIST_NAMES + DICT_NAMES + INT_NAMES, self.rng.randint(1, 3))
+        return dict((name, self.generate_value(name)) for name in names)
+
+
+def generate_program(seed):
+    """
+    Generate a random program (see above) from a seed.
+    """
+    return ProgramGenerator(seed).generate_program()
+
+
+def render_statements(statements, package_name, lines, indent, counter):
+    for statement in statements:
+        kind = statement[0]
+        if kind == 'assign':
+            if indent:
+                lines.append(u"{0}settings[{1!r}] = {2!r}".format(indent, statement[1], statement[2]))
+            else:
+                lines.append(u"{0} = {1!r}".format(statement[1], statement[2]))
+        elif kind == 'load':
+            lines.append(u"{0}settings_composer.load({1})".format(
+                indent,
+                u', '.join(repr(package_name + '.' + module_name) for module_name in statement[1])
+            ))
+        elif kind == 'set':
+            lines.append(u"{0}settings_composer.set({1}={2!r})".format(indent, statement[1], statement[2]))
+        elif kind == 'create_switch':
+            definition = statement[3]
+            if not hasattr(definition, 'keys'):
+                definition = package_name + '.' + definition
+            lines.append(u"{0}settings_composer.create_switch({1!r}, {2!r}, {3!r})".format(
+                indent, statement[1], statement[2], definition
+            ))
+        elif kind == 'apply_switch':
+            lines.append(u"{0}settings_composer.apply_switch({1!r}, {2!r})".format(
+                indent, statement[1], statement[2]
+            ))
+        elif kind == 'update_setting':
+            lines.append(u"{0}settings_composer.update_setting({1!r}, **{2!r})".format(
+                indent, statement[1], statement[2]
+            ))
+        elif kind in ('extend_setting', 'exclude_from_setting'):
+            lines.append(u"{0}settings_composer.{1}({2!r}, {3!r})".format(
+                indent, kind, statement[1], statement[2]
+            ))
+        elif kind == 'clean':
+            function_name = u'clean_{0}'.format(next(counter))
+            lines.append(u"{0}def {1}(settings):".format(indent, function_name))
+            if not statement[1]:
+                lines.append(u"{0}    pass".format(indent))
+            render_statements(statement[1], package_name, lines, indent + u'    ', counter)
+            lines.append(u"{0}settings_composer.clean({1})".format(indent, function_name))
+
+
+def render_program(program, package_name):
+    """
+    Return the source of each module of a program, as a package.
+    """
+    sources = {u'__init__': u''}
+    for module_name, statements in sorted(program['modules'].items()):
+        lines = [u'import settings_composer', u'']
+        render_statements(statements, package_name, lines, u'', itertools.count())
+        sources[module_name] = u'\n'.join(lines) + u'\n'
+    return sources
+
+
+def format_reproducer(program):
+    sources = render_program(program, 'tree')
+    lines = [u"# Composed: {0}".format(u', '.join('tree.' + name for name in program['roots']))]
+    for module_name, source in sorted(sources.items()):
+        if module_name != u'__init__':
+            lines.append(u"\n# tree/{0}.py\n{1}".format(module_name, source.rstrip()))
+    return u'\n'.join(lines)
+
+
+# Engines
+#
+# An engine is a function that composes a list of settings modules into a
+# settings dictionary (including SETTINGS_COMPOSER_SOURCE). Alternative
+# engines are registered by name, and are expected to produce exactly the
+# same settings and sources as the reference engine.
+
+def get_manager_engine(manager_class):
+    """
+    Return an engine that composes settings with a SettingsManager (or
+    subclass), installed as settings_composer.settings_manager while it runs.
+    """
+    def compose(module_names):
+        settings = {}
+        manager = manager_class()
+        original_manager = settings_composer.settings_manager
+        settings_composer.settings_manager = manager
+        try:
+            manager.bind(settings)
+            manager.apply_settings_modules(module_names)
+            manager.unbind()
+        finally:
+            settings_composer.settings_manager = original_manager
+        return settings
+    return compose
+
+
+reference_engine = get_manager_engine(SettingsManager)
+
+ENGINES = {}
+
+
+def register_engine(engine_name, engine):
+    """
+    Add an alternative composition engine to be tested against the
+    reference engine.
+    """
+    ENGINES[engine_name] = engine
+
+
+class ProgramRunner(object):
+    """
+    Writes programs to a temporary directory, and composes them with engines.
+    Each program is written as a new package, so that no engine can see
+    modules (or bytecode) left over from a previous program.
+    """
+
+    def __init__(self):
+        self.directory = tempfile.mkdtemp()
+        self.package_names = itertools.count()
+        sys.path.insert(0, self.directory)
+
+    def close(self):
+        sys.path.remove(self.directory)
+        shutil.rmtree(self.directory)
+
+    def write_program(self, program):
+        package_name = 'composer_program_{0}'.format(next(self.package_names))
+        package_dir = os.path.join(self.directory, package_name)
+        os.mkdir(package_dir)
+        for module_name, source in render_program(program, package_name).items():
+            with open(os.path.join(package_dir, module_name + '.py'), 'w') as module_file:
+                module_file.write(source)
+        importlib.invalidate_caches()
+        return package_name
+
+    def get_outcome(self, engine, program, package_name):
+        """
+        Compose a program, returning ('settings', settings) or, if composition
+        fails, ('error', exception type name, message).
+        """
+        try:
+            return ('settings', engine([package_name + '.' + name for name in program['roots']]))
+        except Exception as error:
+            return ('error', type(error).__name__, u'{0}'.format(error))
+        finally:
+            for module_name in list(sys.modules):
+                if module_name.split('.')[0] == package_name:
+                    del sys.modules[module_name]
+
+    def compare(self, program, engine):
+        """
+        Compose a program with the reference engine and another engine,
+        returning both outcomes.
+        """
+        package_name = self.write_program(program)
+        return (
+            self.get_outcome(reference_engine, program, package_name),
+            self.get_outcome(engine, program, package_name)
+        )
+
+    def is_mismatch(self, program, engine):
+        expected, actual = self.compare(program, engine)
+        return expected != actual
+
+
+def iter_smaller_programs(program):
+    """
+    Yield copies of a program with a single root, module or statement
+    removed, and with clean functions replaced by their bodies.
+    """
+    for index in range(len(program['roots'])):
+        if len(program['roots']) > 1:
+            smaller_program = copy.deepcopy(program)
+            del smaller_program['roots'][index]
+            yield smaller_program
+    for module_name in sorted(program['modules']):
+        if module_name not in program['roots']:
+            smaller_program = copy.deepcopy(program)
+            del smaller_program['modules'][module_name]
+            yield smaller_program
+    for module_name in sorted(program['modules']):
+        for path in iter_statement_paths(program['modules'][module_name]):
+            smaller_program = copy.deepcopy(program)
+            statements, index = get_statement_parent(smaller_program['modules'][module_name], path)
+            statement = statements.pop(index)
+            yield smaller_program
+            if statement[0] == 'clean':
+                smaller_program = copy.deepcopy(program)
+                statements, index = get_statement_parent(smaller_program['modules'][module_name], path)
+                statements[index:index + 1] = statements[index][1]
+                yield smaller_program
+
+
+def iter_statement_paths(statements, prefix=()):
+    for index, statement in enumerate(statements):
+        path = prefix + (index,)
+        yield path
+        if statement[0] == 'clean':
+            for nested_path in iter_statement_paths(statement[1], path):
+                yield nested_path
+
+
+def get_statement_parent(statements, path):
+    for index in path[:-1]:
+        statements = statements[index][1]
+    return statements, path[-1]
+
+
+def shrink_program(program, is_failing):
+    """
+    Repeatedly remove whatever can be removed from a failing program while it
+    still fails, returning a minimal failing program.
+    """
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        for smaller_program in iter_smaller_programs(program):
+            if is_failing(smaller_program):
+                program = smaller_program
+                shrunk = True
+                break
+    return program
+
+
+def run_differential_tests(count=100, seed=0, engines=None):
+    """
+    Compose count random programs with the reference engine and each
+    alternative engine (by default, every registered engine). Returns a
+    Mismatch for the first program each engine gets wrong, shrunk to a
+    minimal reproducer.
+    """
+    engines = dict(ENGINES if engines is None else engines)
+    mismatches = []
+    runner = ProgramRunner()
+    try:
+        for program_seed in range(seed, seed + count):
+            if not engines:
+                break
+            program = generate_program(program_seed)
+            for engine_name, engine in sorted(engines.items()):
+                if not runner.is_mismatch(program, engine):
+                    continue
+                failing_program = shrink_program(
+                    program,
+                    lambda candidate: runner.is_mismatch(candidate, engine)
+                )
+                expected, actual = runner.compare(failing_program, engine)
+                mismatches.append(Mismatch(
+                    engine_name,
+                    program_seed,
+                    failing_program,
+                    expected,
+                    actual,
+                    format_reproducer(failing_program)
+                ))
+                del engines[engine_name]
+    finally:
+        runner.close()
+    return mismatches
+
+
+def format_mismatch(mismatch):
+    return (
+        u"Engine '{engine_name}' differs from the reference engine for program {seed}.\n"
+        u"Expected: {expected!r}\nActual: {actual!r}\n\n{reproducer}".format(**mismatch._asdict())
+    )
+
+
+def check_engines(count=100, seed=0, engines=None):
+    """
+    Run the differential tests, raising AssertionError with a reproducer for
+    each engine that differs from the reference engine. For use in tests.
+    """
+    mismatches = run_differential_tests(count, seed, engines)
+    if mismatches:
+        raise AssertionError(u'\n\n'.join(format_mismatch(mismatch) for mismatch in mismatches))
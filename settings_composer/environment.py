@@ -1,18 +1,17 @@
 import os
 
-from django.core.exceptions import ImproperlyConfigured
-
 from . import constants
+from .exceptions import improperly_configured
 
 
 def get_settings_module_name():
     settings_module = os.environ.get(constants.SETTINGS_MODULE_VARIABLE_NAME)
     if settings_module is None:
-        raise ImproperlyConfigured(
+        raise improperly_configured(
             "Django settings composer: settings module not defined in environment variable."
         )
     if not settings_module:
-        raise ImproperlyConfigured(
+        raise improperly_configured(
             "Django settings composer: settings module environment variable cannot be blank."
         )
     return settings_module
@@ -22,10 +21,95 @@ def get_site_name():
     return os.environ.get(constants.SITE_VARIABLE_NAME, '')
 
 
+def get_site_names():
+    site_names = []
+    for site_name in os.environ.get(constants.SITES_VARIABLE_NAME, '').split(','):
+        site_name = site_name.strip()
+        if site_name and site_name not in site_names:
+            site_names.append(site_name)
+    return site_names
+
+
 def get_env_name():
     return os.environ.get(constants.ENV_VARIABLE_NAME, '')
 
 
+def get_role_name():
+    return os.environ.get(constants.ROLE_VARIABLE_NAME, '').strip()
+
+
+def get_file_cache_dir():
+    return os.environ.get(constants.FILE_CACHE_VARIABLE_NAME) or None
+
+
+def get_store_cache_dir():
+    return os.environ.get(constants.STORE_CACHE_VARIABLE_NAME) or None
+
+
+def get_validation_cache_path():
+    return os.environ.get(constants.VALIDATION_CACHE_VARIABLE_NAME) or None
+
+
+def get_access_sample_rate():
+    sample_rate = os.environ.get(constants.ACCESS_SAMPLE_RATE_VARIABLE_NAME, '').strip()
+    if not sample_rate:
+        return 0.0
+    try:
+        sample_rate = float(sample_rate)
+    except ValueError:
+        sample_rate = -1.0
+    if not 0.0 <= sample_rate <= 1.0:
+        raise improperly_configured(
+            "Settings Composer: The access sample rate must be a number between 0 and 1"
+        )
+    return sample_rate
+
+
+def _get_thread_count(variable_name, description):
+    thread_count = os.environ.get(variable_name, '').strip()
+    if not thread_count:
+        return 0
+    try:
+        thread_count = int(thread_count)
+    except ValueError:
+        thread_count = -1
+    if thread_count < 0:
+        raise improperly_configured(
+            "Settings Composer: The number of {description} threads must be a whole number".format(
+                description=description
+            )
+        )
+    return thread_count
+
+
+def get_prefetch_thread_count():
+    return _get_thread_count(constants.PREFETCH_THREADS_VARIABLE_NAME, 'prefetch')
+
+
+def get_clean_thread_count():
+    return _get_thread_count(constants.CLEAN_THREADS_VARIABLE_NAME, 'clean')
+
+
+def get_access_log_path():
+    return os.environ.get(constants.ACCESS_LOG_VARIABLE_NAME) or None
+
+
+def get_daemon_socket_path():
+    return os.environ.get(constants.DAEMON_SOCKET_VARIABLE_NAME) or None
+
+
+def get_composition_context():
+    """
+    Return the settings composer variables that determine how settings are
+    composed (all of them, other than the daemon socket).
+    """
+    return dict(
+        (name, value) for name, value in os.environ.items()
+        if name.startswith(constants.VARIABLE_NAME_PREFIX)
+        and name != constants.DAEMON_SOCKET_VARIABLE_NAME
+    )
+
+
 def get_switches():
     switches = {}
     env_switches = os.environ.get(constants.SWITCHES_VARIABLE_NAME, '')
@@ -36,7 +120,7 @@ def get_switches():
         try:
             group_name, switch_name = env_switch.split(':')
         except ValueError:
-            raise ImproperlyConfigured(
+            raise improperly_configured(
                 "Settings Composer: '{env_switch}' is not a valid switch reference".format(
                     env_switch=env_switch
                 )
@@ -44,7 +128,7 @@ def get_switches():
         group_name = group_name.strip()
         switch_name = switch_name.strip()
         if group_name in switches:
-            raise ImproperlyConfigured(
+            raise improperly_configured(
                 "Settings Composer: Switch group access multiple times through environmental variable"
             )
         switches[group_name] = switch_name
@@ -53,3 +137,11 @@ def get_switches():
 
 def is_verbose():
     return os.environ.get(constants.VERBOSE_VARIABLE_NAME, '').strip().lower() in constants.TRUE_VALUES
+
+
+def is_profiling():
+    return os.environ.get(constants.PROFILE_VARIABLE_NAME, '').strip().lower() in constants.TRUE_VALUES
+
+
+def is_evicting_modules():
+    return os.environ.get(constants.EVICT_MODULES_VARIABLE_NAME, '').strip().lower() in constants.TRUE_VALUES
@@ -0,0 +1,86 @@
+import gc
+import sys
+import types
+import weakref
+
+try:
+    import builtins
+except ImportError:  # Python 2
+    import __builtin__ as builtins
+
+from .profiling import deep_sizeof, iter_referents
+
+
+def get_retained_ids(settings):
+    """
+    Return the ids of every object the composed settings still refer to.
+    Functions keep the globals of the module they were defined in alive, so
+    those are included as well.
+    """
+    seen = set([id(builtins), id(vars(builtins))])
+    for value in iter_referents(settings, seen):
+        if isinstance(value, types.FunctionType):
+            seen.add(id(value.__globals__))
+    return seen
+
+
+def get_switch_package_names(definitions):
+    """
+    Return the names of the packages of every module switch. Applying a
+    module switch imports its packages if they aren't in sys.modules, which
+    would run them again and redefine any switches they define.
+    """
+    package_names = set()
+    for switches in definitions.values():
+        for switch in switches.values():
+            definition = switch['definition']
+            if hasattr(definition, 'keys'):  # dictionary
+                continue
+            parts = definition.split('.')
+            package_names.update('.'.join(parts[:index]) for index in range(1, len(parts)))
+    return package_names
+
+
+def evict_settings_modules(module_names, settings):
+    """
+    Remove settings modules from sys.modules (and from their parent packages)
+    once their settings have been composed, so that their globals can be
+    garbage collected. Values copied into the settings are unaffected, and the
+    modules will be imported again if settings are composed again from
+    scratch. Leave out the packages of module switches (see
+    get_switch_package_names) if switches may be applied at runtime.
+
+    Returns a list of (module name, bytes reclaimed) tuples. The size of each
+    module is approximate, and excludes anything the settings still refer to.
+    Modules that are still referenced elsewhere reclaim nothing.
+    """
+    seen = get_retained_ids(settings)
+    evicted = []
+    for module_name in sorted(module_names):
+        module = sys.modules.pop(module_name, None)
+        if module is None:
+            continue
+        parent_name, _, child_name = module_name.rpartition('.')
+        parent = sys.modules.get(parent_name)
+        if parent is not None and getattr(parent, child_name, None) is module:
+            delattr(parent, child_name)
+        size = deep_sizeof(vars(module), seen)
+        evicted.append((module_name, weakref.ref(module), size))
+        del module
+    gc.collect()
+    return [
+        (module_name, 0 if module_reference() is not None else size)
+        for module_name, module_reference, size in evicted
+    ]
+
+
+def format_eviction_report(report):
+    lines = [
+        u"  {0:>10} bytes  {1}".format(size, module_name)
+        for module_name, size in sorted(report, key=lambda item: -item[1])
+    ]
+    lines.append(u"Reclaimed {0} bytes from {1} settings modules".format(
+        sum(size for module_name, size in report),
+        len(report)
+    ))
+    return lines
@@ -0,0 +1,18 @@
+class ImproperlyConfigured(Exception):
+    """
+    Raised in place of Django's ImproperlyConfigured when Django isn't
+    installed.
+    """
+
+
+def improperly_configured(message):
+    """
+    Create an ImproperlyConfigured exception. Django's own exception class is
+    used if Django is installed, but it is only imported once there is an
+    error to raise, so that settings can be composed without importing Django.
+    """
+    try:
+        from django.core.exceptions import ImproperlyConfigured as exception_class
+    except ImportError:
+        exception_class = ImproperlyConfigured
+    return exception_class(message)
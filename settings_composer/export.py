@@ -0,0 +1,210 @@
+import fnmatch
+import json
+import mmap
+import struct
+
+from .sorted_sets import SortedStringSet
+
+
+BINARY_MAGIC = b'SCX1'
+BINARY_HEADER = struct.Struct('<4sI')  # Magic, number of settings
+BINARY_INDEX_ENTRY = struct.Struct('<IIQQ')  # Key offset, key length, value offset, value length
+
+
+def select_settings(settings, patterns=None):
+    """
+    Return a sorted list of (name, value) pairs for the settings matching any
+    of the supplied shell-style patterns. Without patterns, every setting
+    except SETTINGS_COMPOSER_SOURCE is selected.
+    """
+    if patterns:
+        names = [
+            name for name in settings
+            if any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+        ]
+    else:
+        names = [
+            name for name in settings
+            if name.isupper() and name != 'SETTINGS_COMPOSER_SOURCE'
+        ]
+    return [(name, settings[name]) for name in sorted(names)]
+
+
+def _default(value):
+    # Values with no JSON equivalent (classes, paths, etc.) are exported as text
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    if isinstance(value, SortedStringSet):
+        return list(value)
+    return str(value)
+
+
+class JSONSettingsEncoder(object):
+    """
+    Writes settings as a single JSON object. Values are encoded incrementally,
+    so large values are never held in memory as a complete string.
+    """
+
+    binary = False  # Whether the output stream must be opened in binary mode
+
+    def __init__(self):
+        self.value_encoder = json.JSONEncoder(default=_default, separators=(',', ':'))
+
+    def iter_value_chunks(self, value):
+        return self.value_encoder.iterencode(value)
+
+    def encode(self, settings, output):
+        """
+        Write an iterable of (name, value) pairs to a text output stream.
+        """
+        output.write(u'{')
+        for index, (name, value) in enumerate(settings):
+            if index:
+                output.write(u',')
+            output.write(json.dumps(name))
+            output.write(u':')
+            for chunk in self.iter_value_chunks(value):
+                output.write(chunk)
+        output.write(u'}')
+
+
+class BinarySettingsEncoder(JSONSettingsEncoder):
+    """
+    Writes settings in a compact indexed format that SettingsReader can look
+    values up in without parsing the rest of the file:
+
+        header | index (one fixed size entry per setting, sorted by name) |
+        setting names | values (compact JSON)
+
+    The output stream must be binary and seekable, as the index is written
+    once the size of each (streamed) value is known.
+    """
+
+    binary = True
+
+    def encode(self, settings, output):
+        settings = sorted(settings, key=lambda item: item[0])
+        names = [name.encode('utf-8') for name, value in settings]
+        start = output.tell()
+        output.write(BINARY_HEADER.pack(BINARY_MAGIC, len(settings)))
+        index_offset = output.tell()
+        output.write(b'\0' * (BINARY_INDEX_ENTRY.size * len(settings)))
+
+        key_positions = []
+        for name in names:
+            key_positions.append((output.tell() - start, len(name)))
+            output.write(name)
+
+        value_positions = []
+        for name, value in settings:
+            value_offset = output.tell() - start
+            for chunk in self.iter_value_chunks(value):
+                output.write(chunk.encode('utf-8'))
+            value_positions.append((value_offset, output.tell() - start - value_offset))
+
+        end = output.tell()
+        output.seek(index_offset)
+        for key_position, value_position in zip(key_positions, value_positions):
+            output.write(BINARY_INDEX_ENTRY.pack(*(key_position + value_position)))
+        output.seek(end)
+
+
+ENCODERS = {
+    'json': JSONSettingsEncoder,
+    'binary': BinarySettingsEncoder,
+}
+
+
+def register_encoder(format_name, encoder_class):
+    """
+    Make a custom encoder available by format name.
+    """
+    ENCODERS[format_name] = encoder_class
+
+
+def get_encoder(format_name):
+    try:
+        return ENCODERS[format_name]()
+    except KeyError:
+        raise ValueError(
+            "Settings Composer: No such export format '{format_name}'".format(
+                format_name=format_name
+            )
+        )
+
+
+def export_settings(settings, output, format_name='json', patterns=None):
+    """
+    Stream the selected settings to an output stream in the given format.
+    """
+    get_encoder(format_name).encode(select_settings(settings, patterns), output)
+
+
+class SettingsReader(object):
+    """
+    Reads individual settings from a file written by BinarySettingsEncoder.
+    The file is memory-mapped, and each lookup is a binary search of the index
+    followed by decoding only the requested value.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = BINARY_HEADER.unpack_from(self.map, 0)
+        if magic != BINARY_MAGIC:
+            self.close()
+            raise ValueError(
+                "Settings Composer: {path} is not an exported settings file".format(path=path)
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def get_entry(self, index):
+        return BINARY_INDEX_ENTRY.unpack_from(
+            self.map,
+            BINARY_HEADER.size + index * BINARY_INDEX_ENTRY.size
+        )
+
+    def get_name(self, index):
+        key_offset, key_length = self.get_entry(index)[:2]
+        return self.map[key_offset:key_offset + key_length]
+
+    def find(self, name):
+        name = name.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_name(middle) < name:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self.get_name(low) == name:
+            return low
+        return None
+
+    def keys(self):
+        return [self.get_name(index).decode('utf-8') for index in range(self.count)]
+
+    def __contains__(self, name):
+        return self.find(name) is not None
+
+    def __getitem__(self, name):
+        index = self.find(name)
+        if index is None:
+            raise KeyError(name)
+        value_offset, value_length = self.get_entry(index)[2:]
+        return json.loads(self.map[value_offset:value_offset + value_length].decode('utf-8'))
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
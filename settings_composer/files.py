@@ -0,0 +1,186 @@
+import hashlib
+import io
+import json
+import marshal
+import os
+import sys
+
+from . import environment
+
+
+def parse_json(content):
+    return json.loads(content)
+
+
+def parse_toml(content):
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise ValueError(
+                "Settings Composer: TOML files require Python 3.11+ or the tomli package"
+            )
+    return tomllib.loads(content)
+
+
+def parse_dotenv(content):
+    """
+    Parse NAME=value lines, as used by dotenv files. Blank lines, comments and
+    'export' prefixes are ignored, and values are always strings.
+    """
+    settings = {}
+    for lineno, line in enumerate(content.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('export '):
+            line = line[len('export '):].lstrip()
+        name, separator, value = line.partition('=')
+        if not separator:
+            raise ValueError("line {lineno} is not in the form NAME=value".format(lineno=lineno))
+        value = value.strip()
+        if len(value) > 1 and value[0] == value[-1] and value[0] in '"\'':
+            quote, value = value[0], value[1:-1]
+            if quote == '"':
+                value = value.replace('\\n', '\n').replace('\\"', '"')
+        else:
+            value = value.split(' #', 1)[0].rstrip()
+        settings[name.strip()] = value
+    return settings
+
+
+FILE_PARSERS = {
+    '.env': parse_dotenv,
+    '.json': parse_json,
+    '.toml': parse_toml,
+}
+
+
+def register_file_parser(extension, parser):
+    """
+    Make files with the given extension (such as '.yaml') loadable. The parser
+    is passed the decoded content of the file, and returns a dictionary.
+    """
+    FILE_PARSERS[extension] = parser
+
+
+def get_file_parser(path):
+    extension = os.path.splitext(path)[1]
+    if not extension and os.path.basename(path) == '.env':
+        extension = '.env'
+    try:
+        return FILE_PARSERS[extension]
+    except KeyError:
+        raise ValueError(
+            "Settings Composer: No parser for settings file '{path}'".format(path=path)
+        )
+
+
+def find_settings_files(module_name):
+    """
+    Return the paths of any settings files alongside a settings module, such
+    as env/staging.toml next to (or instead of) env/staging.py. The module's
+    package must already have been imported.
+    """
+    package_name, _, name = module_name.rpartition('.')
+    package = sys.modules.get(package_name)
+    paths = []
+    for directory in getattr(package, '__path__', None) or []:
+        for extension in sorted(FILE_PARSERS):
+            path = os.path.join(directory, name + extension)
+            if os.path.isfile(path):
+                paths.append(path)
+    return paths
+
+
+class ParseCache(object):
+    """
+    Caches the parsed content of each settings file against its modification
+    time and size, and (should those change) the hash of its content, so that
+    files are only parsed again once their content changes. If a directory is
+    given, entries are also persisted there, so the cache survives restarts.
+
+    Parsed values are stored marshalled, so that every composition receives
+    its own copy.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.entries = {}
+
+    def get_entry_path(self, path):
+        return os.path.join(
+            self.directory,
+            hashlib.sha1(path.encode('utf-8')).hexdigest() + '.marshal'
+        )
+
+    def get_entry(self, path):
+        entry = self.entries.get(path)
+        if entry is None and self.directory:
+            try:
+                with open(self.get_entry_path(path), 'rb') as entry_file:
+                    entry = marshal.load(entry_file)
+            except (IOError, OSError, EOFError, ValueError, TypeError):
+                entry = None
+        return entry
+
+    def set_entry(self, path, entry):
+        self.entries[path] = entry
+        if self.directory:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            temporary_path = self.get_entry_path(path) + '.tmp'
+            with open(temporary_path, 'wb') as entry_file:
+                marshal.dump(entry, entry_file)
+            os.rename(temporary_path, self.get_entry_path(path))
+
+    def read(self, path, parser):
+        stat = os.stat(path)
+        entry = self.get_entry(path)
+        if entry is not None and (entry['mtime'], entry['size']) == (stat.st_mtime, stat.st_size):
+            return marshal.loads(entry['values'])
+        with io.open(path, 'rb') as settings_file:
+            content = settings_file.read()
+        content_hash = hashlib.sha1(content).hexdigest()
+        if entry is not None and entry['hash'] == content_hash:
+            values = marshal.loads(entry['values'])
+        else:
+            try:
+                values = parser(content.decode('utf-8'))
+            except ValueError as error:
+                raise ValueError(
+                    "Settings Composer: Can't parse '{path}': {error}".format(path=path, error=error)
+                )
+        try:
+            marshalled_values = marshal.dumps(values)
+        except ValueError:
+            return values  # Values (such as TOML dates) that can't be cached
+        self.set_entry(path, {
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'hash': content_hash,
+            'values': marshalled_values,
+        })
+        return values
+
+
+_parse_cache = None
+
+
+def get_parse_cache():
+    global _parse_cache
+    directory = environment.get_file_cache_dir()
+    if _parse_cache is None or _parse_cache.directory != directory:
+        _parse_cache = ParseCache(directory)
+    return _parse_cache
+
+
+def read_settings_file(path):
+    """
+    Return the settings (uppercase names only, as with modules) from a JSON,
+    TOML or dotenv file.
+    """
+    values = get_parse_cache().read(path, get_file_parser(path))
+    return dict((name, value) for name, value in values.items() if name.isupper())
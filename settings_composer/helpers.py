@@ -1,7 +1,11 @@
 import importlib    
+import os
+import re
+import stat
 import sys
 
 from . import environment
+from .exceptions import improperly_configured
 
 
 def output_if_verbose(headline, *list_items):
@@ -14,14 +18,23 @@ def output_if_verbose(headline, *list_items):
             sys.stdout.write(list_item + '\n')
 
 
-def load_settings_module(module_name):
+def load_settings_module(module_name, prefetched=None):
+    """
+    Import (or re-import) a settings module, returning None if it doesn't
+    exist. If the module has been prefetched, its prefetched spec and code
+    should be passed in.
+    """
     reload_module = False
     if module_name in sys.modules:
         # Ensure the module is loaded fresh
         reload_module = True
     try:
-        module = importlib.import_module(module_name)
-        if reload_module:
+        if prefetched is not None:
+            from .prefetch import run_prefetched_module
+            module = run_prefetched_module(module_name, *prefetched)
+        else:
+            module = importlib.import_module(module_name)
+        if reload_module and prefetched is None:
             # Python3
             try:
                 reload(module)
@@ -39,9 +52,104 @@ def load_settings_module(module_name):
     return module
 
 
+def get_private_dir(name):
+    """
+    Return a directory (created if necessary) within a directory of the
+    temporary directory that belongs to the current user, for files that
+    other users mustn't be able to read or replace. Both directories are
+    checked to be owned by the current user and inaccessible to anyone else.
+    """
+    import tempfile
+    try:
+        user_id = os.getuid()
+    except AttributeError:  # Windows, where the temporary directory is per-user
+        user_id = None
+    user_dir = os.path.join(
+        tempfile.gettempdir(),
+        'settings_composer-{user}'.format(user=user_id if user_id is not None else 'user')
+    )
+    private_dir = os.path.join(user_dir, name)
+    for path in (user_dir, private_dir):
+        try:
+            os.mkdir(path, 0o700)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+        if user_id is not None:
+            path_stat = os.lstat(path)
+            if (not stat.S_ISDIR(path_stat.st_mode) or path_stat.st_uid != user_id
+                    or path_stat.st_mode & 0o077):
+                raise improperly_configured(
+                    "Settings Composer: {path} must be a directory that only the current user can access".format(
+                        path=path
+                    )
+                )
+    return private_dir
+
+
 def get_settings_from_module(module):
     settings = {}
     for name in dir(module):
         if name.isupper():  # As per Django convention
             settings[name] = getattr(module, name)
     return settings
+
+
+def _canonical(value, strict=False):
+    """
+    Reduce a setting value to nested tuples of primitives, so that equal
+    settings produce equal hashes, even across processes.
+
+    Functions are identified by name, and objects with no other
+    representation by their repr. If strict, functions are also identified
+    by their code (and closure, and the object they are bound to), and
+    ValueError is raised rather than falling back to a repr.
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return (type(value).__name__, value)
+    if isinstance(value, (bytes, type(u''))):
+        return (type(value).__name__, value)
+    if hasattr(value, 'keys'):
+        return ('dict', tuple(sorted(
+            ((repr(_canonical(key, strict)), _canonical(item, strict)) for key, item in value.items()),
+            key=lambda pair: pair[0]
+        )))
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__, tuple(_canonical(item, strict) for item in value))
+    if isinstance(value, (set, frozenset)):
+        return ('set', tuple(sorted(repr(_canonical(item, strict)) for item in value)))
+    if hasattr(value, '__qualname__') or hasattr(value, '__name__'):
+        # Classes and functions are identified by name, not by memory address
+        name = ('object', getattr(value, '__module__', ''), getattr(value, '__qualname__', value.__name__))
+        code = getattr(value, '__code__', None)
+        if not strict or code is None:
+            return name
+        closure = tuple(cell.cell_contents for cell in getattr(value, '__closure__', None) or ())
+        return name + (
+            _canonical_code(code),
+            _canonical(closure, strict),
+            _canonical(getattr(value, '__self__', None), strict),
+        )
+    if strict:
+        raise ValueError(
+            "Settings Composer: {value!r} can only be identified by its repr".format(value=value)
+        )
+    return ('object', type(value).__module__, type(value).__name__, re.sub(' at 0x[0-9a-fA-F]+', '', repr(value)))
+
+
+def _canonical_code(code):
+    return ('code', code.co_code, code.co_names, tuple(
+        _canonical_code(const) if hasattr(const, 'co_code') else _canonical(const, strict=True)
+        for const in code.co_consts
+    ))
+
+
+def content_hash(value, strict=False):
+    """
+    Return a stable hash of a setting value (or a dictionary of settings)
+    based on its content. If strict, functions are hashed by their code too,
+    and ValueError is raised for any object that can only be identified by
+    its repr.
+    """
+    import hashlib
+    return hashlib.sha1(repr(_canonical(value, strict)).encode('utf-8')).hexdigest()
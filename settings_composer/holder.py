@@ -0,0 +1,127 @@
+import importlib
+import os
+import time
+
+from .exceptions import improperly_configured
+
+
+SOURCE_SETTING_NAME = 'SETTINGS_COMPOSER_SOURCE'
+
+# Settings Django requires to be lists or tuples
+TUPLE_SETTING_NAMES = ('INSTALLED_APPS', 'TEMPLATE_DIRS', 'LOCALE_PATHS')
+
+
+class ComposedSettings(object):
+    """
+    Serves Django settings straight from a composed settings dictionary, as
+    the default settings of django.conf.settings.configure(), so that nothing
+    is copied into a Django Settings object. Settings that weren't composed
+    fall back to Django's global defaults.
+
+    SETTINGS_COMPOSER_SOURCE is only available through get_source(). Settings
+    changed at runtime (including with override_settings) are held by
+    Django's UserSettingsHolder in front of this, as with any configured
+    settings, so the composed dictionary is never modified.
+    """
+
+    def __init__(self, settings, default_settings=None):
+        self.__dict__['_settings'] = settings
+        self.__dict__['_default_settings'] = default_settings
+
+    def _get_default_settings(self):
+        if self._default_settings is None:
+            from django.conf import global_settings
+            self.__dict__['_default_settings'] = global_settings
+        return self._default_settings
+
+    def __getattr__(self, name):
+        if not name.isupper() or name == SOURCE_SETTING_NAME:
+            raise AttributeError(name)
+        try:
+            return self._settings[name]
+        except KeyError:
+            return getattr(self._get_default_settings(), name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(
+            "Settings Composer: Composed settings can't be changed (set {name} on django.conf.settings instead)".format(
+                name=name
+            )
+        )
+
+    def __dir__(self):
+        names = set(name for name in dir(self._get_default_settings()) if name.isupper())
+        names.update(name for name in self._settings if name.isupper())
+        names.discard(SOURCE_SETTING_NAME)
+        return sorted(names)
+
+    def is_overridden(self, setting):
+        return setting in self._settings and setting != SOURCE_SETTING_NAME
+
+    def get_source(self, name=None):
+        """
+        Return the sources of a setting, or of every setting if no name is
+        given.
+        """
+        settings_source = self._settings.get(SOURCE_SETTING_NAME, {})
+        if name is None:
+            return settings_source
+        return settings_source.get(name, [])
+
+    def __repr__(self):
+        return '<ComposedSettings>'
+
+
+def check_settings(composed_settings):
+    """
+    Make the checks (and changes) Django makes when it loads a settings
+    module, as configured settings skip them.
+    """
+    for name in TUPLE_SETTING_NAMES:
+        value = getattr(composed_settings, name, ())
+        if not isinstance(value, (list, tuple)):
+            raise improperly_configured(
+                "Settings Composer: The {name} setting must be a list or a tuple.".format(name=name)
+            )
+    if not getattr(composed_settings, 'SECRET_KEY', None):
+        raise improperly_configured("Settings Composer: The SECRET_KEY setting must not be empty.")
+    time_zone = composed_settings.TIME_ZONE
+    if hasattr(time, 'tzset') and time_zone:
+        zoneinfo_root = '/usr/share/zoneinfo'
+        if os.path.exists(zoneinfo_root) and not os.path.exists(os.path.join(zoneinfo_root, *time_zone.split('/'))):
+            raise ValueError("Incorrect timezone setting: {time_zone}".format(time_zone=time_zone))
+        os.environ['TZ'] = time_zone
+        time.tzset()
+
+
+def configure_settings(settings=None):
+    """
+    Configure django.conf.settings to serve composed settings without copying
+    them. By default, the settings are composed (as settings_composer.settings
+    composes them). Call this before django.setup(), in place of setting
+    DJANGO_SETTINGS_MODULE. Returns the ComposedSettings.
+    """
+    from django.conf import settings as django_settings
+    if settings is None:
+        settings = vars(importlib.import_module('settings_composer.settings'))
+    composed_settings = ComposedSettings(settings)
+    check_settings(composed_settings)
+    django_settings.configure(default_settings=composed_settings)
+    return composed_settings
+
+
+def get_settings_source(name=None):
+    """
+    Return the sources of a Django setting (or of every setting), whether
+    the settings were configured with configure_settings or loaded through
+    DJANGO_SETTINGS_MODULE.
+    """
+    from django.conf import settings as django_settings
+    holder = django_settings._wrapped
+    # Overridden settings are held in front of the settings they override
+    while holder is not None and not isinstance(holder, ComposedSettings):
+        holder = getattr(holder, 'default_settings', None)
+    if holder is not None:
+        return holder.get_source(name)
+    settings_source = getattr(django_settings, SOURCE_SETTING_NAME, {})
+    return settings_source if name is None else settings_source.get(name, [])
@@ -1,16 +1,20 @@
 from . import settings_manager
 from . import environment
+from . import sites
+from .eviction import evict_settings_modules, format_eviction_report, get_switch_package_names
 from .helpers import output_if_verbose
 
 
-def collate_settings_modules():
+def collate_settings_modules(site=None):
     """
     Create a list of of settings modules to load, in order, based on settings
-    module, site, environment and switch variables.
+    module, site, environment and switch variables. The site variable can be
+    overridden by passing in a site name.
     """
     settings_module = environment.get_settings_module_name()
     env = environment.get_env_name()
-    site = environment.get_site_name()
+    if site is None:
+        site = environment.get_site_name()
     switches = environment.get_switches()
 
     output_if_verbose(
@@ -51,6 +55,79 @@ def collate_settings_modules():
 
 
 def collect_settings(target_settings):
-    settings_manager.bind(target_settings)
-    settings_manager.apply_settings_modules(collate_settings_modules())
+    if environment.get_site_names():
+        collect_site_settings(target_settings, environment.get_site_names())
+    elif fetch_daemon_settings(target_settings):
+        # No settings modules were loaded by this process, so none are evicted
+        return
+    else:
+        settings_manager.bind(target_settings)
+        settings_manager.apply_settings_modules(collate_settings_modules())
+        settings_manager.unbind()
+    if environment.is_evicting_modules():
+        evict_loaded_modules(target_settings)
+
+
+def fetch_daemon_settings(target_settings):
+    """
+    Fetch settings already composed by a settings daemon, if one has been
+    configured. Returns whether settings were fetched.
+    """
+    socket_path = environment.get_daemon_socket_path()
+    if not socket_path:
+        return False
+    # Only imported when a daemon is used
+    from .daemon import fetch_settings
+    settings = fetch_settings(socket_path, environment.get_composition_context())
+    if settings is None:
+        return False
+    output_if_verbose(u"Fetched settings from settings daemon at " + socket_path)
+    target_settings.update(settings)
+    # The switch history (and merge strategies and schema) of any earlier
+    # composition doesn't apply
+    settings_manager.switch_history = None
+    settings_manager.merge_strategies = None
+    settings_manager.schema = None
+    return True
+
+
+def evict_loaded_modules(target_settings):
+    """
+    Drop the settings modules loaded by the last composition from memory,
+    except the packages of module switches, which are kept so that switches
+    can still be applied at runtime. Returns a list of (module name, bytes
+    reclaimed) tuples.
+    """
+    module_names = settings_manager.loaded_module_names - get_switch_package_names(
+        settings_manager.switch_history.definitions
+    )
+    report = evict_settings_modules(module_names, target_settings)
+    output_if_verbose("Evicted settings modules", *format_eviction_report(report))
+    return report
+
+
+def collect_site_settings(target_settings, site_names):
+    """
+    Compose the settings for several sites at once, and make them available
+    through settings_composer.sites.settings. The target settings receive the
+    settings of the default site: the site variable if it is one of the sites,
+    otherwise the first site.
+    """
+    shared_module_names = collate_settings_modules(site='')
+    site_module_names = [
+        (site_name, collate_settings_modules(site=site_name)[len(shared_module_names):])
+        for site_name in site_names
+    ]
+    settings_manager.bind({})
+    site_settings = settings_manager.apply_site_settings_modules(
+        shared_module_names,
+        site_module_names
+    )
     settings_manager.unbind()
+
+    default_site_name = environment.get_site_name()
+    if default_site_name not in site_settings:
+        default_site_name = site_names[0]
+    store = sites.SiteSettingsStore(site_settings)
+    sites.settings.install(store, default_site_name)
+    target_settings.update(store.get_settings(default_site_name))
@@ -0,0 +1,66 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from settings_composer import constants, environment
+from settings_composer.analysis import SettingsTreeAnalyser
+
+from .check_settings_tree import add_cache_arguments, get_cache_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the site/environment permutations whose composition could be "
+        "affected by changes to the given files, one per line as environment "
+        "variable assignments. A permutation depends on the modules it loads "
+        "(directly, with load() or through module switches, including those "
+        "only applied by SETTINGS_COMPOSER_SWITCHES), their packages, and "
+        "their settings files. Settings modules are parsed, not executed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help="The changed files. Use '-' to read them from stdin, one per line."
+        )
+        parser.add_argument(
+            '--module', '-m',
+            dest='module',
+            help=(
+                "The settings package to check. Defaults to whatever "
+                "SETTINGS_COMPOSER_MODULE is set to."
+            )
+        )
+        parser.add_argument(
+            '--graph',
+            dest='graph',
+            action='store_true',
+            help="Print the dependency graph of every permutation as JSON instead."
+        )
+        add_cache_arguments(parser)
+
+    def handle(self, **options):
+        module_name = options['module'] or environment.get_settings_module_name()
+        try:
+            analyser = SettingsTreeAnalyser(module_name, cache_path=get_cache_path(options))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['graph']:
+            self.stdout.write(json.dumps(analyser.get_dependency_graphs(), indent=2, sort_keys=True))
+            return
+
+        paths = options['paths']
+        if paths == ['-']:
+            paths = [line.strip() for line in sys.stdin if line.strip()]
+        for site, env in analyser.get_affected_permutations(paths):
+            self.stdout.write(
+                u"{site_variable}={site} {env_variable}={env}".format(
+                    site_variable=constants.SITE_VARIABLE_NAME,
+                    site=site,
+                    env_variable=constants.ENV_VARIABLE_NAME,
+                    env=env
+                )
+            )
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from settings_composer import environment
+from settings_composer.matrix import build_settings_matrix
+
+
+class Command(BaseCommand):
+    help = (
+        "Compose every site/environment permutation of the settings package, "
+        "and store the results by setting in a compact file, which "
+        "query_settings_matrix can answer questions about without composing "
+        "anything. Switches set through SETTINGS_COMPOSER_SWITCHES are applied "
+        "to every permutation."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o',
+            dest='output',
+            required=True,
+            help="File to write the matrix to."
+        )
+        parser.add_argument(
+            '--module', '-m',
+            dest='module',
+            help=(
+                "The settings package to compose. Defaults to whatever "
+                "SETTINGS_COMPOSER_MODULE is set to."
+            )
+        )
+
+    def handle(self, **options):
+        module_name = options['module'] or environment.get_settings_module_name()
+        try:
+            matrix = build_settings_matrix(module_name)
+        except ValueError as e:
+            raise CommandError(str(e))
+        matrix.save(options['output'])
+        for row, error in sorted(matrix.errors.items()):
+            site, env = matrix.permutations[row]
+            self.stderr.write(u"site={site} env={env} failed to compose: {error}".format(
+                site=site,
+                env=env,
+                error=error
+            ))
+        self.stdout.write(
+            u"Stored {settings} settings with {values} distinct values from {permutations} permutations in {output}".format(
+                settings=len(matrix.columns),
+                values=len(matrix.values),
+                permutations=len(matrix.permutations),
+                output=options['output']
+            )
+        )
@@ -0,0 +1,96 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from settings_composer import environment
+from settings_composer.analysis import SettingsTreeAnalyser
+from settings_composer.helpers import get_private_dir
+
+
+def get_cache_path(options):
+    """
+    Return the analysis cache file given by the command's options, which
+    defaults to one in a directory private to the current user.
+    """
+    if options['no_cache']:
+        return None
+    return options['cache'] or os.path.join(get_private_dir('analysis'), 'analysis.json')
+
+
+def add_cache_arguments(parser):
+    parser.add_argument(
+        '--cache',
+        dest='cache',
+        help=(
+            "File used to cache the analysis of each settings module. Defaults "
+            "to a file in a temporary directory private to the current user."
+        )
+    )
+    parser.add_argument(
+        '--no-cache',
+        dest='no_cache',
+        action='store_true',
+        help="Analyse every settings module from scratch."
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Statically check every site/environment permutation of a Settings "
+        "Composer settings package without executing any settings modules. "
+        "Reports undefined and duplicate switches, modifications of settings "
+        "that are not yet defined, and modules that no permutation loads. "
+        "Exits with an error if any problems are found."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--module', '-m',
+            dest='module',
+            help=(
+                "The settings package to check. Defaults to whatever "
+                "SETTINGS_COMPOSER_MODULE is set to."
+            )
+        )
+        add_cache_arguments(parser)
+        parser.add_argument(
+            '--allow-unreachable',
+            dest='allow_unreachable',
+            action='store_true',
+            help="Report unreachable modules without treating them as errors."
+        )
+
+    def handle(self, **options):
+        module_name = options['module'] or environment.get_settings_module_name()
+        try:
+            analyser = SettingsTreeAnalyser(module_name, cache_path=get_cache_path(options))
+        except ValueError as e:
+            raise CommandError(str(e))
+        issues, unreachable_modules = analyser.check()
+
+        for issue, permutations in sorted(issues.items()):
+            self.stdout.write(
+                u"{module_name}:{lineno}: [{kind}] {message}".format(**issue._asdict())
+            )
+            for site, env in permutations:
+                self.stdout.write(
+                    u"    site: {site}, env: {env}".format(
+                        site=site or '<none>',
+                        env=env or '<none>'
+                    )
+                )
+        for module_name in unreachable_modules:
+            self.stdout.write(
+                u"{module_name}: [unreachable] Not loaded by any permutation".format(
+                    module_name=module_name
+                )
+            )
+
+        error_count = len(issues)
+        if not options['allow_unreachable']:
+            error_count += len(unreachable_modules)
+        if error_count:
+            raise CommandError(
+                "Found {count} problem(s) in the settings tree".format(count=error_count)
+            )
+        self.stdout.write(u"No problems found in the settings tree")
@@ -0,0 +1,79 @@
+import io
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from settings_composer import constants
+from settings_composer.export import ENCODERS, export_settings
+from settings_composer.loading import collect_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Compose settings once and export them to a file, for use by processes "
+        "that cannot (or should not) boot Django. The 'binary' format can be "
+        "read with settings_composer.export.SettingsReader, which looks up "
+        "individual settings without parsing the whole file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o',
+            dest='output',
+            help="File to write to. Defaults to stdout (JSON only)."
+        )
+        parser.add_argument(
+            '--format', '-f',
+            dest='format',
+            default='json',
+            choices=sorted(ENCODERS),
+        )
+        parser.add_argument(
+            '--key', '-k',
+            dest='keys',
+            action='append',
+            help=(
+                "Name of a setting to export. Shell-style wildcards are "
+                "allowed, and the option can be repeated. Defaults to all "
+                "settings except SETTINGS_COMPOSER_SOURCE."
+            )
+        )
+        parser.add_argument('--module', '-m', dest='module')
+        parser.add_argument('--site', '-s', dest='site')
+        parser.add_argument('--env', '-e', dest='env')
+        parser.add_argument('--switches', '-S', dest='switches', action='append')
+
+    def handle(self, **options):
+        if options['module']:
+            os.environ[constants.SETTINGS_MODULE_VARIABLE_NAME] = options['module']
+        if options['site']:
+            os.environ[constants.SITE_VARIABLE_NAME] = options['site']
+        if options['env']:
+            os.environ[constants.ENV_VARIABLE_NAME] = options['env']
+        if options['switches']:
+            os.environ[constants.SWITCHES_VARIABLE_NAME] = u','.join(options['switches'])
+
+        settings = {}
+        collect_settings(settings)
+
+        binary = ENCODERS[options['format']].binary
+        if options['output'] is None:
+            if binary:
+                raise CommandError("An output file is required for the '{0}' format".format(options['format']))
+            export_settings(settings, sys.stdout, options['format'], options['keys'])
+            sys.stdout.write('\n')
+            return
+
+        # Write to a temporary file first, so readers never see a partial export
+        temporary_path = options['output'] + '.tmp'
+        if binary:
+            output = io.open(temporary_path, 'wb')
+        else:
+            output = io.open(temporary_path, 'w', encoding='utf-8')
+        with output:
+            export_settings(settings, output, options['format'], options['keys'])
+        os.rename(temporary_path, options['output'])
+        self.stdout.write(
+            u"Exported settings to {output}".format(output=options['output'])
+        )
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+
+from settings_composer.planning import (
+    build_switch_effect_index,
+    dedupe_switch_combinations,
+    format_switches,
+    plan_switch_combinations
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the smallest set of switch combinations that covers every "
+        "distinct interaction between switch groups, one per line in the "
+        "format used by SETTINGS_COMPOSER_SWITCHES. Groups whose switches "
+        "touch unrelated settings are not multiplied together, and "
+        "combinations that produce identical settings are dropped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--group', '-g',
+            dest='groups',
+            action='append',
+            help="Only vary this switch group (can be repeated). Defaults to all groups."
+        )
+        parser.add_argument(
+            '--no-dedupe',
+            dest='dedupe',
+            action='store_false',
+            help="Don't compose each combination to remove duplicates."
+        )
+        parser.add_argument(
+            '--show-effects',
+            dest='show_effects',
+            action='store_true',
+            help="Also print the settings each switch reads and writes."
+        )
+
+    def handle(self, **options):
+        index = build_switch_effect_index()
+        if options['show_effects']:
+            for group_name, switch_names in sorted(index.groups.items()):
+                for switch_name in switch_names:
+                    self.stderr.write(
+                        u"{group_name}:{switch_name} reads [{reads}] writes [{writes}]".format(
+                            group_name=group_name,
+                            switch_name=switch_name,
+                            reads=u', '.join(sorted(index.reads[(group_name, switch_name)])),
+                            writes=u', '.join(sorted(index.writes[(group_name, switch_name)]))
+                        )
+                    )
+            for component in index.get_interacting_groups():
+                self.stderr.write(u"Interacting groups: " + u', '.join(component))
+
+        combinations = plan_switch_combinations(index, options['groups'])
+        if options['dedupe']:
+            combinations = [
+                combination for combination, combination_hash
+                in dedupe_switch_combinations(combinations)
+            ]
+        for combination in combinations:
+            self.stdout.write(format_switches(combination))
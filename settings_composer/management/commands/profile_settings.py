@@ -0,0 +1,65 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from settings_composer import constants, settings_manager
+from settings_composer.eviction import format_eviction_report
+from settings_composer.loading import collect_settings, evict_loaded_modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Compose settings with profiling enabled, and report how long each "
+        "settings module took to apply and how large each setting is. Each "
+        "setting's size is attributed to the source of its final value. Fails "
+        "if the composition exceeds any of the given budgets."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', '-l',
+            dest='limit',
+            type=int,
+            default=None,
+            help="Only report the slowest modules and largest settings."
+        )
+        parser.add_argument(
+            '--max-time',
+            dest='max_time',
+            type=float,
+            default=None,
+            help="Fail if composition takes longer than this many seconds."
+        )
+        parser.add_argument(
+            '--max-setting-size',
+            dest='max_setting_size',
+            type=int,
+            default=None,
+            help="Fail if any setting is larger than this many bytes."
+        )
+        parser.add_argument(
+            '--evict',
+            dest='evict',
+            action='store_true',
+            help="Also evict the settings modules, and report the memory reclaimed."
+        )
+
+    def handle(self, **options):
+        os.environ[constants.PROFILE_VARIABLE_NAME] = 'true'
+        settings = {}
+        collect_settings(settings)
+        profile = settings_manager.profile
+
+        for line in profile.format_report(options['limit']):
+            self.stdout.write(line)
+        if options['evict']:
+            for line in format_eviction_report(evict_loaded_modules(settings)):
+                self.stdout.write(line)
+
+        violations = profile.check_budgets(options['max_time'], options['max_setting_size'])
+        if violations:
+            for violation in violations:
+                self.stderr.write(violation)
+            raise CommandError(
+                "{count} budget(s) exceeded".format(count=len(violations))
+            )
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from settings_composer.matrix import NOT_SET, SettingsMatrix, encode_value, parse_condition
+
+
+class Command(BaseCommand):
+    help = (
+        "Group the permutations stored by build_settings_matrix by the "
+        "distinct values of a setting, such as 'CACHES.default.BACKEND' (a "
+        "setting name, optionally followed by a dotted path into its value), "
+        "'site' or 'env'. For example, to see which sites have a different "
+        "cache backend in production: "
+        "query_settings_matrix matrix.gz CACHES.default.BACKEND --where env=production --show site"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('matrix', help="File written by build_settings_matrix.")
+        parser.add_argument('name', help="The setting (path), site or env to group by.")
+        parser.add_argument(
+            '--where', '-w',
+            dest='conditions',
+            action='append',
+            default=[],
+            help=(
+                "Only include permutations where a setting (path), site or env "
+                "has a value, given as name=value. The value is parsed as JSON "
+                "if possible. Can be repeated."
+            )
+        )
+        parser.add_argument(
+            '--show',
+            dest='show',
+            default='permutations',
+            choices=['permutations', 'site', 'env', 'count'],
+            help="What to list for each distinct value."
+        )
+
+    def handle(self, **options):
+        try:
+            matrix = SettingsMatrix.load(options['matrix'])
+            conditions = [parse_condition(condition) for condition in options['conditions']]
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        groups = matrix.group_by(options['name'], conditions)
+        for value, rows in groups:
+            self.stdout.write(u"{count} x {value}".format(
+                count=len(rows),
+                value=u'(not set)' if value is NOT_SET else encode_value(value)
+            ))
+            if options['show'] == 'permutations':
+                for row in rows:
+                    site, env = matrix.permutations[row]
+                    self.stdout.write(u"    site={site} env={env}".format(site=site, env=env))
+            elif options['show'] != 'count':
+                index = 0 if options['show'] == 'site' else 1
+                names = sorted(set(matrix.permutations[row][index] for row in rows))
+                self.stdout.write(u"    " + u', '.join(name or u"''" for name in names))
+        self.stdout.write(u"{count} distinct value(s) across {rows} permutation(s)".format(
+            count=len(groups),
+            rows=sum(len(rows) for value, rows in groups)
+        ))
+        if matrix.errors:
+            self.stderr.write(u"{count} permutation(s) failed to compose and are left out".format(
+                count=len(matrix.errors)
+            ))
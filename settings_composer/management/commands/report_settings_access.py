@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from settings_composer import environment
+from settings_composer.loading import collect_settings
+from settings_composer.tracking import get_unread_settings, read_access_log
+
+
+class Command(BaseCommand):
+    help = (
+        "Report the settings that have never been read, grouped by the source "
+        "of their value, using the access log written by processes run with "
+        "SETTINGS_COMPOSER_ACCESS_SAMPLE_RATE set."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log', '-l',
+            dest='log',
+            default=environment.get_access_log_path(),
+            help="Access log to read. Defaults to SETTINGS_COMPOSER_ACCESS_LOG."
+        )
+        parser.add_argument(
+            '--show-read',
+            dest='show_read',
+            action='store_true',
+            help="Also list the (estimated) number of reads of each setting that was read."
+        )
+
+    def handle(self, **options):
+        access_log = read_access_log(options['log'])
+        settings = {}
+        collect_settings(settings)
+
+        unread_settings = get_unread_settings(settings, access_log)
+        for source_name, names in sorted(unread_settings.items()):
+            self.stdout.write(source_name)
+            for name in names:
+                self.stdout.write(u"  " + name)
+
+        if options['show_read']:
+            for name, entry in sorted(access_log.items(), key=lambda item: -item[1]['count']):
+                self.stdout.write(u"{count:>10}  {name}".format(count=entry['count'], name=name))
+
+        self.stdout.write(
+            u"{unread} of {total} settings have not been read".format(
+                unread=sum(len(names) for names in unread_settings.values()),
+                total=len([name for name in settings if name != 'SETTINGS_COMPOSER_SOURCE'])
+            )
+        )
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from settings_composer import environment
+from settings_composer.daemon import SettingsDaemon
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a settings daemon, which keeps composed settings warm for each "
+        "combination of settings composer variables it is asked for, and "
+        "serves them over a Unix socket. Processes started with "
+        "SETTINGS_COMPOSER_DAEMON_SOCKET set fetch their settings from it, "
+        "and compose them as normal if it is unavailable. Settings are "
+        "recomposed whenever the files they were composed from change."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--socket', '-s',
+            dest='socket',
+            default=environment.get_daemon_socket_path(),
+            help="Path of the socket to listen on. Defaults to SETTINGS_COMPOSER_DAEMON_SOCKET."
+        )
+        parser.add_argument(
+            '--poll-interval',
+            dest='poll_interval',
+            type=float,
+            default=1.0,
+            help="Seconds between checks for changed settings files while idle."
+        )
+
+    def handle(self, **options):
+        if not options['socket']:
+            raise CommandError("No socket given, and SETTINGS_COMPOSER_DAEMON_SOCKET isn't set")
+        daemon = SettingsDaemon(options['socket'], options['poll_interval']).start()
+        self.stdout.write(u"Serving settings on " + options['socket'])
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            daemon.close()
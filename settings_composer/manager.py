@@ -1,4 +1,6 @@
-from collections import deque
+import copy
+import functools
+import threading
 
 from .helpers import (
     load_settings_module,
@@ -19,45 +21,144 @@ ACTION_NAMES = [
     'clean'
 ]
 
+# Actions processed once a module's own settings have been applied, in order
+STANDARD_ACTION_NAMES = [
+    'set',
+    'create_switch',
+    'apply_switch',
+    'extend_setting',
+    'update_setting',
+    'exclude_from_setting',
+]
+
+CUSTOM_ACTION_HANDLERS = {}
+
+
+def register_action(action_name, handler):
+    """
+    Add a custom action type. Actions are added with
+    settings_manager.add_action(action_name, **kwargs), and are processed after
+    the standard actions from the same context, by calling
+    handler(settings_manager, source_name, **kwargs). Actions can be
+    registered at any time, even while settings are being composed.
+    """
+    if action_name in ACTION_NAMES:
+        raise ValueError(
+            "Settings Composer: Action '{action_name}' already exists".format(
+                action_name=action_name
+            )
+        )
+    ACTION_NAMES.insert(ACTION_NAMES.index('clean'), action_name)
+    STANDARD_ACTION_NAMES.append(action_name)
+    CUSTOM_ACTION_HANDLERS[action_name] = handler
+
+
+def unregister_action(action_name):
+    """
+    Remove a custom action type added with register_action.
+    """
+    if action_name not in CUSTOM_ACTION_HANDLERS:
+        raise ValueError(
+            "Settings Composer: Action '{action_name}' is not a custom action".format(
+                action_name=action_name
+            )
+        )
+    ACTION_NAMES.remove(action_name)
+    STANDARD_ACTION_NAMES.remove(action_name)
+    del CUSTOM_ACTION_HANDLERS[action_name]
+
+
+class ActionContextLayer(object):
+    """
+    The actions added within a single context. A queue is only created for an
+    action type once an action of that type is added.
+    """
+    __slots__ = ('context_name', 'action_queues', 'consumed_names')
+
+    def __init__(self, context_name):
+        self.context_name = context_name
+        self.action_queues = {}
+        self.consumed_names = set()
+
+    def copy(self):
+        layer = ActionContextLayer(self.context_name)
+        layer.action_queues = dict(
+            (action_name, list(action_queue))
+            for action_name, action_queue in self.action_queues.items()
+        )
+        layer.consumed_names = set(self.consumed_names)
+        return layer
+
 
 class ActionContextManager(object):
     """
     Maintains a collection of named action queues, which are stored in a series
     of context layers.
 
-    Contexts can be added, creating a new set of action queues.
+    Contexts can be added, creating a new layer of (initially empty) queues.
 
-    Actions are consumed by removing the most recent context layer (FILO), and
-    returning the actions in the order they were added (FIFO).
+    Actions of each name are consumed by removing them from the most recent
+    context layer they have not yet been consumed from (FILO), and returning
+    them in the order they were added (FIFO). Layers are discarded once every
+    action name has been consumed from them.
 
     Actions are always added to the current context layer.
     """
 
     def __init__(self, action_names):
         self.action_names = action_names
-        self.action_context_layers = {
-            action_name: []
-            for action_name in self.action_names
-        }
+        self.layers = []
 
     def create_context_layer(self, context_name):
-        for action_name in self.action_names:
-            self.action_context_layers[action_name].append((context_name, deque()))
+        layer = ActionContextLayer(context_name)
+        self.layers.append(layer)
+        return layer
+
+    def get_layer(self, name):
+        """
+        Return the most recent layer that actions of the given name have not
+        been consumed from, or None.
+        """
+        for layer in reversed(self.layers):
+            if name not in layer.consumed_names:
+                return layer
+        return None
 
     def add_action(self, name, **kwargs):
-        self.action_context_layers[name][-1][1].appendleft(kwargs)
+        if name not in self.action_names:
+            raise KeyError(name)
+        self.get_layer(name).action_queues.setdefault(name, []).append(kwargs)
+
+    def pop_actions(self, name, layer=None):
+        """
+        Consume the actions of the given name from a layer (by default the
+        most recent one they can be consumed from), returning them (paired with
+        the context name) in the order they were added.
+        """
+        if layer is None:
+            layer = self.get_layer(name)
+        if layer is None or name in layer.consumed_names:
+            return []
+        layer.consumed_names.add(name)
+        actions = layer.action_queues.pop(name, ())
+        while self.layers and len(self.layers[-1].consumed_names) == len(self.action_names):
+            self.layers.pop()
+        return [(layer.context_name, action) for action in actions]
 
     def consume_actions(self, name):
-        if len(self.action_context_layers[name]):
-            context_name, action_queue = self.action_context_layers[name].pop()
-            while len(action_queue):
-                yield context_name, action_queue.pop()
+        for context_name, action in self.pop_actions(name):
+            yield context_name, action
 
     def consume_all_actions(self, name):
-        while len(self.action_context_layers[name]):
+        while self.get_layer(name) is not None:
             for context_name, action in self.consume_actions(name):
                 yield context_name, action
 
+    def copy(self):
+        action_manager = ActionContextManager(self.action_names)
+        action_manager.layers = [layer.copy() for layer in self.layers]
+        return action_manager
+
 
 class SettingsManager(object):
     """
@@ -65,11 +166,32 @@ class SettingsManager(object):
     through direct definition in modules, or by processing actions executed
     within those modules.
     """
+    # Attributes that remain available once the manager has been unbound
+    UNBOUND_ATTRIBUTES = (
+        'bind',
+        'is_bound',
+        'switch_history',
+        'merge_strategies',
+        'schema',
+        'profile',
+        'loaded_module_names',
+        'clean_effects',
+        'apply_runtime_switch',
+        'revert_runtime_switch',
+        'check_runtime_switches',
+    )
+
     def __init__(self):
         self.is_bound = False
+        self.switch_history = None
+        self.merge_strategies = None
+        self.schema = None
+        self.profile = None
+        self.loaded_module_names = set()
+        self.clean_effects = []
 
     def __getattribute__(self, name):
-        if name not in ('bind', 'is_bound') and not self.is_bound:
+        if name not in SettingsManager.UNBOUND_ATTRIBUTES and not self.is_bound:
             raise AttributeError(
                 "Settings manager must be bound before accessing its attributes."
             )
@@ -77,34 +199,92 @@ class SettingsManager(object):
 
     # Setup / Teardown
 
-    def bind(self, target_settings):
+    def bind(self, target_settings, settings_source=None, switch_history=None, merge_strategies=None,
+             schema=None):
         """
-        Bind the settings manager to a settings dictionary.
+        Bind the settings manager to a settings dictionary. Previously composed
+        settings can be re-bound by passing in their source, switch history,
+        merge strategies and schema.
         """
+        from .merging import MergeStrategyRegistry
+        from .switches import SwitchHistory
         self.is_bound = True
         self.target_settings = target_settings
-        self.definitions = {}
-        self.settings_source = {}
+        self.switch_history = switch_history or SwitchHistory()
+        self.definitions = self.switch_history.definitions
+        self.active_switch_deltas = []
+        self.runtime_switch_deltas = None
+        # Kept after unbinding with the switch history, as runtime switches
+        # merge and validate settings as they were at composition
+        self.merge_strategies = MergeStrategyRegistry() if merge_strategies is None else merge_strategies
+        self.schema = {} if schema is None else schema
+        self.owned_settings = set()
+        self.settings_source = {} if settings_source is None else settings_source
         self.actions = ActionContextManager(ACTION_NAMES)
+        # The modules being applied, each loaded by (or a switch of) the last
+        self.module_path = []
+        # Optional features are only imported when they are switched on
+        self.prefetcher = None
+        prefetch_thread_count = environment.get_prefetch_thread_count()
+        if prefetch_thread_count:
+            from .prefetch import ModulePrefetcher
+            self.prefetcher = ModulePrefetcher(prefetch_thread_count)
+        self.clean_runner = None
+        clean_thread_count = environment.get_clean_thread_count()
+        if clean_thread_count:
+            from .cleaning import CleanFunctionRunner
+            self.clean_runner = CleanFunctionRunner(clean_thread_count)
+        # Holds the layer actions are added to by clean functions run concurrently
+        self.isolation = threading.local()
+        # Kept after unbinding, so the last composition can be reported on
+        self.profile = None
+        if environment.is_profiling():
+            from .profiling import CompositionProfile
+            self.profile = CompositionProfile()
+        self.loaded_module_names = set()
+        # The (reads, writes) declared by each clean function, None where
+        # undeclared, kept so that switch planning can see what they depend on
+        self.clean_effects = []
 
     def unbind(self):
         """
         Prevent further modification to the settings dictionary.
         """
         self.target_settings['SETTINGS_COMPOSER_SOURCE'] = self.settings_source
+        if self.profile is not None:
+            self.profile.measure_settings(self.target_settings, self.settings_source)
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+        if self.clean_runner is not None:
+            self.clean_runner.close()
         self.is_bound = False
         del self.target_settings
         del self.definitions
+        del self.active_switch_deltas
+        del self.runtime_switch_deltas
+        del self.owned_settings
         del self.settings_source
         del self.actions
+        del self.module_path
+        del self.prefetcher
+        del self.clean_runner
+        del self.isolation
 
     # Actions
 
     def create_action_context(self, context_name):
-        self.actions.create_context_layer(context_name)
+        return self.actions.create_context_layer(context_name)
 
     def add_action(self, name, **kwargs):
-        self.actions.add_action(name, **kwargs)
+        if name == 'clean':
+            self.clean_effects.append((kwargs.get('reads'), kwargs.get('writes')))
+        layer = getattr(self.isolation, 'layer', None)
+        if layer is not None:
+            if name not in self.actions.action_names:
+                raise KeyError(name)
+            layer.action_queues.setdefault(name, []).append(kwargs)
+        else:
+            self.actions.add_action(name, **kwargs)
 
     def get_current_actions(self, name):
         return self.actions.consume_actions(name)
@@ -112,26 +292,103 @@ class SettingsManager(object):
     def get_all_actions(self, name):
         return self.actions.consume_all_actions(name)
 
+    def get_action_handler(self, action_name):
+        # Looked up as actions are dispatched, so that actions registered
+        # while the manager is bound are handled
+        if action_name in CUSTOM_ACTION_HANDLERS:
+            return functools.partial(CUSTOM_ACTION_HANDLERS[action_name], self)
+        return getattr(self, 'handle_' + action_name)
+
     # Main logic
 
     def apply_settings_modules(self, module_names):
         output_if_verbose("Loading settings modules")
+        if self.profile is not None:
+            self.profile.start()
+        self.prefetch_modules(module_names)
         for module_name in module_names:
             self.apply_settings_module(module_name)
         self.apply_env_switches()
         self.process_clean_actions()
+        self.validate_settings()
+        if self.profile is not None:
+            self.profile.finish()
 
     def apply_settings_module(self, module_name, source_name=None):
-        source_name = source_name or module_name
-        self.create_action_context(source_name)
-        module = load_settings_module(module_name)
-        self.process_load_actions()
-        # Apply settings directly from module
-        self.update_settings(
-            get_settings_from_module(module),
-            source_name
+        self.run_tasks(self.get_settings_module_tasks(module_name, source_name or module_name))
+
+    def apply_site_settings_modules(self, shared_module_names, site_module_names):
+        """
+        Compose the settings for several sites which share their first settings
+        modules. The shared modules are only applied once, and each site's own
+        modules are applied to a snapshot of the result. Returns a dictionary
+        of each site's settings.
+        """
+        output_if_verbose("Loading shared settings modules")
+        if self.profile is not None:
+            self.profile.start()
+        for module_name in shared_module_names:
+            self.apply_settings_module(module_name)
+        snapshot = self.get_snapshot()
+        site_settings = {}
+        for site_name, module_names in site_module_names:
+            output_if_verbose(
+                u"Loading settings modules for site '{site_name}'".format(site_name=site_name)
+            )
+            self.restore_snapshot(snapshot)
+            for module_name in module_names:
+                self.apply_settings_module(module_name)
+            self.apply_env_switches()
+            self.process_clean_actions()
+            self.validate_settings()
+            self.target_settings['SETTINGS_COMPOSER_SOURCE'] = self.settings_source
+            site_settings[site_name] = self.target_settings
+        if self.profile is not None:
+            self.profile.finish()
+        return site_settings
+
+    def get_snapshot(self):
+        """
+        Capture the composition state, so that it can be restored any number
+        of times. Setting values are not copied here, but each time the
+        snapshot is restored.
+        """
+        return {
+            'target_settings': dict(self.target_settings),
+            'settings_source': self.settings_source,
+            'switch_history': self.switch_history,
+            'merge_strategies': self.merge_strategies,
+            'schema': self.schema,
+            'actions': self.actions,
+        }
+
+    def restore_snapshot(self, snapshot):
+        """
+        Restore a snapshot with a deep copy of each setting, as clean
+        functions may modify values in place. Settings that can't be copied
+        (such as modules) are shared.
+        """
+        memo = {}
+        self.target_settings = {}
+        self.owned_settings = set()
+        for name, value in snapshot['target_settings'].items():
+            try:
+                copied_value = copy.deepcopy(value, memo)
+            except Exception:
+                copied_value = value
+            self.target_settings[name] = copied_value
+            if copied_value is not value:
+                self.owned_settings.add(name)
+        self.settings_source = dict(
+            (name, list(sources))
+            for name, sources in snapshot['settings_source'].items()
         )
-        self.process_standard_actions()
+        self.switch_history = snapshot['switch_history'].copy()
+        self.definitions = self.switch_history.definitions
+        self.active_switch_deltas = []
+        self.merge_strategies = snapshot['merge_strategies'].copy()
+        self.schema = dict(snapshot['schema'])
+        self.actions = snapshot['actions'].copy()
 
     def apply_env_switches(self):
         self.create_action_context('[Environment]')
@@ -140,23 +397,334 @@ class SettingsManager(object):
         self.process_load_actions()
         self.process_standard_actions()
 
+    def apply_runtime_switch(self, target_settings, group_name, switch_name):
+        """
+        Apply a switch to previously composed settings, touching only the keys
+        the switch changes. Returns the recorded delta.
+        """
+        from .switches import as_settings_mapping
+        self.check_runtime_switches()
+        target_settings = as_settings_mapping(target_settings)
+        self.bind(
+            target_settings,
+            settings_source=target_settings['SETTINGS_COMPOSER_SOURCE'],
+            switch_history=self.switch_history,
+            merge_strategies=self.merge_strategies,
+            schema=self.schema
+        )
+        try:
+            self.create_action_context('[Runtime]')
+            self.add_action('apply_switch', group_name=group_name, switch_name=switch_name)
+            self.runtime_switch_deltas = []
+            self.process_load_actions()
+            self.process_standard_actions()
+            self.process_clean_actions()
+            deltas, self.runtime_switch_deltas = self.runtime_switch_deltas, None
+            for delta in deltas:
+                self.finish_switch(delta)
+            self.validate_settings()
+        finally:
+            self.unbind()
+        return self.switch_history.get_last_delta(group_name, switch_name)
+
+    def check_runtime_switches(self):
+        """
+        Runtime switches depend on the switch history of the settings, which
+        is only known if they were composed in this process.
+        """
+        if self.switch_history is None:
+            raise ValueError(
+                "Settings Composer: Switches can only be applied at runtime to settings composed in "
+                "this process (not fetched from a settings daemon)"
+            )
+
+    def revert_runtime_switch(self, target_settings, group_name, switch_name):
+        """
+        Revert the most recent application of a switch by applying the inverse
+        of its recorded delta. Returns the reverted delta.
+        """
+        from .switches import as_settings_mapping
+        self.check_runtime_switches()
+        target_settings = as_settings_mapping(target_settings)
+        return self.switch_history.revert(
+            target_settings,
+            target_settings['SETTINGS_COMPOSER_SOURCE'],
+            group_name,
+            switch_name
+        )
+
     def apply_function(self, function, source_name):
-        source_name = u"FUNCTION '{function_name}' CALLED FROM {source_name}".format(
+        self.run_tasks([(self.start_function, (function, source_name))])
+
+    # Work stack
+    #
+    # Loading a module, applying a switch or calling a clean function can each
+    # lead to more of the same. Rather than recursing, these are broken down
+    # into tasks, which are run from an explicit stack, so that arbitrarily
+    # deep trees are composed in constant Python stack space. A task is a
+    # (method, args) pair, and may return further tasks. These are run, in
+    # order, before anything else on the stack, which is exactly the order the
+    # equivalent nested calls would run in.
+
+    def run_tasks(self, tasks):
+        work_stack = list(reversed(tasks))
+        while work_stack:
+            method, args = work_stack.pop()
+            tasks = method(*args)
+            if tasks:
+                work_stack.extend(reversed(tasks))
+
+    def get_settings_module_tasks(self, module_name, source_name):
+        return self.get_profiled_tasks(
+            source_name,
+            [(self.start_settings_module, (module_name, source_name))]
+        )
+
+    def get_settings_file_tasks(self, path, source_name):
+        return self.get_profiled_tasks(
+            source_name,
+            [(self.apply_settings_file, (path, source_name))]
+        )
+
+    def get_profiled_tasks(self, source_name, tasks):
+        if self.profile is not None:
+            tasks.insert(0, (self.profile.enter_module, (source_name,)))
+            tasks.append((self.profile.exit_module, ()))
+        return tasks
+
+    def start_settings_module(self, module_name, source_name):
+        if module_name in self.module_path:
+            # Would otherwise load the same modules forever
+            raise ValueError(
+                "Settings Composer: Loading {module_name} would load it again ({cycle})".format(
+                    module_name=module_name,
+                    cycle=' -> '.join(self.module_path[self.module_path.index(module_name):] + [module_name])
+                )
+            )
+        self.module_path.append(module_name)
+        layer = self.create_action_context(source_name)
+        prefetched = None if self.prefetcher is None else self.prefetcher.pop(module_name)
+        module = load_settings_module(module_name, prefetched)
+        if module is not None:
+            self.loaded_module_names.add(module_name)
+        self.prefetch_loaded_modules(layer)
+        from .files import find_settings_files
+        tasks = [(self.get_action_tasks, (['load'], layer))]
+        # Settings files alongside the module are applied before it
+        for path in find_settings_files(module_name):
+            tasks.extend(self.get_settings_file_tasks(
+                path,
+                u"FILE '{path}' FOUND WITH {source_name}".format(
+                    path=path,
+                    source_name=source_name
+                )
+            ))
+        return tasks + [
+            # Apply settings directly from module
+            (self.update_module_settings, (module, source_name)),
+            (self.get_action_tasks, (STANDARD_ACTION_NAMES, layer)),
+            (self.finish_settings_module, ()),
+        ]
+
+    def finish_settings_module(self):
+        self.module_path.pop()
+
+    def prefetch_modules(self, module_names):
+        if self.prefetcher is not None:
+            self.prefetcher.prefetch(module_names)
+
+    def prefetch_loaded_modules(self, layer):
+        """
+        Start prefetching the modules a layer loads, so that each is ready by
+        the time the ones before it have been applied. Conditional loads are
+        left alone, as their modules may never be needed.
+        """
+        if self.prefetcher is not None:
+            for kwargs in layer.action_queues.get('load', ()):
+                if kwargs.get('condition') is None:
+                    self.prefetch_modules(kwargs.get('module_names', ()))
+
+    def update_module_settings(self, module, source_name):
+        self.update_settings(get_settings_from_module(module), source_name)
+
+    def apply_settings_file(self, path, source_name):
+        from .files import read_settings_file
+        self.update_settings(read_settings_file(path), source_name)
+
+    def apply_store_settings(self, store_name, store_keys, source_name):
+        from .stores import read_store
+        # All of the keys are fetched together
+        values = read_store(store_name, [key for setting_name, key in store_keys])
+        for setting_name, key in store_keys:
+            if key not in values:
+                continue
+            value, version, is_cached = values[key]
+            self.update_settings(
+                {setting_name: value},
+                u"STORE '{store_name}' KEY '{key}' VERSION '{version}'{cached} LOADED BY {source_name}".format(
+                    store_name=store_name,
+                    key=key,
+                    version=version,
+                    cached=u' (CACHED)' if is_cached else u'',
+                    source_name=source_name
+                )
+            )
+
+    def get_function_source_name(self, function, source_name):
+        return u"FUNCTION '{function_name}' CALLED FROM {source_name}".format(
             function_name=function.__name__,
             source_name=source_name
         )
-        self.create_action_context(source_name)
-        function(self.target_settings)
-        self.process_load_actions()
-        self.process_standard_actions()
+
+    def start_function(self, function, source_name):
+        layer = self.create_action_context(self.get_function_source_name(function, source_name))
+        function(self.get_function_settings())
+        return self.get_function_layer_tasks(layer)
+
+    def get_function_settings(self):
+        # Switches are only still being applied while clean functions run if
+        # they were applied at runtime, and must record what those change
+        if self.active_switch_deltas:
+            from .switches import RecordingSettings
+            return RecordingSettings(self.target_settings, self.record_change)
+        return self.target_settings
+
+    def get_function_layer_tasks(self, layer):
+        self.prefetch_loaded_modules(layer)
+        return [
+            (self.get_action_tasks, (['load'], layer)),
+            (self.get_action_tasks, (STANDARD_ACTION_NAMES, layer)),
+        ]
+
+    def start_concurrent_functions(self, actions):
+        """
+        Run independent clean functions concurrently, then process the
+        actions each added, in their original order, exactly as if they had
+        been run one after another.
+        """
+        layers = self.clean_runner.run([
+            (self.run_isolated_function, (source_name, kwargs['function'], kwargs['reads'], kwargs['writes']))
+            for source_name, kwargs in actions
+        ])
+        return [(self.finish_isolated_function, (layer,)) for layer in layers]
+
+    def run_isolated_function(self, source_name, function, reads, writes):
+        from .cleaning import IsolatedSettings, check_written_names
+        layer = ActionContextLayer(self.get_function_source_name(function, source_name))
+        self.isolation.layer = layer
+        try:
+            function(IsolatedSettings(self.target_settings, function, reads))
+        finally:
+            self.isolation.layer = None
+        check_written_names(function, writes, layer)
+        return layer
+
+    def finish_isolated_function(self, layer):
+        self.actions.layers.append(layer)
+        return self.get_function_layer_tasks(layer)
+
+    def get_action_tasks(self, action_names, layer=None):
+        """
+        Consume the actions of each name from a layer (by default, the current
+        one), returning a task that dispatches each action to its handler.
+        Action types with no actions in the layer cost nothing.
+        """
+        tasks = []
+        for action_name in action_names:
+            handler = self.get_action_handler(action_name)
+            for source_name, kwargs in self.actions.pop_actions(action_name, layer):
+                tasks.append((self.dispatch_action, (handler, source_name, kwargs)))
+        return tasks
+
+    def dispatch_action(self, handler, source_name, kwargs):
+        return handler(source_name, **kwargs)
+
+    def get_clean_action_tasks(self):
+        # Clean functions added while cleaning are consumed before the
+        # remaining (earlier) context layers
+        if self.actions.get_layer('clean') is None:
+            return None
+        if self.clean_runner is None:
+            return self.get_action_tasks(['clean']) + [(self.get_clean_action_tasks, ())]
+        from .cleaning import group_clean_actions
+        tasks = []
+        for actions in group_clean_actions(self.actions.pop_actions('clean')):
+            if len(actions) > 1:
+                tasks.append((self.start_concurrent_functions, (actions,)))
+            else:
+                source_name, kwargs = actions[0]
+                tasks.append((self.dispatch_action, (self.handle_clean, source_name, kwargs)))
+        return tasks + [(self.get_clean_action_tasks, ())]
+
+    def finish_switch(self, delta):
+        if self.runtime_switch_deltas is not None:
+            # Runtime switches are finished once the clean functions they
+            # queue have run, so that their changes can be reverted too
+            self.runtime_switch_deltas.append(delta)
+            return
+        self.active_switch_deltas.remove(delta)
+        delta.record_after(self.target_settings, self.settings_source)
+        self.switch_history.record(delta)
 
     # Settings
 
     def update_settings(self, settings, source_name):
         for name, value in settings.items():
+            self.record_change(name)
             self.target_settings[name] = value
+            # The value is still shared with wherever it was defined
+            self.owned_settings.discard(name)
             self.set_source_name(name, source_name)
 
+    def set_merge_strategy(self, setting_name, strategy_name_or_strategy):
+        self.merge_strategies.register(setting_name, strategy_name_or_strategy)
+
+    def add_schema(self, rules):
+        self.schema.update(rules)
+
+    def validate_settings(self):
+        """
+        Check the composed settings against the schema, reporting every
+        invalid setting at once.
+        """
+        if self.schema:
+            from .validation import get_validation_cache, validate_settings
+            validate_settings(
+                self.target_settings,
+                self.settings_source,
+                self.schema,
+                get_validation_cache()
+            )
+
+    def merge_setting(self, setting_name, method_name, values):
+        """
+        Combine values with an existing setting using the setting's merge
+        strategy, and store the result.
+
+        Settings are copied on their first modification, so that the modules,
+        switch definitions and actions they were defined in are never changed.
+        Only the top level container is copied, as merge strategies do not
+        modify nested values in place.
+        """
+        self.record_change(setting_name, read=True)
+        value = self.target_settings[setting_name]
+        if setting_name not in self.owned_settings:
+            value = copy.copy(value)
+            self.owned_settings.add(setting_name)
+        strategy = self.merge_strategies.get(setting_name)
+        self.target_settings[setting_name] = getattr(strategy, method_name)(value, values)
+
+    def record_change(self, name, read=False):
+        """
+        Must be called before a setting is modified, so that any switches being
+        applied can record its prior state. Modifications that depend on the
+        prior value (such as extending a list) also count as reading it.
+        """
+        for delta in self.active_switch_deltas:
+            delta.record_before(name, self.target_settings, self.settings_source)
+            if read:
+                delta.reads.add(name)
+
     def set_source_name(self, name, source_name):
         self.settings_source.setdefault(name, [])
         self.settings_source[name].append(source_name)
@@ -164,137 +732,143 @@ class SettingsManager(object):
     # Process actions
 
     def process_standard_actions(self):
-        self.process_set_actions()
-        self.process_create_switch_actions()
-        self.process_apply_switch_actions()
-        self.process_extend_setting_actions()
-        self.process_update_setting_actions()
-        self.process_exclude_from_setting_actions()
+        self.run_tasks(self.get_action_tasks(STANDARD_ACTION_NAMES))
 
     def process_load_actions(self):
-        for source_name, kwargs in self.get_current_actions('load'):
-            for module_name in kwargs['module_names']:
-                self.apply_settings_module(
-                    module_name,
-                    source_name='{module_name} LOADED BY {source_name}'.format(
-                        module_name=module_name,
-                        source_name=source_name
-                    )
+        self.run_tasks(self.get_action_tasks(['load']))
+
+    def process_clean_actions(self):
+        self.run_tasks([(self.get_clean_action_tasks, ())])
+
+    # Action handlers
+    #
+    # Each is called with the source name and keyword arguments of a single
+    # action, and may return tasks to be run before the next action.
+
+    def handle_load(self, source_name, module_names=(), file_paths=(), store_name=None, store_keys=(),
+                    condition=None):
+        # Conditions are checked before anything is imported
+        if condition is not None and not condition(self.target_settings):
+            output_if_verbose(
+                u"Skipping modules loaded by {source_name} ({condition_name} is false)".format(
+                    source_name=source_name,
+                    condition_name=getattr(condition, '__name__', repr(condition))
+                ),
+                *module_names
+            )
+            return None
+        tasks = []
+        for module_name in module_names:
+            tasks.extend(self.get_settings_module_tasks(
+                module_name,
+                '{module_name} LOADED BY {source_name}'.format(
+                    module_name=module_name,
+                    source_name=source_name
+                )
+            ))
+        for path in file_paths:
+            tasks.extend(self.get_settings_file_tasks(
+                path,
+                u"FILE '{path}' LOADED BY {source_name}".format(
+                    path=path,
+                    source_name=source_name
+                )
+            ))
+        if store_keys:
+            tasks.extend(self.get_profiled_tasks(
+                u"STORE '{store_name}' LOADED BY {source_name}".format(
+                    store_name=store_name,
+                    source_name=source_name
+                ),
+                [(self.apply_store_settings, (store_name, store_keys, source_name))]
+            ))
+        return tasks
+
+    def handle_set(self, source_name, **settings):
+        self.update_settings(settings, source_name)
+
+    def handle_create_switch(self, source_name, group_name, switch_name, module_or_settings):
+        self.definitions.setdefault(group_name, {})
+        if switch_name in self.definitions[group_name]:
+            raise ValueError(
+                "Settings Composer: Encountered re-definition of {group_name}: {switch_name}".format(
+                    group_name=group_name,
+                    switch_name=switch_name
                 )
+            )
+        self.definitions[group_name][switch_name] = {
+            'definition': module_or_settings,
+            'source_name': source_name
+        }
 
-    def process_set_actions(self):
-        for source_name, kwargs in self.get_current_actions('set'):
-            self.update_settings(kwargs, source_name)
-
-    def process_create_switch_actions(self):
-        for source_name, kwargs in self.get_current_actions('create_switch'):
-            group_name = kwargs['group_name']
-            switch_name = kwargs['switch_name']
-            definition = kwargs['module_or_settings']
-            self.definitions.setdefault(group_name, {})
-            if switch_name in self.definitions[group_name]:
-                raise ValueError(
-                    "Settings Composer: Encountered re-definition of {group_name}: {switch_value}".format(
-                        group_name=group_name,
-                        switch_name=switch_name
-                    )
+    def handle_apply_switch(self, source_name, group_name, switch_name):
+        # Switches are looked up as they are reached, as earlier switches may
+        # define them
+        try:
+            switch = self.definitions[group_name][switch_name]
+        except KeyError:
+            raise ValueError(
+                "Settings Composer: No such definition {group_name}: {switch_name}".format(
+                    group_name=group_name,
+                    switch_name=switch_name
                 )
-            self.definitions[group_name][switch_name] = {
-                'definition': definition,
-                'source_name': source_name
-            }
-
-    def process_apply_switch_actions(self):
-        for source_name, kwargs in self.get_current_actions('apply_switch'):
-            group_name = kwargs['group_name']
-            switch_name = kwargs['switch_name']
-            try:
-                switch = self.definitions[group_name][switch_name]
-            except KeyError:
-                raise ValueError(
-                    "Settings Composer: No such definition {group_name}: {switch_name}".format(
-                        group_name=group_name,
-                        switch_name=switch_name
-                    )
+            )
+        switch_source_name = u'[SWITCH <{group_name}: {swtich_name}> DEFINED IN {switch_source_name}] SET BY {source_name}'.format(
+            group_name=group_name,
+            swtich_name=switch_name,
+            switch_source_name=switch['source_name'],
+            source_name=source_name
+        )
+        from .switches import SwitchDelta
+        definition = switch['definition']
+        delta = SwitchDelta(group_name, switch_name, switch_source_name)
+        self.active_switch_deltas.append(delta)
+        if hasattr(definition, 'keys'):  # dictionary
+            tasks = [(self.update_settings, (definition, switch_source_name))]
+        else:
+            tasks = self.get_settings_module_tasks(definition, switch_source_name)
+        return tasks + [(self.finish_switch, (delta,))]
+
+    def handle_extend_setting(self, source_name, setting_name, values):
+        if setting_name not in self.settings_source:
+            raise ValueError(
+                "Settings Composer: Can't extend {setting_name} (not defined)".format(
+                    setting_name=setting_name
                 )
-            switch_source_name = u'[SWITCH <{group_name}: {swtich_name}> DEFINED IN {switch_source_name}] SET BY {source_name}'.format(
-                group_name=group_name,
-                swtich_name=switch_name,
-                switch_source_name=switch['source_name'],
-                source_name=source_name
             )
-            definition = switch['definition']
-            if hasattr(definition, 'keys'):  # dictionary
-                self.update_settings(definition, switch_source_name)
-            else:
-                self.apply_settings_module(definition, switch_source_name)
-
-    def process_extend_setting_actions(self):
-        for source_name, kwargs in self.get_current_actions('extend_setting'):
-            setting_name = kwargs['setting_name']
-            values = kwargs['values']
-            if setting_name not in self.settings_source:
-                raise ValueError(
-                    "Settings Composer: Can't extend {setting_name} (not defined)".format(
-                        setting_name=setting_name
-                    )
+        self.merge_setting(setting_name, 'extend', values)
+        self.settings_source[setting_name][-1] = u'{set_by} EXTENDED BY {source_name}'.format(
+            set_by=self.settings_source[setting_name][-1],
+            source_name=source_name
+        )
+
+    def handle_update_setting(self, source_name, setting_name, values):
+        if setting_name not in self.settings_source:
+            raise ValueError(
+                "Settings Composer: Can't update {setting_name} (not defined)".format(
+                    setting_name=setting_name
                 )
-            self.target_settings[setting_name].extend(values)
-            self.settings_source[setting_name][-1] = u'{set_by} EXTENDED BY {source_name}'.format(
-                set_by=self.settings_source[setting_name][-1],
-                source_name=source_name
             )
+        self.merge_setting(setting_name, 'update', values)
+        self.settings_source[setting_name][-1] = u'{set_by} UPDATED BY {source_name}'.format(
+            set_by=self.settings_source[setting_name][-1],
+            source_name=source_name
+        )
 
-    def process_update_setting_actions(self):
-        for source_name, kwargs in self.get_current_actions('update_setting'):
-            setting_name = kwargs['setting_name']
-            values = kwargs['values']
-            if setting_name not in self.settings_source:
-                raise ValueError(
-                    "Settings Composer: Can't update {setting_name} (not defined)".format(
-                        setting_name=setting_name
-                    )
+    def handle_exclude_from_setting(self, source_name, setting_name, items):
+        if setting_name not in self.settings_source:
+            raise ValueError(
+                "Settings Composer: Can't exclude from {setting_name} (not defined)".format(
+                    setting_name=setting_name
                 )
-            self.target_settings[setting_name].update(values)
-            self.settings_source[setting_name][-1] = u'{set_by} UPDATED BY {source_name}'.format(
+            )
+        original_length = len(self.target_settings[setting_name])
+        self.merge_setting(setting_name, 'exclude', items)
+        if len(self.target_settings[setting_name]) < original_length:
+            self.settings_source[setting_name][-1] = u'{set_by} EXCLUDED WITH {source_name}'.format(
                 set_by=self.settings_source[setting_name][-1],
                 source_name=source_name
             )
 
-    def process_exclude_from_setting_actions(self):
-        for source_name, kwargs in self.get_current_actions('exclude_from_setting'):
-            setting_name = kwargs['setting_name']
-            items = kwargs['items']
-            if setting_name not in self.settings_source:
-                raise ValueError(
-                    "Settings Composer: Can't exclude from {setting_name} (not defined)".format(
-                        setting_name=setting_name
-                    )
-                )
-            changed = False
-            if isinstance(self.target_settings[setting_name], dict):
-                for item in items:
-                    try:
-                        del self.target_settings[setting_name][item]
-                        changed = True
-                    except KeyError:
-                        pass  # May already have been excluded
-            else:
-                new_setting = list(
-                    filter(
-                        lambda item: item not in items,
-                        self.target_settings[setting_name]
-                    )
-                )
-                changed = len(new_setting) < len(self.target_settings[setting_name])
-                self.target_settings[setting_name] = new_setting
-            if changed:
-                self.settings_source[setting_name][-1] = u'{set_by} EXCLUDED WITH {source_name}'.format(
-                    set_by=self.settings_source[setting_name][-1],
-                    source_name=source_name
-                )
-
-    def process_clean_actions(self):
-        for source_name, kwargs in self.get_all_actions('clean'):
-            function = kwargs['function']
-            self.apply_function(function, source_name)
+    def handle_clean(self, source_name, function, reads=None, writes=None):
+        return [(self.start_function, (function, source_name))]
@@ -0,0 +1,277 @@
+import gzip
+import json
+import os
+
+from . import constants
+from .analysis import SettingsTreeAnalyser
+from .export import _default
+from .helpers import content_hash
+from .loading import collect_settings
+
+
+MATRIX_FORMAT_VERSION = 1
+
+# Stands in for the value of a setting (or part of one) that isn't set
+NOT_SET = object()
+
+
+def encode_value(value):
+    try:
+        return json.dumps(value, default=_default, sort_keys=True, separators=(',', ':'))
+    except TypeError:  # Keys that can't be sorted
+        return json.dumps(value, default=_default, separators=(',', ':'))
+
+
+def compose_permutation(settings_module_name, site, env):
+    """
+    Compose the settings of a single site and environment in-process, as if
+    they had been set through the environment.
+    """
+    variables = {
+        constants.SETTINGS_MODULE_VARIABLE_NAME: settings_module_name,
+        constants.SITE_VARIABLE_NAME: site,
+        constants.ENV_VARIABLE_NAME: env,
+    }
+    original_environ = dict(os.environ)
+    try:
+        os.environ.pop(constants.SITES_VARIABLE_NAME, None)
+        os.environ.pop(constants.DAEMON_SOCKET_VARIABLE_NAME, None)
+        os.environ.update(variables)
+        settings = {}
+        collect_settings(settings)
+    finally:
+        os.environ.clear()
+        os.environ.update(original_environ)
+    return settings
+
+
+def get_path_value(value, path):
+    """
+    Follow a path of dictionary keys (or list indexes) into a value.
+    """
+    for key in path:
+        if hasattr(value, 'keys'):
+            value = value.get(key, NOT_SET)
+        elif isinstance(value, list) and key.lstrip('-').isdigit() and -len(value) <= int(key) < len(value):
+            value = value[int(key)]
+        else:
+            return NOT_SET
+    return value
+
+
+def parse_condition(condition):
+    """
+    Parse a 'name=value' condition, where the name is site, env or a setting
+    (optionally followed by a dotted path into it), and the value is JSON or
+    else plain text.
+    """
+    name, separator, value = condition.partition('=')
+    if not separator or not name:
+        raise ValueError(
+            "Settings Composer: '{condition}' is not a valid condition".format(condition=condition)
+        )
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+    return name.strip(), value
+
+
+class SettingsMatrix(object):
+    """
+    The composed settings of many permutations, stored by column: each
+    setting is a list of one value index per permutation (-1 where it isn't
+    set), and each distinct value is stored once, as compact JSON,
+    deduplicated by the hash of its content. SETTINGS_COMPOSER_SOURCE is left
+    out.
+
+    Values are decoded from JSON when queried, so values with no JSON
+    equivalent are compared by their text (as in exported settings).
+    """
+
+    def __init__(self):
+        self.permutations = []
+        self.columns = {}
+        self.values = []
+        self.value_indexes = {}
+        self.decoded_values = {}
+        self.errors = {}
+
+    def intern_value(self, value):
+        value_hash = content_hash(value)
+        index = self.value_indexes.get(value_hash)
+        if index is None:
+            index = self.value_indexes[value_hash] = len(self.values)
+            self.values.append(encode_value(value))
+        return index
+
+    def add_permutation(self, site, env, settings):
+        row = len(self.permutations)
+        self.permutations.append((site, env))
+        for name, value in settings.items():
+            if name == 'SETTINGS_COMPOSER_SOURCE':
+                continue
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = [-1] * row
+            column.append(self.intern_value(value))
+        for column in self.columns.values():
+            if len(column) == row:
+                column.append(-1)
+
+    def add_error(self, site, env, error):
+        self.add_permutation(site, env, {})
+        self.errors[len(self.permutations) - 1] = u'{0}'.format(error)
+
+    def save(self, path):
+        temporary_path = path + '.tmp'
+        with gzip.open(temporary_path, 'wb') as matrix_file:
+            matrix_file.write(json.dumps({
+                'version': MATRIX_FORMAT_VERSION,
+                'permutations': self.permutations,
+                'columns': self.columns,
+                'values': self.values,
+                'errors': dict((str(row), error) for row, error in self.errors.items()),
+            }, separators=(',', ':')).encode('utf-8'))
+        os.rename(temporary_path, path)
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with gzip.open(path, 'rb') as matrix_file:
+                data = json.loads(matrix_file.read().decode('utf-8'))
+        except (IOError, OSError, ValueError):
+            data = None
+        if not data or data.get('version') != MATRIX_FORMAT_VERSION:
+            raise ValueError(
+                "Settings Composer: {path} is not a settings matrix file".format(path=path)
+            )
+        matrix = cls()
+        matrix.permutations = [tuple(permutation) for permutation in data['permutations']]
+        matrix.columns = data['columns']
+        matrix.values = data['values']
+        matrix.errors = dict((int(row), error) for row, error in data['errors'].items())
+        return matrix
+
+    def get_value(self, index):
+        """
+        Return the value stored at an index, decoding each value only once.
+        """
+        value = self.decoded_values.get(index, NOT_SET)
+        if value is NOT_SET:
+            value = self.decoded_values[index] = json.loads(self.values[index])
+        return value
+
+    def get_index_cells(self, name):
+        """
+        Return the value index of each permutation for a setting (-1 where
+        it isn't set), and a function returning the value (or the part of it
+        at a dotted path) for an index, which is only worked out once per
+        index.
+        """
+        setting_name, _, path = name.partition('.')
+        column = self.columns.get(setting_name)
+        if column is None:
+            column = [-1] * len(self.permutations)
+        path = path.split('.') if path else None
+        cells = {-1: NOT_SET}
+
+        def get_index_cell(index):
+            if index not in cells:
+                value = self.get_value(index)
+                cells[index] = get_path_value(value, path) if path else value
+            return cells[index]
+
+        return column, get_index_cell
+
+    def get_cell(self, row, name):
+        """
+        Return the value for a permutation of site, env, or a setting
+        (optionally followed by a dotted path into it).
+        """
+        if name == 'site':
+            return self.permutations[row][0]
+        if name == 'env':
+            return self.permutations[row][1]
+        column, get_index_cell = self.get_index_cells(name)
+        return get_index_cell(column[row])
+
+    def get_row_filter(self, name, value):
+        """
+        Return a function telling whether the value for a permutation (row)
+        equals the value of a condition.
+        """
+        if name in ('site', 'env'):
+            position = 0 if name == 'site' else 1
+            return lambda row: self.permutations[row][position] == value
+        # Settings are compared once per distinct value, not once per row
+        column, get_index_cell = self.get_index_cells(name)
+        matches = {}
+
+        def row_filter(row):
+            index = column[row]
+            if index not in matches:
+                matches[index] = get_index_cell(index) == value
+            return matches[index]
+
+        return row_filter
+
+    def select_rows(self, conditions=()):
+        """
+        Return the rows of the permutations that composed without errors and
+        meet every (name, value) condition.
+        """
+        row_filters = [self.get_row_filter(name, value) for name, value in conditions]
+        return [
+            row for row in range(len(self.permutations))
+            if row not in self.errors
+            and all(row_filter(row) for row_filter in row_filters)
+        ]
+
+    def group_by(self, name, conditions=()):
+        """
+        Return a list of (value, rows) for each distinct value of site, env or
+        a setting (path) among the selected permutations, most common first.
+        """
+        rows = self.select_rows(conditions)
+        groups = {}
+        if name in ('site', 'env'):
+            position = 0 if name == 'site' else 1
+            for row in rows:
+                value = self.permutations[row][position]
+                groups.setdefault(value, (value, []))[1].append(row)
+        else:
+            # Rows are grouped by value index, then the indexes whose values
+            # (or the parts of them at the path) have the same JSON are merged
+            column, get_index_cell = self.get_index_cells(name)
+            index_rows = {}
+            for row in rows:
+                index_rows.setdefault(column[row], []).append(row)
+            for index, rows in index_rows.items():
+                value = get_index_cell(index)
+                if value is NOT_SET:
+                    key = None
+                elif '.' in name:
+                    key = encode_value(value)
+                else:
+                    key = self.values[index]
+                groups.setdefault(key, (value, []))[1].extend(rows)
+            for value, rows in groups.values():
+                rows.sort()
+        return sorted(groups.values(), key=lambda group: (-len(group[1]), group[1][0]))
+
+
+def build_settings_matrix(settings_module_name):
+    """
+    Compose every site/environment permutation of a settings package into a
+    SettingsMatrix. Permutations that fail to compose are recorded as errors.
+    """
+    matrix = SettingsMatrix()
+    for site, env, module_names in SettingsTreeAnalyser(settings_module_name).get_permutations():
+        try:
+            settings = compose_permutation(settings_module_name, site, env)
+        except Exception as error:
+            matrix.add_error(site, env, error)
+        else:
+            matrix.add_permutation(site, env, settings)
+    return matrix
@@ -0,0 +1,168 @@
+import sys
+
+
+def _is_sorted_set(value):
+    # Only settings_composer.sorted_sets creates sorted sets, so it isn't
+    # imported just to check for them
+    sorted_sets = sys.modules.get(__package__ + '.sorted_sets')
+    return sorted_sets is not None and isinstance(value, sorted_sets.SortedStringSet)
+
+
+def _is_hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _membership(items):
+    """
+    Return a container for membership tests, using a set where the items allow
+    it so that each lookup is O(1).
+    """
+    items = list(items)
+    if all(_is_hashable(item) for item in items):
+        return set(items)
+    return items
+
+
+def _extend_sequence(value, values):
+    if _is_sorted_set(value):
+        return value.union(values)
+    if isinstance(value, tuple):
+        return value + tuple(values)
+    value.extend(values)
+    return value
+
+
+def _as_type_of(value, items):
+    if isinstance(value, tuple):
+        return tuple(items)
+    return list(items)
+
+
+def deep_merge(value, values):
+    """
+    Recursively merge one dictionary into another, returning a new dictionary.
+    Only the dictionaries along the path of each change are copied; untouched
+    branches are shared with the original.
+    """
+    merged = dict(value)
+    for key, new_value in values.items():
+        current_value = merged.get(key)
+        if hasattr(current_value, 'keys') and hasattr(new_value, 'keys'):
+            merged[key] = deep_merge(current_value, new_value)
+        else:
+            merged[key] = new_value
+    return merged
+
+
+class MergeStrategy(object):
+    """
+    Determines how extend_setting, update_setting and exclude_from_setting
+    combine new values with an existing setting. Each method returns the new
+    value for the setting.
+
+    The default behaviour extends lists and tuples (preserving the type),
+    shallowly updates dictionaries, and excludes list items or dictionary keys.
+    SortedStringSet settings are extended and excluded from by merging each
+    batch of items into a new set.
+    """
+
+    def extend(self, value, values):
+        return _extend_sequence(value, values)
+
+    def update(self, value, values):
+        value.update(values)
+        return value
+
+    def exclude(self, value, items):
+        if isinstance(value, dict):
+            for item in items:
+                value.pop(item, None)  # May already have been excluded
+            return value
+        if _is_sorted_set(value):
+            return value.difference(items)
+        items = _membership(items)
+        return _as_type_of(value, [item for item in value if item not in items])
+
+
+class OrderedSetStrategy(MergeStrategy):
+    """
+    Treats a list or tuple setting as an ordered set: extending only appends
+    items that are not already present, so repeated extends from several
+    layers never produce duplicates.
+    """
+
+    def extend(self, value, values):
+        if _is_sorted_set(value):
+            return value.union(values)  # Already free of duplicates
+        seen = _membership(value)
+        new_items = []
+        for item in values:
+            if item not in seen:
+                new_items.append(item)
+                if isinstance(seen, set):
+                    seen.add(item)
+                else:
+                    seen.append(item)
+        return _extend_sequence(value, new_items)
+
+
+class DeepMergeStrategy(MergeStrategy):
+    """
+    Updates dictionary settings recursively, so nested dictionaries such as
+    DATABASES['default']['OPTIONS'] can be patched without restating them.
+    """
+
+    def update(self, value, values):
+        return deep_merge(value, values)
+
+
+MERGE_STRATEGIES = {
+    'default': MergeStrategy(),
+    'ordered_set': OrderedSetStrategy(),
+    'deep_merge': DeepMergeStrategy(),
+}
+
+
+def register_merge_strategy(strategy_name, strategy):
+    """
+    Make a custom merge strategy available by name.
+    """
+    MERGE_STRATEGIES[strategy_name] = strategy
+
+
+def get_merge_strategy(strategy_name_or_strategy):
+    if isinstance(strategy_name_or_strategy, MergeStrategy):
+        return strategy_name_or_strategy
+    try:
+        return MERGE_STRATEGIES[strategy_name_or_strategy]
+    except KeyError:
+        raise ValueError(
+            "Settings Composer: No such merge strategy '{strategy_name}'".format(
+                strategy_name=strategy_name_or_strategy
+            )
+        )
+
+
+class MergeStrategyRegistry(object):
+    """
+    Maps setting names to the merge strategy used when they are extended,
+    updated or excluded from. Settings without an entry use the default.
+    """
+
+    def __init__(self):
+        self.strategies = {}
+
+    def register(self, setting_name, strategy_name_or_strategy):
+        self.strategies[setting_name] = get_merge_strategy(strategy_name_or_strategy)
+
+    def copy(self):
+        registry = MergeStrategyRegistry()
+        registry.strategies = dict(self.strategies)
+        return registry
+
+    def get(self, setting_name):
+        return self.strategies.get(setting_name, MERGE_STRATEGIES['default'])
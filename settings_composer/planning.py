@@ -0,0 +1,204 @@
+import itertools
+import os
+
+from . import constants, settings_manager
+from .helpers import content_hash
+from .loading import collect_settings
+
+
+def _overlaps(names, clean_names):
+    return bool(names) if clean_names is None else bool(names & clean_names)
+
+
+class SwitchEffectIndex(object):
+    """
+    Records which settings each switch reads and writes. Settings are written
+    by any switch that sets, extends, updates or excludes from them, and read
+    by those whose result depends on the existing value (extend, update and
+    exclude).
+
+    Clean functions are recorded too, as they can combine the settings of
+    several switches. Those that don't declare what they read and write are
+    assumed to read and write every setting.
+    """
+
+    def __init__(self):
+        self.groups = {}
+        self.reads = {}
+        self.writes = {}
+        self.clean_effects = set()  # (reads, writes), None for every setting
+
+    def add_definitions(self, definitions):
+        for group_name, switches in definitions.items():
+            for switch_name, switch in switches.items():
+                self.add_switch(group_name, switch_name)
+                definition = switch['definition']
+                if hasattr(definition, 'keys'):  # dictionary
+                    self.writes[(group_name, switch_name)].update(definition)
+
+    def add_switch(self, group_name, switch_name):
+        switch_names = self.groups.setdefault(group_name, [])
+        if switch_name not in switch_names:
+            switch_names.append(switch_name)
+        self.reads.setdefault((group_name, switch_name), set())
+        self.writes.setdefault((group_name, switch_name), set())
+
+    def add_delta(self, delta):
+        self.add_switch(delta.group_name, delta.switch_name)
+        self.reads[(delta.group_name, delta.switch_name)].update(delta.reads)
+        self.writes[(delta.group_name, delta.switch_name)].update(delta.changed_keys)
+
+    def add_clean_effects(self, clean_effects):
+        for reads, writes in clean_effects:
+            self.clean_effects.add((
+                None if reads is None else frozenset(reads),
+                None if writes is None else frozenset(writes)
+            ))
+
+    def get_group_effects(self, group_name):
+        reads, writes = set(), set()
+        for switch_name in self.groups[group_name]:
+            reads |= self.reads[(group_name, switch_name)]
+            writes |= self.writes[(group_name, switch_name)]
+        return reads, writes
+
+    def groups_interact(self, group_name, other_group_name):
+        """
+        Two groups interact if either writes a setting the other reads or
+        writes, as the combined result then depends on both choices. They
+        also interact through a clean function if either writes a setting it
+        reads, and the other writes a setting it reads, or touches a setting
+        it writes.
+        """
+        reads, writes = self.get_group_effects(group_name)
+        other_reads, other_writes = self.get_group_effects(other_group_name)
+        if writes & (other_reads | other_writes) or other_writes & reads:
+            return True
+        for clean_reads, clean_writes in self.clean_effects:
+            if _overlaps(writes, clean_reads) and (
+                    _overlaps(other_writes, clean_reads)
+                    or _overlaps(other_reads | other_writes, clean_writes)):
+                return True
+            if _overlaps(other_writes, clean_reads) and _overlaps(reads | writes, clean_writes):
+                return True
+        return False
+
+    def get_interacting_groups(self):
+        """
+        Partition the switch groups into sets which interact with each other,
+        but not with any other set.
+        """
+        components = []
+        for group_name in sorted(self.groups):
+            connected = [
+                component for component in components
+                if any(self.groups_interact(group_name, other) for other in component)
+            ]
+            merged = [group_name]
+            for component in connected:
+                components.remove(component)
+                merged.extend(component)
+            components.append(sorted(merged))
+        return sorted(components)
+
+
+def plan_switch_combinations(index, group_names=None):
+    """
+    Return the smallest list of switch combinations ({group: switch}) that
+    covers every combination of interacting groups. Groups that do not
+    interact are varied alongside each other rather than multiplied together.
+    """
+    group_names = set(index.groups if group_names is None else group_names)
+    component_combinations = []
+    for component in index.get_interacting_groups():
+        component = [group_name for group_name in component if group_name in group_names]
+        if not component:
+            continue
+        component_combinations.append([
+            dict(zip(component, switch_names))
+            for switch_names in itertools.product(
+                *[index.groups[group_name] for group_name in component]
+            )
+        ])
+    if not component_combinations:
+        return [{}]
+    combinations = []
+    for position in range(max(len(options) for options in component_combinations)):
+        combination = {}
+        for options in component_combinations:
+            combination.update(options[position % len(options)])
+        combinations.append(combination)
+    return combinations
+
+
+def format_switches(switches):
+    return u','.join(
+        u'{group_name}:{switch_name}'.format(group_name=group_name, switch_name=switch_name)
+        for group_name, switch_name in sorted(switches.items())
+    )
+
+
+def compose_with_switches(switches):
+    """
+    Compose settings as if the switches had been set through the environment.
+    Settings are always composed in-process, rather than fetched from a
+    settings daemon, so that the switch history is available.
+    """
+    original_environ = dict(os.environ)
+    try:
+        os.environ.pop(constants.DAEMON_SOCKET_VARIABLE_NAME, None)
+        os.environ[constants.SWITCHES_VARIABLE_NAME] = format_switches(switches)
+        settings = {}
+        collect_settings(settings)
+    finally:
+        os.environ.clear()
+        os.environ.update(original_environ)
+    return settings
+
+
+def settings_hash(settings):
+    return content_hash(dict(
+        (name, value) for name, value in settings.items()
+        if name != 'SETTINGS_COMPOSER_SOURCE'
+    ))
+
+
+def build_switch_effect_index():
+    """
+    Compose the settings without any environment switches, then apply every
+    defined switch to a copy of the result to record its effects.
+    """
+    settings = compose_with_switches({})
+    switch_history = settings_manager.switch_history
+    index = SwitchEffectIndex()
+    index.add_definitions(switch_history.definitions)
+    index.add_clean_effects(settings_manager.clean_effects)
+    for delta in list(switch_history.deltas):
+        index.add_delta(delta)
+    for group_name, switches in sorted(switch_history.definitions.items()):
+        for switch_name in sorted(switches):
+            switch_settings = dict(settings)
+            switch_settings['SETTINGS_COMPOSER_SOURCE'] = dict(
+                (name, list(sources))
+                for name, sources in settings['SETTINGS_COMPOSER_SOURCE'].items()
+            )
+            index.add_delta(
+                settings_manager.apply_runtime_switch(switch_settings, group_name, switch_name)
+            )
+            index.add_clean_effects(settings_manager.clean_effects)
+    return index
+
+
+def dedupe_switch_combinations(combinations, compose=compose_with_switches):
+    """
+    Compose each combination, and drop those whose settings are identical to
+    an earlier combination. Returns a list of (combination, hash) tuples.
+    """
+    seen_hashes = set()
+    unique_combinations = []
+    for combination in combinations:
+        combination_hash = settings_hash(compose(combination))
+        if combination_hash not in seen_hashes:
+            seen_hashes.add(combination_hash)
+            unique_combinations.append((combination, combination_hash))
+    return unique_combinations
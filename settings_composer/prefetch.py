@@ -0,0 +1,124 @@
+import dis
+import sys
+
+try:
+    import importlib.util
+    from importlib.machinery import PathFinder
+except ImportError:  # Python 2
+    PathFinder = None
+
+
+def get_module_spec(module_name):
+    """
+    Find a module without importing it. Modules whose parent package hasn't
+    been imported yet are not found, as importing the parent would run it
+    outside of the settings manager's control.
+    """
+    if PathFinder is None:
+        return None
+    parent_name, _, _ = module_name.rpartition('.')
+    if parent_name:
+        parent = sys.modules.get(parent_name)
+        if parent is None or not hasattr(parent, '__path__'):
+            return None
+        return PathFinder.find_spec(module_name, parent.__path__)
+    return PathFinder.find_spec(module_name)
+
+
+def get_external_imports(code, module_name):
+    """
+    Return the names of the modules imported (absolutely) at the top level of
+    a module's code, other than settings modules and settings composer itself.
+    """
+    excluded_names = (module_name.split('.')[0], __name__.split('.')[0])
+    instructions = list(dis.get_instructions(code))
+    imported_names = []
+    for index, instruction in enumerate(instructions):
+        if instruction.opname != 'IMPORT_NAME' or index < 2:
+            continue
+        if instructions[index - 2].argval != 0:
+            continue  # Relative import
+        imported_name = instruction.argval
+        if imported_name.split('.')[0] not in excluded_names and imported_name not in imported_names:
+            imported_names.append(imported_name)
+    return imported_names
+
+
+def prefetch_module(module_name):
+    """
+    Do everything needed to load a settings module short of running it: find
+    it, read and compile its source, and import the (non-settings) modules it
+    imports. Returns the spec and code, or None if the module can't be
+    prefetched, in which case it is simply loaded as normal.
+    """
+    try:
+        spec = get_module_spec(module_name)
+        if spec is None or not hasattr(spec.loader, 'get_code'):
+            return None
+        code = spec.loader.get_code(module_name)
+    except Exception:
+        return None
+    if code is None:
+        return None
+    for imported_name in get_external_imports(code, module_name):
+        if imported_name not in sys.modules:
+            try:
+                importlib.import_module(imported_name)
+            except Exception:
+                pass  # Reported when the settings module itself is run
+    return spec, code
+
+
+def run_prefetched_module(module_name, spec, code):
+    """
+    Run prefetched code as the named module, exactly as importing (or
+    reloading) it would.
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        exec(code, module.__dict__)
+        return module
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        exec(code, module.__dict__)
+    except BaseException:
+        sys.modules.pop(module_name, None)
+        raise
+    parent_name, _, child_name = module_name.rpartition('.')
+    if parent_name:
+        setattr(sys.modules[parent_name], child_name, module)
+    return module
+
+
+class ModulePrefetcher(object):
+    """
+    Prefetches settings modules in a pool of threads, ahead of them being
+    loaded. Settings modules add actions to the settings manager as they run,
+    so they are still run one at a time, in order; only the work leading up
+    to that is done concurrently.
+    """
+
+    def __init__(self, thread_count):
+        # Only imported when prefetching, as it is slow to import
+        from multiprocessing.pool import ThreadPool
+        self.pool = ThreadPool(thread_count)
+        self.results = {}
+
+    def prefetch(self, module_names):
+        for module_name in module_names:
+            if module_name not in self.results:
+                self.results[module_name] = self.pool.apply_async(prefetch_module, (module_name,))
+
+    def pop(self, module_name):
+        """
+        Wait for a module to be prefetched, returning its spec and code (or
+        None if it wasn't or couldn't be prefetched).
+        """
+        result = self.results.pop(module_name, None)
+        return None if result is None else result.get()
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.results = {}
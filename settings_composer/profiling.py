@@ -0,0 +1,131 @@
+import sys
+import time
+import types
+
+
+timer = getattr(time, 'perf_counter', time.time)
+
+# Objects that are shared with the rest of the process rather than owned by a
+# setting, so only their own size is counted
+SHALLOW_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType)
+
+
+def iter_referents(value, seen):
+    """
+    Yield a value and everything it contains, skipping any object whose id is
+    in (or has been added to) the seen set.
+    """
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        yield value
+        if isinstance(value, SHALLOW_TYPES):
+            continue
+        if isinstance(value, dict):
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            stack.extend(value)
+        elif hasattr(value, '__dict__'):
+            stack.append(value.__dict__)
+
+
+def deep_sizeof(value, seen=None):
+    """
+    Return the approximate number of bytes used by a value and everything it
+    contains. Objects referenced more than once are only counted once, and
+    objects whose ids are already in the seen set are not counted at all.
+    """
+    seen = set() if seen is None else seen
+    return sum(sys.getsizeof(item) for item in iter_referents(value, seen))
+
+
+class CompositionProfile(object):
+    """
+    Records how long each settings module took to apply, and (once
+    composition is complete) the size of each setting along with the source
+    responsible for its current value.
+    """
+
+    def __init__(self):
+        self.module_times = []  # (source name, inclusive seconds, exclusive seconds)
+        self.module_stack = []
+        self.start_time = None
+        self.total_time = None
+        self.setting_sizes = {}  # name: (bytes, source name)
+
+    def start(self):
+        self.start_time = timer()
+
+    def finish(self):
+        self.total_time = timer() - self.start_time
+
+    def enter_module(self, source_name):
+        self.module_stack.append([source_name, timer(), 0.0])
+
+    def exit_module(self):
+        source_name, start_time, nested_time = self.module_stack.pop()
+        elapsed = timer() - start_time
+        self.module_times.append((source_name, elapsed, elapsed - nested_time))
+        if self.module_stack:
+            self.module_stack[-1][2] += elapsed
+
+    def measure_settings(self, settings, settings_source):
+        for name, value in settings.items():
+            if name == 'SETTINGS_COMPOSER_SOURCE':
+                continue
+            sources = settings_source.get(name) or ['<UNKNOWN>']
+            self.setting_sizes[name] = (deep_sizeof(value), sources[-1])
+
+    def get_source_sizes(self):
+        """
+        Return the total size of the settings attributed to each source.
+        """
+        source_sizes = {}
+        for size, source_name in self.setting_sizes.values():
+            source_sizes[source_name] = source_sizes.get(source_name, 0) + size
+        return source_sizes
+
+    def check_budgets(self, max_total_time=None, max_setting_size=None):
+        """
+        Return a list of messages describing each budget that was exceeded.
+        """
+        violations = []
+        if max_total_time is not None and self.total_time is not None and self.total_time > max_total_time:
+            violations.append(
+                u"Composition took {total_time:.3f}s (budget {budget:.3f}s)".format(
+                    total_time=self.total_time,
+                    budget=max_total_time
+                )
+            )
+        if max_setting_size is not None:
+            for name, (size, source_name) in sorted(self.setting_sizes.items()):
+                if size > max_setting_size:
+                    violations.append(
+                        u"{name} is {size} bytes (budget {budget} bytes), set by {source_name}".format(
+                            name=name,
+                            size=size,
+                            budget=max_setting_size,
+                            source_name=source_name
+                        )
+                    )
+        return violations
+
+    def format_report(self, limit=None):
+        lines = []
+        if self.total_time is not None:
+            lines.append(u"Total composition time: {0:.3f}s".format(self.total_time))
+        lines.append(u"Module times (inclusive / exclusive):")
+        for source_name, inclusive, exclusive in sorted(
+            self.module_times, key=lambda module_time: -module_time[2]
+        )[:limit]:
+            lines.append(u"  {0:8.3f}s {1:8.3f}s  {2}".format(inclusive, exclusive, source_name))
+        lines.append(u"Setting sizes:")
+        for name, (size, source_name) in sorted(
+            self.setting_sizes.items(), key=lambda item: -item[1][0]
+        )[:limit]:
+            lines.append(u"  {0:>10} bytes  {1}  ({2})".format(size, name, source_name))
+        return lines
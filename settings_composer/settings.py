@@ -2,6 +2,8 @@
 # based on environment variables
 
 from .loading import collect_settings
+from .tracking import install_access_tracker
 
 
 collect_settings(globals())
+install_access_tracker()
@@ -0,0 +1,192 @@
+from contextlib import contextmanager
+
+try:
+    from contextvars import ContextVar
+except ImportError:
+    ContextVar = None
+    import threading
+
+
+if ContextVar is not None:
+    _current_site = ContextVar('settings_composer_site', default=None)
+
+    def get_current_site():
+        return _current_site.get()
+
+    def activate_site(site_name):
+        """
+        Select the site whose settings are served by the proxy within the
+        current context. Returns a token for deactivate_site.
+        """
+        return _current_site.set(site_name)
+
+    def deactivate_site(token):
+        _current_site.reset(token)
+
+else:
+    # Threads are the only execution context before contextvars
+    _local = threading.local()
+
+    def get_current_site():
+        return getattr(_local, 'site_name', None)
+
+    def activate_site(site_name):
+        token = get_current_site()
+        _local.site_name = site_name
+        return token
+
+    def deactivate_site(token):
+        _local.site_name = token
+
+
+@contextmanager
+def site(site_name):
+    token = activate_site(site_name)
+    try:
+        yield
+    finally:
+        deactivate_site(token)
+
+
+def _same_value(value, other_value):
+    if value is other_value:
+        return True
+    try:
+        return type(value) is type(other_value) and bool(value == other_value)
+    except Exception:
+        return False
+
+
+class SiteSettingsStore(object):
+    """
+    Holds the composed settings of several sites. Settings that are equal for
+    every site are stored once; each site only stores the settings that differ.
+    Equal values are interned, so sites that share a value share one object.
+    """
+
+    def __init__(self, site_settings):
+        self.site_names = list(site_settings)
+        self.common = {}
+        self.overrides = dict((site_name, {}) for site_name in self.site_names)
+        names = set()
+        for settings in site_settings.values():
+            names.update(settings)
+        for name in names:
+            distinct_values = []
+            values = {}
+            for site_name, settings in site_settings.items():
+                if name not in settings:
+                    continue
+                value = settings[name]
+                for distinct_value in distinct_values:
+                    if _same_value(distinct_value, value):
+                        value = distinct_value
+                        break
+                else:
+                    distinct_values.append(value)
+                values[site_name] = value
+            if len(distinct_values) == 1 and len(values) == len(self.site_names):
+                self.common[name] = distinct_values[0]
+            else:
+                for site_name, value in values.items():
+                    self.overrides[site_name][name] = value
+
+    def get_settings(self, site_name):
+        """
+        Return a complete settings dictionary for a site.
+        """
+        settings = dict(self.common)
+        settings.update(self.overrides[site_name])
+        return settings
+
+
+class SiteSettingsProxy(object):
+    """
+    Serves the settings of the active site (see activate_site), falling back
+    to the default site outside of a site context.
+    """
+
+    def __init__(self):
+        self._store = None
+        self._default_site_name = None
+
+    def install(self, store, default_site_name):
+        self._store = store
+        self._default_site_name = default_site_name
+
+    @property
+    def site_names(self):
+        return self._store.site_names if self._store else []
+
+    def __getattr__(self, name):
+        store = self.__dict__['_store']
+        if store is None:
+            raise AttributeError(
+                "Settings Composer: No site settings have been composed"
+            )
+        overrides = store.overrides.get(get_current_site() or self._default_site_name)
+        if overrides is None:
+            raise AttributeError(
+                "Settings Composer: Site '{site_name}' has not been composed".format(
+                    site_name=get_current_site()
+                )
+            )
+        try:
+            return overrides[name]
+        except KeyError:
+            try:
+                return store.common[name]
+            except KeyError:
+                raise AttributeError(name)
+
+
+settings = SiteSettingsProxy()
+
+
+def _host_matches(host, pattern):
+    return host == pattern or (
+        pattern.startswith('.') and (host.endswith(pattern) or host == pattern[1:])
+    )
+
+
+class SiteSettingsMiddleware(object):
+    """
+    Activates the site for each request. By default the site is chosen by
+    matching the request's host against each site's ALLOWED_HOSTS (wildcards
+    are ignored); override resolve_site to choose it some other way.
+
+    Django validates hosts against its own ALLOWED_HOSTS (those of the default
+    site), so that setting must allow the hosts of every site.
+    """
+
+    def __init__(self, get_response=None):
+        self.get_response = get_response
+        self.host_patterns = None
+
+    def __call__(self, request):
+        token = activate_site(self.resolve_site(request))
+        try:
+            return self.get_response(request)
+        finally:
+            deactivate_site(token)
+
+    def get_host_patterns(self):
+        if self.host_patterns is None:
+            self.host_patterns = []
+            for site_name in settings.site_names:
+                with site(site_name):
+                    allowed_hosts = getattr(settings, 'ALLOWED_HOSTS', [])
+                self.host_patterns.extend(
+                    (pattern.lower(), site_name)
+                    for pattern in allowed_hosts
+                    if pattern != '*'
+                )
+        return self.host_patterns
+
+    def resolve_site(self, request):
+        host = request.META.get('HTTP_HOST') or request.META.get('SERVER_NAME', '')
+        host = host.rsplit(':', 1)[0].lower()
+        for pattern, site_name in self.get_host_patterns():
+            if _host_matches(host, pattern):
+                return site_name
+        return None
@@ -0,0 +1,217 @@
+import array
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+
+from .helpers import get_private_dir
+
+SORTED_SET_MAGIC = b'SCS1'
+SORTED_SET_HEADER = struct.Struct('<4sQQ')  # Magic, number of items, index offset
+SORTED_SET_OFFSETS = struct.Struct('<QQ')  # Start and end of an item
+
+
+def _unique(sorted_items):
+    previous = None
+    for index, item in enumerate(sorted_items):
+        if index == 0 or item != previous:
+            yield item
+        previous = item
+
+
+def _encode_batch(items):
+    return sorted(set(item.encode('utf-8') for item in items))
+
+
+def write_sorted_set(encoded_items, directory):
+    """
+    Write an iterable of sorted, distinct UTF-8 encoded strings to a file in
+    the directory, returning its path:
+
+        header | items (concatenated) | index (the offset of each item, plus
+        the end of the last one)
+
+    Files are named by the hash of their content, so that processes composing
+    the same settings share a single file (and a single copy in memory).
+    """
+    path, set_map = map_new_sorted_set(encoded_items, directory)
+    set_map.close()
+    return path
+
+
+def map_new_sorted_set(encoded_items, directory):
+    """
+    Write a sorted set file as write_sorted_set does, returning its path and
+    a read-only memory map of it. The file is mapped before it is moved into
+    place, so the mapping is valid even if another process deletes the file.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    digest = hashlib.sha1()
+    try:
+        with os.fdopen(descriptor, 'w+b') as output:
+            output.write(b'\0' * SORTED_SET_HEADER.size)
+            offsets = array.array('Q', [SORTED_SET_HEADER.size])
+            for item in encoded_items:
+                output.write(item)
+                digest.update(struct.pack('<Q', len(item)))
+                digest.update(item)
+                offsets.append(offsets[-1] + len(item))
+            index_offset = offsets[-1]
+            if struct.pack('=Q', 1) != struct.pack('<Q', 1):
+                offsets.byteswap()
+            output.write(offsets.tobytes() if hasattr(offsets, 'tobytes') else offsets.tostring())
+            output.seek(0)
+            output.write(SORTED_SET_HEADER.pack(SORTED_SET_MAGIC, len(offsets) - 1, index_offset))
+            output.flush()
+            set_map = mmap.mmap(output.fileno(), 0, access=mmap.ACCESS_READ)
+        path = os.path.join(directory, digest.hexdigest() + '.set')
+        os.rename(temporary_path, path)  # Atomic, so readers never see a partial file
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+    return path, set_map
+
+
+def remove_sorted_set(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # Already removed by another process
+
+
+class SortedStringSet(object):
+    """
+    An immutable set of strings for very large collection settings (such as
+    IP or host blocklists), stored in a sorted file that is memory-mapped
+    rather than held as Python objects. Membership is a binary search, and
+    since the mapping is read-only and shared, forked workers (and other
+    processes composing the same settings) share one physical copy.
+
+    extend_setting and exclude_from_setting understand these sets: each
+    merges its whole batch of items with the existing file in a single pass,
+    producing a new set. Create one from any iterable of strings with
+    SortedStringSet.from_items().
+
+    The files of sets produced by merges are intermediate: each is deleted
+    as soon as it is merged into another. Sets remain usable (and picklable)
+    once their file has been deleted.
+    """
+
+    def __init__(self, path, set_map=None, is_intermediate=False):
+        self.path = path
+        self.directory = os.path.dirname(path)
+        self.is_intermediate = is_intermediate
+        if set_map is None:
+            with open(path, 'rb') as set_file:
+                set_map = mmap.mmap(set_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.map = set_map
+        magic, self.count, self.index_offset = SORTED_SET_HEADER.unpack_from(self.map, 0)
+        if magic != SORTED_SET_MAGIC:
+            self.map.close()
+            raise ValueError(
+                "Settings Composer: {path} is not a sorted set file".format(path=path)
+            )
+
+    @classmethod
+    def from_items(cls, items, directory=None):
+        """
+        Create a set, by default in a temporary directory private to the
+        current user.
+        """
+        return cls(*map_new_sorted_set(_encode_batch(items), directory or get_private_dir('sorted_sets')))
+
+    def supersede(self, encoded_items):
+        """
+        Return a new (intermediate) set of the given items, deleting this
+        set's file if it was intermediate too.
+        """
+        path, set_map = map_new_sorted_set(encoded_items, self.directory)
+        if self.is_intermediate and path != self.path:
+            remove_sorted_set(self.path)
+        return SortedStringSet(path, set_map, is_intermediate=True)
+
+    def get_encoded(self, index):
+        start, end = SORTED_SET_OFFSETS.unpack_from(self.map, self.index_offset + index * 8)
+        return self.map[start:end]
+
+    def iter_encoded(self):
+        for index in range(self.count):
+            yield self.get_encoded(index)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for item in self.iter_encoded():
+            yield item.decode('utf-8')
+
+    def contains_encoded(self, item):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_encoded(middle) < item:
+                low = middle + 1
+            else:
+                high = middle
+        return low < self.count and self.get_encoded(low) == item
+
+    def __contains__(self, item):
+        try:
+            return self.contains_encoded(item.encode('utf-8'))
+        except AttributeError:
+            return False
+
+    def union(self, items):
+        """
+        Return a new set holding these items plus the given ones.
+        """
+        batch = _encode_batch(items)
+        if not batch:
+            return self
+        return self.supersede(_unique(heapq.merge(self.iter_encoded(), batch)))
+
+    def difference(self, items):
+        """
+        Return a new set holding these items, except the given ones.
+        """
+        batch = set(_encode_batch(items))
+        if not any(self.contains_encoded(item) for item in batch):
+            return self
+        return self.supersede(item for item in self.iter_encoded() if item not in batch)
+
+    # Sets are immutable and named by their content, so copies can be shared
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        if os.path.exists(self.path):
+            return (SortedStringSet, (self.path,))
+        # The file has been deleted, so the items are written out again
+        return (_restore_sorted_set, (list(self.iter_encoded()), self.directory))
+
+    def __eq__(self, other):
+        if not isinstance(other, SortedStringSet):
+            return NotImplemented
+        return os.path.basename(self.path) == os.path.basename(other.path)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(os.path.basename(self.path))
+
+    def __repr__(self):
+        return 'SortedStringSet({path!r})'.format(path=self.path)
+
+
+def _restore_sorted_set(encoded_items, directory):
+    return SortedStringSet(*map_new_sorted_set(encoded_items, directory))
@@ -0,0 +1,306 @@
+import hashlib
+import json
+import os
+import threading
+
+from . import environment
+from .exceptions import improperly_configured
+from .helpers import content_hash, get_private_dir, output_if_verbose
+
+# Returned by stores in place of a value whose version hasn't changed
+NOT_MODIFIED = object()
+
+
+class StoreUnavailable(Exception):
+    """
+    Raised by key-value store clients when the store can't be reached, or
+    doesn't respond in time.
+    """
+
+
+class KeyValueStore(object):
+    """
+    Base class for key-value store clients, which must override fetch().
+    """
+
+    def fetch(self, versions):
+        """
+        Fetch values from the store. Passed a dictionary of the keys to fetch,
+        each with the version of its value that is already held (or None).
+        Returns a dictionary of (version, value) pairs for each of those keys
+        that is in the store, where the value is NOT_MODIFIED if the version
+        held is still current. Values must be JSON serialisable, so that they
+        can be cached. Raises StoreUnavailable if the store can't be reached.
+        """
+        raise NotImplementedError(
+            "Settings Composer: {class_name} must override fetch()".format(
+                class_name=type(self).__name__
+            )
+        )
+
+
+class LocalKeyValueStore(KeyValueStore):
+    """
+    A key-value store held in memory, for development and testing. Each value
+    is versioned by the hash of its content.
+    """
+
+    def __init__(self, values=None):
+        self.values = {}
+        self.versions = {}
+        self.available = True
+        for key, value in (values or {}).items():
+            self.set(key, value)
+
+    def set(self, key, value):
+        self.values[key] = json.dumps(value)
+        self.versions[key] = content_hash(value)
+
+    def delete(self, key):
+        del self.values[key]
+        del self.versions[key]
+
+    def fetch(self, versions):
+        if not self.available:
+            raise StoreUnavailable('store is not available')
+        results = {}
+        for key, version in versions.items():
+            if key in self.values:
+                current_version = self.versions[key]
+                if version == current_version:
+                    results[key] = (current_version, NOT_MODIFIED)
+                else:
+                    results[key] = (current_version, json.loads(self.values[key]))
+        return results
+
+
+class HTTPKeyValueStore(KeyValueStore):
+    """
+    A client for key-value stores served over HTTP. Keys are fetched in
+    batches, by POSTing {"keys": {key: version held, ...}} to the URL. The
+    response is a JSON object holding {"version": ..., "value": ...} for each
+    key in the store, with the value left out if the version held is current.
+    """
+
+    def __init__(self, url, timeout=2.0, batch_size=100, headers=None):
+        self.url = url
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.headers = headers or {}
+
+    def fetch(self, versions):
+        keys = sorted(versions)
+        results = {}
+        for start in range(0, len(keys), self.batch_size):
+            batch = dict((key, versions[key]) for key in keys[start:start + self.batch_size])
+            for key, entry in self.fetch_batch(batch).items():
+                results[key] = (entry['version'], entry['value'] if 'value' in entry else NOT_MODIFIED)
+        return results
+
+    def fetch_batch(self, versions):
+        # HTTP modules are only imported when needed, as they are slow to import
+        try:
+            from urllib.request import Request, urlopen
+        except ImportError:  # Python 2
+            from urllib2 import Request, urlopen
+        headers = {'Content-Type': 'application/json'}
+        headers.update(self.headers)
+        request = Request(self.url, json.dumps({'keys': versions}).encode('utf-8'), headers)
+        try:
+            response = urlopen(request, timeout=self.timeout)
+            try:
+                return json.loads(response.read().decode('utf-8'))
+            finally:
+                response.close()
+        except (IOError, OSError, ValueError) as error:
+            raise StoreUnavailable(u'{0}'.format(error))
+
+
+class LocalStoreServer(object):
+    """
+    Serves a LocalKeyValueStore over HTTP (as expected by HTTPKeyValueStore)
+    from a background thread, as a stand-in for a real store.
+    """
+
+    def __init__(self, store, host='127.0.0.1', port=0):
+        try:
+            from http.server import BaseHTTPRequestHandler, HTTPServer
+        except ImportError:  # Python 2
+            from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+        self.store = store
+        self.requests = []
+        server = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                content = self.rfile.read(int(self.headers['Content-Length']))
+                versions = json.loads(content.decode('utf-8'))['keys']
+                server.requests.append(versions)
+                try:
+                    results = server.store.fetch(versions)
+                except StoreUnavailable:
+                    self.send_error(503)
+                    return
+                response = {}
+                for key, (version, value) in results.items():
+                    response[key] = {'version': version}
+                    if value is not NOT_MODIFIED:
+                        response[key]['value'] = value
+                body = json.dumps(response).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.http_server = HTTPServer((host, port), RequestHandler)
+        self.url = 'http://{0}:{1}/'.format(*self.http_server.server_address[:2])
+        self.thread = threading.Thread(target=self.http_server.serve_forever)
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+        self.thread.join()
+
+
+STORES = {}
+
+
+def register_store(store_name, store):
+    """
+    Make a key-value store client available to load_store under a name.
+    """
+    STORES[store_name] = store
+
+
+def get_store(store_name):
+    try:
+        return STORES[store_name]
+    except KeyError:
+        raise ValueError(
+            "Settings Composer: No key-value store named '{store_name}'".format(
+                store_name=store_name
+            )
+        )
+
+
+class StoreCache(object):
+    """
+    Keeps the last version and value fetched for each key of each store, so
+    that only changed values are transferred, and so that settings can still
+    be composed when a store is unavailable. If a directory is given, entries
+    are persisted there, so the cache survives restarts.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.entries = {}
+
+    def get_entries_path(self, store_name):
+        return os.path.join(
+            self.directory,
+            hashlib.sha1(store_name.encode('utf-8')).hexdigest() + '.json'
+        )
+
+    def get_entries(self, store_name):
+        entries = self.entries.get(store_name)
+        if entries is None:
+            entries = {}
+            if self.directory:
+                try:
+                    with open(self.get_entries_path(store_name)) as entries_file:
+                        entries = json.load(entries_file)
+                except (IOError, OSError, ValueError):
+                    entries = {}
+            self.entries[store_name] = entries
+        return entries
+
+    def save_entries(self, store_name):
+        if self.directory:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            temporary_path = self.get_entries_path(store_name) + '.tmp'
+            with open(temporary_path, 'w') as entries_file:
+                json.dump(self.entries[store_name], entries_file)
+            os.rename(temporary_path, self.get_entries_path(store_name))
+
+
+_store_cache = None
+
+
+def get_store_cache():
+    """
+    Return the cache of the values fetched from stores, kept in
+    SETTINGS_COMPOSER_STORE_CACHE, or else in a directory private to the
+    current user, as cached values are used in place of the store's.
+    """
+    global _store_cache
+    directory = environment.get_store_cache_dir() or get_private_dir('stores')
+    if _store_cache is None or _store_cache.directory != directory:
+        _store_cache = StoreCache(directory)
+    return _store_cache
+
+
+def read_store(store_name, keys, cache=None):
+    """
+    Fetch keys from a registered store in a single request, returning a
+    (value, version, is_cached) triple for each key in the store. If the
+    store is unavailable, the values last fetched from it are used instead.
+    Keys that weren't in the store are cached as None, so that they can be
+    told apart from keys that have never been fetched.
+    """
+    store = get_store(store_name)
+    cache = cache or get_store_cache()
+    entries = cache.get_entries(store_name)
+    try:
+        results = store.fetch(dict(
+            (key, entries[key]['version'] if entries.get(key) else None)
+            for key in keys
+        ))
+    except StoreUnavailable as error:
+        missing_keys = [key for key in keys if key not in entries]
+        if missing_keys:
+            raise improperly_configured(
+                u"Settings Composer: Key-value store '{store_name}' is unavailable ({error}) and has no cached value for {keys}".format(
+                    store_name=store_name,
+                    error=error,
+                    keys=u', '.join(missing_keys)
+                )
+            )
+        output_if_verbose(
+            u"Key-value store '{store_name}' is unavailable ({error}), using cached values".format(
+                store_name=store_name,
+                error=error
+            )
+        )
+        return dict(
+            (key, (entries[key]['value'], entries[key]['version'], True))
+            for key in keys if entries[key] is not None
+        )
+    values = {}
+    changed = False
+    for key in keys:
+        if key not in results:
+            if key not in entries or entries[key] is not None:
+                entries[key] = None
+                changed = True
+            continue
+        version, value = results[key]
+        if value is NOT_MODIFIED:
+            value = entries[key]['value']
+        else:
+            entries[key] = {'version': version, 'value': value}
+            changed = True
+        values[key] = (value, version, False)
+    if changed:
+        cache.save_entries(store_name)
+    return values
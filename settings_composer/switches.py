@@ -0,0 +1,224 @@
+import copy
+
+
+# Marks a setting that did not exist before (or after) a switch was applied
+MISSING = object()
+
+
+class AttributeSettings(object):
+    """
+    Presents an attribute-style settings object (such as django.conf.settings)
+    with the small subset of the dictionary interface the composer relies on.
+    """
+
+    def __init__(self, settings_object):
+        self.settings_object = settings_object
+
+    def keys(self):
+        return [name for name in dir(self.settings_object) if name.isupper()]
+
+    def items(self):
+        return [(name, self[name]) for name in self.keys()]
+
+    def get(self, name, default=None):
+        return getattr(self.settings_object, name, default)
+
+    def pop(self, name, default=None):
+        value = self.get(name, default)
+        if name in self:
+            del self[name]
+        return value
+
+    def __contains__(self, name):
+        return hasattr(self.settings_object, name)
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self.settings_object, name)
+        except AttributeError:
+            raise KeyError(name)
+
+    def __setitem__(self, name, value):
+        setattr(self.settings_object, name, value)
+
+    def __delitem__(self, name):
+        delattr(self.settings_object, name)
+
+
+class RecordingSettings(object):
+    """
+    Presents the settings to clean functions run while switches are being
+    applied at runtime, so that the prior state of any setting they assign or
+    delete directly is recorded by the switches. Values changed in place are
+    not recorded.
+    """
+
+    def __init__(self, settings, record_change):
+        self.settings = settings
+        self.record_change = record_change
+
+    def keys(self):
+        return list(self.settings.keys())
+
+    def values(self):
+        return [self.settings[name] for name in self.keys()]
+
+    def items(self):
+        return [(name, self.settings[name]) for name in self.keys()]
+
+    def get(self, name, default=None):
+        return self.settings.get(name, default)
+
+    def pop(self, name, default=None):
+        value = self.get(name, default)
+        if name in self:
+            del self[name]
+        return value
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def update(self, *args, **kwargs):
+        for name, value in dict(*args, **kwargs).items():
+            self[name] = value
+
+    def __contains__(self, name):
+        return name in self.settings
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __getitem__(self, name):
+        return self.settings[name]
+
+    def __setitem__(self, name, value):
+        self.record_change(name)
+        self.settings[name] = value
+
+    def __delitem__(self, name):
+        self.record_change(name)
+        del self.settings[name]
+
+
+def as_settings_mapping(target_settings):
+    if hasattr(target_settings, 'keys'):  # dictionary
+        return target_settings
+    return AttributeSettings(target_settings)
+
+
+class SwitchDelta(object):
+    """
+    The key-level change produced by applying a switch. For every setting the
+    switch touched, both the value and source list immediately before and
+    immediately after the switch are kept, so the change can be replayed or
+    undone without recomposing.
+    """
+
+    def __init__(self, group_name, switch_name, source_name):
+        self.group_name = group_name
+        self.switch_name = switch_name
+        self.source_name = source_name
+        self.before = {}
+        self.after = {}
+        self.reads = set()  # Settings whose prior value affected the result
+
+    def __repr__(self):
+        return '<SwitchDelta {group_name}: {switch_name} ({keys})>'.format(
+            group_name=self.group_name,
+            switch_name=self.switch_name,
+            keys=', '.join(sorted(self.before))
+        )
+
+    @property
+    def changed_keys(self):
+        return list(self.before)
+
+    def record_before(self, name, settings, settings_source):
+        # Only the first change to a key within the switch matters
+        if name not in self.before:
+            self.before[name] = self.snapshot(name, settings, settings_source)
+
+    def record_after(self, settings, settings_source):
+        for name in self.before:
+            self.after[name] = self.snapshot(name, settings, settings_source)
+
+    def snapshot(self, name, settings, settings_source):
+        value = settings[name] if name in settings else MISSING
+        if value is not MISSING:
+            # Containers may be extended or updated in place later on
+            value = copy.copy(value)
+        return value, list(settings_source.get(name, []))
+
+    def inverse(self):
+        delta = SwitchDelta(self.group_name, self.switch_name, self.source_name)
+        delta.before = self.after
+        delta.after = self.before
+        delta.reads = self.reads
+        return delta
+
+    def apply(self, target_settings, settings_source):
+        """
+        Write the 'after' state of every changed key into the target settings.
+        Only the affected keys are touched.
+        """
+        settings = as_settings_mapping(target_settings)
+        for name, (value, source) in self.after.items():
+            if value is MISSING:
+                settings.pop(name, None)
+                settings_source.pop(name, None)
+            else:
+                settings[name] = copy.copy(value)
+                settings_source[name] = list(source)
+
+
+class SwitchHistory(object):
+    """
+    The switch definitions known to the manager, plus the deltas of every
+    switch that has been applied, in the order they were applied.
+    """
+
+    def __init__(self):
+        self.definitions = {}
+        self.deltas = []
+
+    def copy(self):
+        switch_history = SwitchHistory()
+        switch_history.definitions = dict(
+            (group_name, dict(switches))
+            for group_name, switches in self.definitions.items()
+        )
+        switch_history.deltas = list(self.deltas)
+        return switch_history
+
+    def record(self, delta):
+        self.deltas.append(delta)
+
+    def get_last_delta(self, group_name, switch_name):
+        for delta in reversed(self.deltas):
+            if (delta.group_name, delta.switch_name) == (group_name, switch_name):
+                return delta
+        raise ValueError(
+            "Settings Composer: Switch {group_name}: {switch_name} has not been applied".format(
+                group_name=group_name,
+                switch_name=switch_name
+            )
+        )
+
+    def get_applied_switches(self):
+        return [(delta.group_name, delta.switch_name) for delta in self.deltas]
+
+    def revert(self, target_settings, settings_source, group_name, switch_name):
+        """
+        Undo the most recent application of a switch. Settings it touched are
+        restored to their state immediately before it was applied, including
+        any later changes made to those same keys.
+        """
+        delta = self.get_last_delta(group_name, switch_name)
+        delta.inverse().apply(target_settings, settings_source)
+        self.deltas.remove(delta)
+        return delta
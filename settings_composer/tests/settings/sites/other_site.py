@@ -0,0 +1,6 @@
+import settings_composer
+
+settings_composer.apply_switch('debug', 'on')
+
+
+LOADED_OTHER_SITE_SETTINGS = True
@@ -0,0 +1,279 @@
+import ast
+import os
+import shutil
+import tempfile
+import textwrap
+
+from unittest import TestCase
+
+import mock
+
+from settings_composer.analysis import Issue, SettingsTreeAnalyser
+
+
+SETTINGS_TREE = {
+    'proj/__init__.py': '',
+    'proj/settings/__init__.py': '''
+        import settings_composer
+        from settings_composer import extend_setting as extend
+
+        INSTALLED_APPS = ['core']
+
+        settings_composer.load('proj.settings.switches')
+        settings_composer.apply_switch('debug', 'on')
+
+        def clean(settings):
+            settings_composer.update_setting('LATE', flag=True)
+            settings_composer.update_setting('NEVER_DEFINED', flag=True)
+
+        settings_composer.clean(clean)
+    ''',
+    'proj/settings/switches.py': '''
+        import settings_composer
+
+        settings_composer.create_switch('debug', 'on', {'DEBUG': True})
+        settings_composer.create_switch('debug', 'on', {'DEBUG': True})
+        settings_composer.create_switch('cache', 'on', 'proj.settings.cache')
+    ''',
+    'proj/settings/cache.py': '''
+        CACHES = {}
+    ''',
+    'proj/settings/env/__init__.py': '',
+    'proj/settings/env/local.py': '''
+        import settings_composer as composer
+
+        LATE = {}
+
+        composer.extend_setting('INSTALLED_APPS', ['debug_toolbar'])
+        composer.apply_switch('cache', 'on')
+        composer.update_setting('CACHES', default={})
+        composer.load_for_role('worker', 'proj.settings.worker')
+    ''',
+    'proj/settings/worker.py': '''
+        CELERY_BROKER_URL = 'redis://'
+    ''',
+    'proj/settings/env/production.py': '''
+        from settings_composer import extend_setting, apply_switch
+
+        extend_setting('CACHES', ['nope'])
+        apply_switch('https', 'on')
+    ''',
+    'proj/settings/orphan.py': '''
+        ORPHANED = True
+    ''',
+}
+
+
+class TestSettingsTreeAnalyser(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for path, source in SETTINGS_TREE.items():
+            full_path = os.path.join(self.root, path)
+            if not os.path.isdir(os.path.dirname(full_path)):
+                os.makedirs(os.path.dirname(full_path))
+            with open(full_path, 'w') as module_file:
+                module_file.write(textwrap.dedent(source))
+        self.cache_path = os.path.join(self.root, 'cache.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def get_analyser(self):
+        return SettingsTreeAnalyser(
+            'proj.settings',
+            search_path=[self.root],
+            cache_path=self.cache_path
+        )
+
+    def test_permutations(self):
+        self.assertEqual(
+            self.get_analyser().get_permutations(),
+            [
+                ('', '', ['proj.settings']),
+                ('', 'local', ['proj.settings', 'proj.settings.env.local']),
+                ('', 'production', ['proj.settings', 'proj.settings.env.production']),
+            ]
+        )
+
+    def test_check(self):
+        issues, unreachable_modules = self.get_analyser().check()
+        self.assertEqual(
+            issues,
+            {
+                Issue(
+                    'duplicate_switch', 'proj.settings.switches', 5,
+                    'Switch debug: on already defined in proj.settings.switches'
+                ): [('', ''), ('', 'local'), ('', 'production')],
+                Issue(
+                    'undefined_setting', 'proj.settings', 11,
+                    "Can't update LATE (not defined)"
+                ): [('', ''), ('', 'production')],
+                Issue(
+                    'undefined_setting', 'proj.settings', 12,
+                    "Can't update NEVER_DEFINED (not defined)"
+                ): [('', ''), ('', 'local'), ('', 'production')],
+                Issue(
+                    'undefined_setting', 'proj.settings.env.production', 4,
+                    "Can't extend CACHES (not defined)"
+                ): [('', 'production')],
+                Issue(
+                    'undefined_switch', 'proj.settings.env.production', 5,
+                    'Switch https: on is not defined'
+                ): [('', 'production')],
+            }
+        )
+        self.assertEqual(unreachable_modules, ['proj.settings.orphan'])
+
+    def test_cyclic_loads(self):
+        self.write_module('proj/settings/worker.py', """
+            import settings_composer
+
+            settings_composer.load('proj.settings.env.local')
+        """)
+        self.write_module('proj/settings/env/local.py', """
+            import settings_composer
+
+            settings_composer.load('proj.settings.worker')
+        """)
+        self.write_module('proj/settings/cache.py', """
+            import settings_composer
+
+            def clean(settings):
+                settings_composer.apply_switch('cache', 'on')
+
+            settings_composer.clean(clean)
+        """)
+        analyser = self.get_analyser()
+        issues, unreachable_modules = analyser.check()
+        cyclic_issues = sorted(
+            (issue, permutations) for issue, permutations in issues.items() if issue.kind == 'cyclic_load'
+        )
+        self.assertEqual(
+            cyclic_issues,
+            [
+                (
+                    Issue(
+                        'cyclic_load', 'proj.settings.cache', 5,
+                        'Loading proj.settings.cache would load it again (proj.settings.cache -> proj.settings.cache)'
+                    ),
+                    [('', ''), ('', 'local'), ('', 'production')]
+                ),
+                (
+                    Issue(
+                        'cyclic_load', 'proj.settings.worker', 4,
+                        'Loading proj.settings.env.local would load it again '
+                        '(proj.settings.env.local -> proj.settings.worker -> proj.settings.env.local)'
+                    ),
+                    [('', 'local')]
+                ),
+            ]
+        )
+        # The dependency graph of a cyclic tree is still reported
+        graph = analyser.get_dependency_graph(['proj.settings', 'proj.settings.env.local'])
+        self.assertIn(('proj.settings.worker', 'proj.settings.env.local', 'load'), graph['edges'])
+
+    def test_check_imports_and_unapplied_switches(self):
+        self.write_module('proj/settings/common.py', "HOSTS = ['example.com']\n")
+        self.write_module('proj/settings/worker.py', "from .common import HOSTS\n")
+        self.write_module('proj/settings/switches.py', '''
+            import settings_composer
+
+            settings_composer.create_switch('cache', 'on', 'proj.settings.cache')
+            settings_composer.create_switch('queue', 'on', 'proj.settings.orphan')
+        ''')
+        issues, unreachable_modules = self.get_analyser().check()
+        # The switch module could be applied through SETTINGS_COMPOSER_SWITCHES
+        self.assertEqual(unreachable_modules, [])
+
+    def write_module(self, path, source):
+        with open(os.path.join(self.root, path), 'w') as module_file:
+            module_file.write(textwrap.dedent(source))
+
+    def test_cache(self):
+        self.get_analyser().check()
+        self.assertTrue(os.path.isfile(self.cache_path))
+        with mock.patch('settings_composer.analysis.ast.parse') as parse:
+            self.get_analyser().check()
+            self.assertFalse(parse.called)
+        # Only the changed file is parsed again
+        with open(os.path.join(self.root, 'proj/settings/orphan.py'), 'a') as module_file:
+            module_file.write('ALSO_ORPHANED = True\n')
+        with mock.patch('settings_composer.analysis.ast.parse', wraps=ast.parse) as parse:
+            self.get_analyser().check()
+            self.assertEqual(parse.call_count, 1)
+
+    def test_test_settings(self):
+        analyser = SettingsTreeAnalyser('settings_composer.tests.settings')
+        issues, unreachable_modules = analyser.check()
+        self.assertEqual(issues, {})
+        self.assertEqual(unreachable_modules, ['settings_composer.tests.settings.sites'])
+
+    def test_dependency_graph(self):
+        graph = self.get_analyser().get_dependency_graph(['proj.settings', 'proj.settings.env.local'])
+        self.assertEqual(
+            graph['modules'],
+            [
+                'proj.settings',
+                'proj.settings.cache',
+                'proj.settings.env.local',
+                'proj.settings.switches',
+                'proj.settings.worker',
+            ]
+        )
+        self.assertIn(('proj.settings.env.local', 'proj.settings.cache', 'switch'), graph['edges'])
+        self.assertIn(('proj.settings', 'proj.settings.switches', 'load'), graph['edges'])
+        self.assertIn(os.path.join(self.root, 'proj', 'settings', 'env', '__init__.py'), graph['paths'])
+        self.assertIn(os.path.join(self.root, 'proj', 'settings', 'env', 'local.toml'), graph['paths'])
+
+    def test_affected_permutations(self):
+        analyser = self.get_analyser()
+
+        def get_affected_permutations(*paths):
+            return analyser.get_affected_permutations(
+                [os.path.join(self.root, *path.split('/')) for path in paths]
+            )
+
+        self.assertEqual(get_affected_permutations('proj/settings/env/production.py'), [('', 'production')])
+        self.assertEqual(get_affected_permutations('proj/settings/env/local.json'), [('', 'local')])
+        self.assertEqual(get_affected_permutations('proj/settings/orphan.py', 'README.md'), [])
+        # Switch modules could be applied by any permutation that defines them
+        self.assertEqual(
+            get_affected_permutations('proj/settings/cache.py'),
+            [('', ''), ('', 'local'), ('', 'production')]
+        )
+
+    def test_affected_by_imports(self):
+        self.write_module('proj/helpers.py', "HOSTS = ['example.com']\n")
+        self.write_module('proj/settings/common.py', "from proj.helpers import HOSTS\n")
+        self.write_module('proj/settings/env/production.py', "from proj.settings.common import HOSTS\n")
+        analyser = self.get_analyser()
+        graph = analyser.get_dependency_graph(['proj.settings', 'proj.settings.env.production'])
+        self.assertIn(('proj.settings.env.production', 'proj.settings.common', 'import'), graph['edges'])
+        self.assertIn(('proj.settings.common', 'proj.helpers', 'import'), graph['edges'])
+        # Modules outside the project aren't followed
+        self.assertNotIn('settings_composer', graph['modules'])
+        for path in ('proj/settings/common.py', 'proj/helpers.py'):
+            self.assertEqual(
+                analyser.get_affected_permutations([os.path.join(self.root, path)]),
+                [('', 'production')]
+            )
+
+    def test_affected_by_dynamic_loads(self):
+        self.write_module('proj/settings/env/production.py', '''
+            import settings_composer
+
+            from proj.settings import dyn
+
+            settings_composer.load(dyn.NAME)
+        ''')
+        self.write_module('proj/settings/dyn.py', "NAME = 'proj.settings.orphan'\n")
+        analyser = self.get_analyser()
+        graph = analyser.get_dependency_graph(['proj.settings', 'proj.settings.env.production'])
+        self.assertEqual(graph['dynamic_modules'], ['proj.settings.env.production'])
+        # The module loaded can't be known, so any change could affect it
+        self.assertEqual(
+            analyser.get_affected_permutations([os.path.join(self.root, 'proj/settings/orphan.py')]),
+            [('', 'production')]
+        )
+        self.assertEqual(analyser.get_affected_permutations([]), [])
@@ -0,0 +1,155 @@
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+
+from unittest import TestCase
+
+import mock
+
+import settings_composer
+from settings_composer import constants, daemon, loading
+from settings_composer.daemon import SettingsDaemon, fetch_settings
+
+
+class TestSettingsDaemon(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.package_name = 'daemon_settings_{0}'.format(id(self))
+        os.makedirs(os.path.join(self.directory, self.package_name, 'env'))
+        self.write_module('__init__.py', 'DEBUG = False\nALLOWED_HOSTS = ["example.com"]\n')
+        self.write_module('env/__init__.py', '')
+        self.write_module('env/local.py', 'DEBUG = True\n')
+        sys.path.insert(0, self.directory)
+        self.addCleanup(sys.path.remove, self.directory)
+        self.addCleanup(self.remove_modules)
+
+        self.socket_path = os.path.join(self.directory, 'daemon.sock')
+        self.daemon = SettingsDaemon(self.socket_path, poll_interval=5.0).start()
+        self.addCleanup(self.daemon.close)
+        self.context = {
+            constants.SETTINGS_MODULE_VARIABLE_NAME: self.package_name,
+            constants.ENV_VARIABLE_NAME: 'local',
+        }
+
+    def write_module(self, path, source):
+        path = os.path.join(self.directory, self.package_name, path)
+        with open(path, 'w') as module_file:
+            module_file.write(source)
+        # Make sure the change is seen, however coarse the file system's timestamps
+        file_stat = os.stat(path)
+        os.utime(path, (file_stat.st_atime, file_stat.st_mtime + len(source)))
+
+    def remove_modules(self):
+        for module_name in list(sys.modules):
+            if module_name.split('.')[0] == self.package_name:
+                del sys.modules[module_name]
+
+    def fetch(self, context):
+        thread = threading.Thread(target=self.daemon.serve_request)
+        thread.start()
+        try:
+            return fetch_settings(self.socket_path, context)
+        finally:
+            thread.join()
+
+    def test_fetch_settings(self):
+        settings = self.fetch(self.context)
+        self.assertEqual(settings['DEBUG'], True)
+        self.assertEqual(settings['ALLOWED_HOSTS'], ['example.com'])
+        self.assertEqual(
+            settings['SETTINGS_COMPOSER_SOURCE']['DEBUG'],
+            [self.package_name, self.package_name + '.env.local']
+        )
+        # Each context is composed once, until its files change
+        with mock.patch.object(self.daemon, 'compose', wraps=self.daemon.compose) as compose:
+            self.fetch(self.context)
+            self.assertEqual(compose.call_count, 0)
+            self.write_module('env/local.py', 'DEBUG = "very"\n')
+            self.assertEqual(self.fetch(self.context)['DEBUG'], 'very')
+            self.assertEqual(compose.call_count, 1)
+            self.fetch(dict(self.context, SETTINGS_COMPOSER_ENV=''))
+            self.assertEqual(compose.call_count, 2)
+
+    def test_evict_modules(self):
+        context = dict(self.context, SETTINGS_COMPOSER_EVICT_MODULES='true')
+        self.assertEqual(self.fetch(context)['DEBUG'], True)
+        self.assertIn(self.package_name + '.env.local', sys.modules)
+        # The files the settings were composed from are still watched
+        self.write_module('env/local.py', 'DEBUG = "very"\n')
+        self.assertEqual(self.fetch(context)['DEBUG'], 'very')
+        self.assertEqual(len(self.daemon.snapshots), 1)
+
+    def test_refresh(self):
+        self.fetch(self.context)
+        self.write_module('__init__.py', 'DEBUG = False\nALLOWED_HOSTS = []\n')
+        self.daemon.refresh()
+        with mock.patch.object(self.daemon, 'compose') as compose:
+            self.assertEqual(self.fetch(self.context)['ALLOWED_HOSTS'], [])
+        self.assertFalse(compose.called)
+
+    def test_composition_error(self):
+        self.write_module('env/broken.py', 'raise ValueError("broken")\n')
+        self.assertIsNone(self.fetch(dict(self.context, SETTINGS_COMPOSER_ENV='broken')))
+
+    def test_ownership(self):
+        self.assertEqual(os.stat(self.socket_path).st_mode & 0o077, 0)
+        other_user_id = os.getuid() + 1
+        # Sockets that belong to other users are never connected to
+        with mock.patch('os.getuid', return_value=other_user_id):
+            self.assertIsNone(fetch_settings(self.socket_path, self.context))
+        if hasattr(socket, 'SO_PEERCRED'):
+            # Nor are responses read from daemons run by other users
+            with mock.patch('os.getuid', return_value=other_user_id), \
+                    mock.patch('settings_composer.daemon.check_socket_owner'), \
+                    mock.patch('settings_composer.daemon.pickle.loads') as loads:
+                self.assertIsNone(self.fetch(self.context))
+            self.assertFalse(loads.called)
+
+    def test_collect_settings(self):
+        environ = dict(self.context, SETTINGS_COMPOSER_DAEMON_SOCKET=self.socket_path)
+        settings = {}
+        thread = threading.Thread(target=self.daemon.serve_request)
+        thread.start()
+        with mock.patch.dict('os.environ', environ), \
+                mock.patch('settings_composer.daemon.fetch_settings', wraps=daemon.fetch_settings) as fetch:
+            loading.collect_settings(settings)
+        thread.join()
+        self.assertEqual(fetch.call_args[0], (self.socket_path, self.context))
+        self.assertEqual(settings['DEBUG'], True)
+        # How the settings were composed is only known to the daemon
+        with self.assertRaises(ValueError) as context:
+            settings_composer.apply_runtime_switch(settings, 'debug', 'on')
+        self.assertIn('not fetched from a settings daemon', str(context.exception))
+
+    def test_collect_settings_evicting_modules(self):
+        environ = dict(
+            self.context,
+            SETTINGS_COMPOSER_DAEMON_SOCKET=self.socket_path,
+            SETTINGS_COMPOSER_EVICT_MODULES='true'
+        )
+        settings = {}
+        thread = threading.Thread(target=self.daemon.serve_request)
+        thread.start()
+        with mock.patch.dict('os.environ', environ), \
+                mock.patch(
+                    'settings_composer.loading.evict_loaded_modules', wraps=loading.evict_loaded_modules
+                ) as evict_loaded_modules:
+            loading.collect_settings(settings)
+        thread.join()
+        self.assertEqual(settings['DEBUG'], True)
+        # Nothing was loaded in this process to be evicted
+        self.assertFalse(evict_loaded_modules.called)
+        self.assertIsNone(settings_composer.settings_manager.switch_history)
+
+    def test_no_daemon(self):
+        self.daemon.close()
+        environ = dict(self.context, SETTINGS_COMPOSER_DAEMON_SOCKET=self.socket_path)
+        settings = {}
+        with mock.patch.dict('os.environ', environ):
+            loading.collect_settings(settings)
+        self.assertEqual(settings['DEBUG'], True)
@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+from settings_composer.differential import (
+    check_engines,
+    generate_program,
+    get_manager_engine,
+    run_differential_tests
+)
+from settings_composer.manager import SettingsManager
+
+
+class ExcludeNothingManager(SettingsManager):
+
+    def handle_exclude_from_setting(self, source_name, setting_name, items):
+        pass
+
+
+class LastCleanFirstManager(SettingsManager):
+
+    def get_clean_action_tasks(self):
+        tasks = super(LastCleanFirstManager, self).get_clean_action_tasks()
+        return tasks and list(reversed(tasks[:-1])) + tasks[-1:]
+
+
+class TestDifferentialTests(TestCase):
+
+    def test_generate_program(self):
+        self.assertEqual(generate_program(1), generate_program(1))
+        self.assertNotEqual(generate_program(1), generate_program(2))
+
+    def test_reference_engine(self):
+        check_engines(50, engines={'settings_manager': get_manager_engine(SettingsManager)})
+
+    def test_mismatches_shrunk(self):
+        mismatches = run_differential_tests(50, engines={
+            'exclude_nothing': get_manager_engine(ExcludeNothingManager),
+            'last_clean_first': get_manager_engine(LastCleanFirstManager),
+        })
+        self.assertEqual([mismatch.engine_name for mismatch in mismatches], ['exclude_nothing', 'last_clean_first'])
+        exclude_nothing, last_clean_first = mismatches
+        self.assertEqual(
+            [statement[0] for statements in exclude_nothing.program['modules'].values() for statement in statements],
+            ['exclude_from_setting']
+        )
+        self.assertIn("settings_composer.exclude_from_setting(", exclude_nothing.reproducer)
+        self.assertEqual(last_clean_first.reproducer.count('settings_composer.clean('), 2)
+        with self.assertRaises(AssertionError):
+            check_engines(50, engines={'exclude_nothing': get_manager_engine(ExcludeNothingManager)})
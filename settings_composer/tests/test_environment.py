@@ -4,7 +4,7 @@ from unittest import TestCase
 
 import mock
 
-from settings_composer import constants, environment
+from settings_composer import constants, environment, exceptions
 
 
 class TestEnvironmentFunctions(TestCase):
@@ -167,3 +167,10 @@ class TestEnvironmentFunctions(TestCase):
                 constants.VERBOSE_VARIABLE_NAME: ' 1 '
             }
             self.assertTrue(environment.is_verbose())
+
+    def test_improperly_configured_without_django(self):
+        with mock.patch.dict('sys.modules', {'django.core.exceptions': None}):
+            with mock.patch('settings_composer.environment.os') as _os:
+                _os.environ = {}
+                with self.assertRaises(exceptions.ImproperlyConfigured):
+                    environment.get_settings_module_name()
@@ -0,0 +1,81 @@
+import sys
+import types
+from unittest import TestCase
+
+import mock
+
+from settings_composer import constants, settings_manager
+from settings_composer.eviction import evict_settings_modules, get_switch_package_names
+from settings_composer.loading import collect_settings
+
+
+class TestEviction(TestCase):
+
+    def setUp(self):
+        self.module = types.ModuleType('evicted_settings')
+        self.module.RETAINED = ['r' * 1000]
+        self.module.FIXTURES = ['f' * 100000]
+        sys.modules['evicted_settings'] = self.module
+
+    def tearDown(self):
+        sys.modules.pop('evicted_settings', None)
+
+    def test_evict(self):
+        settings = {'RETAINED': self.module.RETAINED}
+        fixtures_size = sys.getsizeof(self.module.FIXTURES) + sys.getsizeof(self.module.FIXTURES[0])
+        del self.module
+        report = evict_settings_modules(['evicted_settings', 'missing_settings'], settings)
+        self.assertNotIn('evicted_settings', sys.modules)
+        self.assertEqual([module_name for module_name, size in report], ['evicted_settings'])
+        # Only what the settings no longer refer to is reclaimed
+        size = report[0][1]
+        self.assertGreater(size, fixtures_size)
+        self.assertLess(size, fixtures_size + 1000)
+        self.assertEqual(settings['RETAINED'], ['r' * 1000])
+
+    def test_still_referenced(self):
+        report = evict_settings_modules(['evicted_settings'], {})
+        self.assertEqual(report, [('evicted_settings', 0)])
+
+    def test_function_keeps_globals(self):
+        exec('def clean(settings):\n    return FIXTURES', vars(self.module))
+        settings = {'CLEAN': self.module.clean}
+        del self.module
+        report = evict_settings_modules(['evicted_settings'], settings)
+        self.assertLess(report[0][1], 1000)
+        self.assertEqual(len(settings['CLEAN']({})[0]), 100000)
+
+
+class TestEvictionAfterComposition(TestCase):
+
+    @mock.patch('settings_composer.loading.collate_settings_modules')
+    @mock.patch.dict('os.environ', {constants.EVICT_MODULES_VARIABLE_NAME: 'true'})
+    def test_recompose(self, collate_settings_modules):
+        collate_settings_modules.return_value = [
+            'settings_composer.tests.settings',
+            'settings_composer.tests.settings.env.local',
+        ]
+        settings = {}
+        collect_settings(settings)
+        self.assertIn('settings_composer.tests.settings.env.local', settings_manager.loaded_module_names)
+        switch_package_names = get_switch_package_names(settings_manager.switch_history.definitions)
+        for module_name in settings_manager.loaded_module_names - switch_package_names:
+            self.assertNotIn(module_name, sys.modules)
+        # Modules are simply imported again
+        recomposed_settings = {}
+        collect_settings(recomposed_settings)
+        self.assertEqual(recomposed_settings, settings)
+
+    @mock.patch('settings_composer.loading.collate_settings_modules')
+    @mock.patch.dict('os.environ', {constants.EVICT_MODULES_VARIABLE_NAME: 'true'})
+    def test_runtime_switch(self, collate_settings_modules):
+        collate_settings_modules.return_value = ['settings_composer.tests.settings']
+        settings = {}
+        collect_settings(settings)
+        # The packages of module switches are kept, as importing them again
+        # would redefine their switches
+        self.assertIn('settings_composer.tests.settings', sys.modules)
+        self.assertIn('settings_composer.tests.settings.switches', sys.modules)
+        self.assertNotIn('settings_composer.tests.settings.switch_definitions', sys.modules)
+        delta = settings_manager.apply_runtime_switch(settings, 'thing', 'on')
+        self.assertEqual(delta.switch_name, 'on')
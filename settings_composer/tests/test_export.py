@@ -0,0 +1,79 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from unittest import TestCase
+
+from settings_composer import export
+
+
+class TestExport(TestCase):
+
+    def setUp(self):
+        self.settings = {
+            'ALLOWED_HOSTS': ['example.com', 'www.example.com'],
+            'PORT': 8000,
+            'FEATURES': {'beta': True, 'ratio': 0.5},
+            'BASE_DIR': object,
+            'SETTINGS_COMPOSER_SOURCE': {'PORT': ['settings']},
+        }
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'settings.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_select_settings(self):
+        self.assertEqual(
+            [name for name, value in export.select_settings(self.settings)],
+            ['ALLOWED_HOSTS', 'BASE_DIR', 'FEATURES', 'PORT']
+        )
+        self.assertEqual(
+            export.select_settings(self.settings, ['PORT', 'ALLOWED_*']),
+            [('ALLOWED_HOSTS', ['example.com', 'www.example.com']), ('PORT', 8000)]
+        )
+
+    def test_json(self):
+        output = io.StringIO()
+        export.export_settings(self.settings, output)
+        self.assertEqual(
+            json.loads(output.getvalue()),
+            {
+                'ALLOWED_HOSTS': ['example.com', 'www.example.com'],
+                'BASE_DIR': str(object),
+                'FEATURES': {'beta': True, 'ratio': 0.5},
+                'PORT': 8000,
+            }
+        )
+
+    def test_binary_reader(self):
+        with io.open(self.path, 'wb') as output:
+            export.export_settings(self.settings, output, 'binary')
+        with export.SettingsReader(self.path) as reader:
+            self.assertEqual(reader.keys(), ['ALLOWED_HOSTS', 'BASE_DIR', 'FEATURES', 'PORT'])
+            self.assertEqual(reader['ALLOWED_HOSTS'], ['example.com', 'www.example.com'])
+            self.assertEqual(reader['FEATURES'], {'beta': True, 'ratio': 0.5})
+            self.assertEqual(reader['PORT'], 8000)
+            self.assertNotIn('SETTINGS_COMPOSER_SOURCE', reader)
+            self.assertIsNone(reader.get('MISSING'))
+            with self.assertRaises(KeyError):
+                reader['AAA']
+
+    def test_binary_reader_empty(self):
+        with io.open(self.path, 'wb') as output:
+            export.export_settings(self.settings, output, 'binary', ['NOTHING'])
+        with export.SettingsReader(self.path) as reader:
+            self.assertEqual(reader.keys(), [])
+            self.assertNotIn('PORT', reader)
+
+    def test_reader_invalid_file(self):
+        with io.open(self.path, 'wb') as output:
+            output.write(b'{"PORT": 8000}')
+        with self.assertRaises(ValueError):
+            export.SettingsReader(self.path)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            export.export_settings(self.settings, io.StringIO(), 'yaml')
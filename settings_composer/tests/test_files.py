@@ -0,0 +1,163 @@
+import os
+import shutil
+import sys
+import tempfile
+import textwrap
+
+from unittest import TestCase
+
+import mock
+
+from settings_composer import files
+from settings_composer.manager import SettingsManager
+
+
+SETTINGS_TREE = {
+    'fileproj/__init__.py': '',
+    'fileproj/settings/__init__.py': '''
+        import settings_composer
+
+        ALLOWED_HOSTS = ['localhost']
+
+        settings_composer.load_file('hosts.json', 'secrets.env')
+    ''',
+    'fileproj/settings/hosts.json': '''
+        {"ALLOWED_HOSTS": ["example.com"], "FEATURES": {"search": true}, "ignored": 1}
+    ''',
+    'fileproj/settings/secrets.env': '''
+        # Comments are ignored
+        export SECRET_KEY="abc#123"
+        DATABASE_URL=postgres://localhost/db  # inline comment
+    ''',
+    'fileproj/settings/env/__init__.py': '',
+    'fileproj/settings/env/staging.toml': '''
+        DEBUG = false
+
+        [FEATURES]
+        search = false
+        beta = true
+    ''',
+    'fileproj/settings/env/production.py': '''
+        import settings_composer
+
+        DEBUG = False
+
+        settings_composer.extend_setting('ALLOWED_HOSTS', ['www.example.com'])
+    ''',
+    'fileproj/settings/env/production.json': '''
+        {"DEBUG": true, "ALLOWED_HOSTS": ["example.com"]}
+    ''',
+}
+
+
+class SettingsTreeTestCase(TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        for relative_path, content in SETTINGS_TREE.items():
+            path = os.path.join(self.path, relative_path)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as settings_file:
+                settings_file.write(textwrap.dedent(content).lstrip())
+        sys.path.insert(0, self.path)
+        self.settings_dir = os.path.join(self.path, 'fileproj', 'settings')
+
+    def tearDown(self):
+        sys.path.remove(self.path)
+        for module_name in list(sys.modules):
+            if module_name.startswith('fileproj'):
+                del sys.modules[module_name]
+        shutil.rmtree(self.path)
+
+    def compose(self, *module_names):
+        settings = {}
+        manager = SettingsManager()
+        with mock.patch('settings_composer.settings_manager', manager):
+            manager.bind(settings)
+            for module_name in module_names:
+                manager.apply_settings_module(module_name)
+            manager.process_clean_actions()
+            manager.unbind()
+        return settings
+
+
+class TestSettingsFiles(SettingsTreeTestCase):
+
+    def test_load_file(self):
+        settings = self.compose('fileproj.settings')
+        # Files are loaded before the module's own settings are applied
+        self.assertEqual(settings['ALLOWED_HOSTS'], ['localhost'])
+        self.assertEqual(settings['FEATURES'], {'search': True})
+        self.assertNotIn('ignored', settings)
+        self.assertEqual(settings['SECRET_KEY'], 'abc#123')
+        self.assertEqual(settings['DATABASE_URL'], 'postgres://localhost/db')
+        self.assertEqual(
+            settings['SETTINGS_COMPOSER_SOURCE']['SECRET_KEY'],
+            [u"FILE '{path}' LOADED BY fileproj.settings".format(
+                path=os.path.join(self.settings_dir, 'secrets.env')
+            )]
+        )
+
+    def test_discovered_file(self):
+        settings = self.compose('fileproj.settings', 'fileproj.settings.env.staging')
+        self.assertEqual(settings['DEBUG'], False)
+        self.assertEqual(settings['FEATURES'], {'search': False, 'beta': True})
+        self.assertEqual(
+            settings['SETTINGS_COMPOSER_SOURCE']['DEBUG'],
+            [u"FILE '{path}' FOUND WITH fileproj.settings.env.staging".format(
+                path=os.path.join(self.settings_dir, 'env', 'staging.toml')
+            )]
+        )
+
+    def test_discovered_file_before_module(self):
+        settings = self.compose('fileproj.settings', 'fileproj.settings.env.production')
+        self.assertEqual(settings['DEBUG'], False)
+        self.assertEqual(settings['ALLOWED_HOSTS'], ['example.com', 'www.example.com'])
+
+    def test_unknown_file_type(self):
+        with self.assertRaises(ValueError):
+            files.get_file_parser('settings.ini')
+
+
+class TestParseCache(SettingsTreeTestCase):
+
+    def setUp(self):
+        super(TestParseCache, self).setUp()
+        self.hosts_path = os.path.join(self.settings_dir, 'hosts.json')
+        self.parser = mock.Mock(side_effect=files.parse_json)
+
+    def test_parsed_once(self):
+        cache = files.ParseCache()
+        first = cache.read(self.hosts_path, self.parser)
+        first['ALLOWED_HOSTS'].append('changed')
+        second = cache.read(self.hosts_path, self.parser)
+        self.assertEqual(self.parser.call_count, 1)
+        # Each read receives its own copy
+        self.assertEqual(second['ALLOWED_HOSTS'], ['example.com'])
+
+    def test_touched_file_not_parsed(self):
+        cache = files.ParseCache()
+        cache.read(self.hosts_path, self.parser)
+        stat = os.stat(self.hosts_path)
+        os.utime(self.hosts_path, (stat.st_atime, stat.st_mtime + 10))
+        cache.read(self.hosts_path, self.parser)
+        self.assertEqual(self.parser.call_count, 1)
+        with open(self.hosts_path, 'w') as hosts_file:
+            hosts_file.write('{"ALLOWED_HOSTS": []}')
+        self.assertEqual(cache.read(self.hosts_path, self.parser), {'ALLOWED_HOSTS': []})
+        self.assertEqual(self.parser.call_count, 2)
+
+    def test_persisted(self):
+        directory = os.path.join(self.path, 'cache')
+        files.ParseCache(directory).read(self.hosts_path, self.parser)
+        values = files.ParseCache(directory).read(self.hosts_path, self.parser)
+        self.assertEqual(self.parser.call_count, 1)
+        self.assertEqual(values['FEATURES'], {'search': True})
+
+    def test_parse_error(self):
+        with open(self.hosts_path, 'w') as hosts_file:
+            hosts_file.write('{')
+        with self.assertRaises(ValueError) as context:
+            files.ParseCache().read(self.hosts_path, files.parse_json)
+        self.assertIn(self.hosts_path, str(context.exception))
@@ -5,6 +5,11 @@ except ImportError:
     #  Python 3
     from io import StringIO
 
+import os
+import shutil
+import stat
+import tempfile
+
 from unittest import TestCase
 
 import mock
@@ -85,3 +90,17 @@ class TestHelperFunctions(TestCase):
                 'THIS_IS_A_SETTING': True
             }
         )
+
+    def test_get_private_dir(self):
+        temporary_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temporary_dir)
+        with mock.patch('tempfile.gettempdir', return_value=temporary_dir):
+            private_dir = helpers.get_private_dir('cache')
+            self.assertEqual(os.path.dirname(os.path.dirname(private_dir)), temporary_dir)
+            self.assertEqual(stat.S_IMODE(os.stat(private_dir).st_mode) & 0o077, 0)
+            self.assertEqual(helpers.get_private_dir('cache'), private_dir)
+            # Directories others can access are refused
+            os.chmod(private_dir, 0o777)
+            with self.assertRaises(Exception) as context:
+                helpers.get_private_dir('cache')
+            self.assertIn('only the current user can access', str(context.exception))
@@ -0,0 +1,90 @@
+from unittest import TestCase
+
+import mock
+
+from django.conf import LazySettings
+from django.core.signals import setting_changed
+from django.test.utils import override_settings
+
+from settings_composer.holder import ComposedSettings, configure_settings, get_settings_source
+
+
+class HolderTestCase(TestCase):
+
+    def setUp(self):
+        self.settings = {
+            'DEBUG': True,
+            'INSTALLED_APPS': ['django.contrib.auth'],
+            'TIME_ZONE': 'UTC',
+            'SECRET_KEY': 'secret',
+            'SETTINGS_COMPOSER_SOURCE': {
+                'DEBUG': ['settings', 'settings.env.local'],
+                'INSTALLED_APPS': ['settings'],
+            },
+        }
+        self.django_settings = LazySettings()
+        for patcher in [
+            mock.patch('django.conf.settings', self.django_settings),
+            mock.patch('django.test.utils.settings', self.django_settings),
+            mock.patch.dict('os.environ'),
+            mock.patch('time.tzset'),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class TestComposedSettings(HolderTestCase):
+
+    def test_attributes(self):
+        composed_settings = ComposedSettings(self.settings)
+        # Values are served from the composed settings, not copied
+        self.assertIs(composed_settings.INSTALLED_APPS, self.settings['INSTALLED_APPS'])
+        self.assertEqual(composed_settings.DEFAULT_CHARSET, 'utf-8')
+        self.assertTrue(composed_settings.is_overridden('DEBUG'))
+        self.assertFalse(composed_settings.is_overridden('DEFAULT_CHARSET'))
+        self.assertIn('DEFAULT_CHARSET', dir(composed_settings))
+        self.assertNotIn('SETTINGS_COMPOSER_SOURCE', dir(composed_settings))
+        with self.assertRaises(AttributeError):
+            composed_settings.SETTINGS_COMPOSER_SOURCE
+        with self.assertRaises(AttributeError):
+            composed_settings.DEBUG = False
+        self.assertEqual(composed_settings.get_source('DEBUG'), ['settings', 'settings.env.local'])
+        self.assertEqual(composed_settings.get_source('UNKNOWN'), [])
+
+    def test_invalid_settings(self):
+        self.settings['INSTALLED_APPS'] = 'django.contrib.auth'
+        with self.assertRaises(Exception) as context:
+            configure_settings(self.settings)
+        self.assertIn('INSTALLED_APPS setting must be a list or a tuple', str(context.exception))
+
+    def test_empty_secret_key(self):
+        self.settings['SECRET_KEY'] = ''
+        with self.assertRaises(Exception) as context:
+            configure_settings(self.settings)
+        self.assertIn('SECRET_KEY setting must not be empty', str(context.exception))
+
+
+class TestConfigureSettings(HolderTestCase):
+
+    def test_override_settings(self):
+        configure_settings(self.settings)
+        self.assertIs(self.django_settings.INSTALLED_APPS, self.settings['INSTALLED_APPS'])
+        changes = []
+
+        def record_change(setting, value, enter, **kwargs):
+            changes.append((setting, value, enter))
+
+        setting_changed.connect(record_change)
+        self.addCleanup(setting_changed.disconnect, record_change)
+        with override_settings(DEBUG=False):
+            self.assertFalse(self.django_settings.DEBUG)
+            self.assertEqual(get_settings_source('DEBUG'), ['settings', 'settings.env.local'])
+        self.assertTrue(self.django_settings.DEBUG)
+        self.assertEqual(changes, [('DEBUG', False, True), ('DEBUG', True, False)])
+        # The composed settings are left untouched
+        self.assertTrue(self.settings['DEBUG'])
+
+    def test_settings_module_source(self):
+        self.django_settings.configure(SETTINGS_COMPOSER_SOURCE=self.settings['SETTINGS_COMPOSER_SOURCE'])
+        self.assertEqual(get_settings_source('INSTALLED_APPS'), ['settings'])
+        self.assertEqual(get_settings_source(), self.settings['SETTINGS_COMPOSER_SOURCE'])
@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+
+from unittest import TestCase
+
+import settings_composer
+
+
+# Prints the modules newly loaded by importing the modules named as arguments
+IMPORT_SCRIPT = '''
+import sys
+loaded_module_names = set(sys.modules)
+for module_name in sys.argv[1:]:
+    __import__(module_name)
+sys.stdout.write('\\n'.join(sorted(set(sys.modules) - loaded_module_names)))
+'''
+
+CORE_MODULE_NAMES = [
+    'settings_composer',
+    'settings_composer.environment',
+    'settings_composer.helpers',
+    'settings_composer.loading',
+    'settings_composer.manager',
+]
+
+# The only modules of the package that importing it may load. Optional
+# features are imported when they are used.
+IMPORT_BUDGET = [
+    'settings_composer',
+    'settings_composer.constants',
+    'settings_composer.environment',
+    'settings_composer.exceptions',
+    'settings_composer.helpers',
+    'settings_composer.manager',
+]
+
+# Standard library modules that only optional features need
+OPTIONAL_MODULE_NAMES = [
+    'array',
+    'dis',
+    'hashlib',
+    'heapq',
+    'json',
+    'mmap',
+    'pickle',
+    'socket',
+    'struct',
+    'subprocess',
+    'tempfile',
+]
+
+
+class TestImports(TestCase):
+
+    def get_loaded_module_names(self, module_names):
+        output = subprocess.check_output(
+            [sys.executable, '-c', IMPORT_SCRIPT] + module_names,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(settings_composer.__file__)))
+        )
+        return output.decode('utf-8').split()
+
+    def test_core_modules_do_not_import_django(self):
+        loaded_module_names = self.get_loaded_module_names(CORE_MODULE_NAMES)
+        self.assertEqual([name for name in loaded_module_names if name.split('.')[0] == 'django'], [])
+
+    def test_import_budget(self):
+        loaded_module_names = self.get_loaded_module_names(['settings_composer'])
+        self.assertEqual(
+            [name for name in loaded_module_names if name.split('.')[0] == 'settings_composer'],
+            IMPORT_BUDGET
+        )
+        self.assertEqual([name for name in OPTIONAL_MODULE_NAMES if name in loaded_module_names], [])
@@ -1,40 +1,45 @@
-from collections import deque
+import sys
+import threading
+import types
+
 from unittest import TestCase
 
 import mock
 
+from settings_composer import has_role, manager
+from settings_composer.cleaning import IsolatedSettings
 from settings_composer.manager import (
     ACTION_NAMES,
     ActionContextManager,
-    SettingsManager
+    SettingsManager,
+    register_action,
+    unregister_action
 )
 
 
+def describe_layers(manager):
+    return [
+        (layer.context_name, layer.action_queues, sorted(layer.consumed_names))
+        for layer in manager.layers
+    ]
+
+
 class TestActionContextManager(TestCase):
 
     def setUp(self):
         self.manager = ActionContextManager(['action_1', 'action_2', 'action_3'])
 
     def test_init(self):
-        self.assertEqual(
-            self.manager.action_context_layers,
-            {
-                'action_1': [],
-                'action_2': [],
-                'action_3': [],
-            }
-        )
+        self.assertEqual(self.manager.layers, [])
 
     def test_create_context_layer(self):
-        self.manager.create_context_layer('foo')
+        foo = self.manager.create_context_layer('foo')
         self.manager.create_context_layer('bar')
+        self.assertIs(self.manager.layers[0], foo)
+        # No queues are created until actions are added
         self.assertEqual(
-            self.manager.action_context_layers,
-            {
-                'action_1': [('foo', deque()), ('bar', deque())],
-                'action_2': [('foo', deque()), ('bar', deque())],
-                'action_3': [('foo', deque()), ('bar', deque())]
-            }
+            describe_layers(self.manager),
+            [('foo', {}, []), ('bar', {}, [])]
         )
 
     def test_add_action(self):
@@ -44,31 +49,14 @@ class TestActionContextManager(TestCase):
         self.manager.add_action('action_2', FOO=1)
         self.manager.add_action('action_2', BAR=2)
         self.assertEqual(
-            self.manager.action_context_layers,
-            {
-                'action_1': [
-                    (
-                        'layer_1',
-                        deque([{'foo': 1, 'bar': 2}])
-                    ),
-                    (
-                        'layer_2',
-                        deque()
-                    )
-                ],
-                'action_2': [
-                    (
-                        'layer_1',
-                        deque()
-                    ),
-                    (
-                        'layer_2',
-                        deque([{'BAR': 2}, {'FOO': 1}])
-                    )
-                ],
-                'action_3': [('layer_1', deque()), ('layer_2', deque())]
-            }
+            describe_layers(self.manager),
+            [
+                ('layer_1', {'action_1': [{'foo': 1, 'bar': 2}]}, []),
+                ('layer_2', {'action_2': [{'FOO': 1}, {'BAR': 2}]}, []),
+            ]
         )
+        with self.assertRaises(KeyError):
+            self.manager.add_action('action_4')
 
     def test_consume_actions(self):
         self.manager.create_context_layer('test_1')
@@ -85,19 +73,28 @@ class TestActionContextManager(TestCase):
             [('test_2', {'b': 'b'}), ('test_2', {'c': 'c'})]
         )
         self.assertEqual(
-            self.manager.action_context_layers,
-            {
-                'action_1': [('test_1', deque())],
-                'action_2': [('test_1', deque()), ('test_2', deque())],
-                'action_3': [
-                    (
-                        'test_1',
-                        deque([{'a': 'a'}])
-                    ),
-                ]
-            }
+            describe_layers(self.manager),
+            [
+                ('test_1', {'action_3': [{'a': 'a'}]}, []),
+                ('test_2', {}, ['action_1', 'action_3']),
+            ]
+        )
+        # Actions are added to the most recent layer they can be consumed from
+        self.manager.add_action('action_3', d='d')
+        self.assertEqual(
+            list(self.manager.consume_actions('action_3')),
+            [('test_1', {'a': 'a'}), ('test_1', {'d': 'd'})]
         )
 
+    def test_pop_actions_from_layer(self):
+        layer = self.manager.create_context_layer('test_1')
+        self.manager.add_action('action_1', a='a')
+        self.manager.create_context_layer('test_2')
+        self.manager.add_action('action_1', b='b')
+        self.assertEqual(self.manager.pop_actions('action_1', layer), [('test_1', {'a': 'a'})])
+        self.assertEqual(self.manager.pop_actions('action_1', layer), [])
+        self.assertEqual(self.manager.pop_actions('action_1'), [('test_2', {'b': 'b'})])
+
     def test_consume_all_actions(self):
         self.manager.create_context_layer('A')
         self.manager.add_action('action_1', one=1, two=2)
@@ -116,14 +113,21 @@ class TestActionContextManager(TestCase):
             ]
         )
         self.assertEqual(
-            self.manager.action_context_layers,
-            {
-                'action_1': [],
-                'action_2': [('A', deque()), ('B', deque()), ('C', deque())],
-                'action_3': [('A', deque()), ('B', deque()), ('C', deque())]
-            }
+            describe_layers(self.manager),
+            [
+                ('A', {}, ['action_1']),
+                ('B', {}, ['action_1']),
+                ('C', {}, ['action_1']),
+            ]
         )
 
+    def test_consumed_layers_discarded(self):
+        self.manager.create_context_layer('A')
+        self.manager.create_context_layer('B')
+        for action_name in ['action_1', 'action_2', 'action_3']:
+            self.manager.pop_actions(action_name)
+        self.assertEqual(describe_layers(self.manager), [('A', {}, [])])
+
 
 class TestSettingsManager(TestCase):
 
@@ -167,4 +171,317 @@ class TestSettingsManager(TestCase):
             action_manager.consume_all_actions.assert_called_with('load')
             self.assertEqual(value, action_manager.consume_all_actions.return_value)
 
+    @mock.patch('settings_composer.manager.environment.is_profiling', return_value=True)
+    def test_apply_site_settings_modules(self, is_profiling):
+        self.manager.bind(self.settings)
+
+        def apply_settings_module(module_name):
+            if module_name == 'shared':
+                self.manager.target_settings['HOSTS'] = ['shared']
+            else:
+                # As a clean function modifying a setting in place would
+                self.manager.target_settings['HOSTS'].append(module_name)
+
+        with mock.patch.object(self.manager, 'apply_settings_module', side_effect=apply_settings_module):
+            site_settings = self.manager.apply_site_settings_modules(
+                ['shared'],
+                [('one', ['one']), ('two', ['two'])]
+            )
+        self.assertEqual(site_settings['one']['HOSTS'], ['shared', 'one'])
+        self.assertEqual(site_settings['two']['HOSTS'], ['shared', 'two'])
+        self.assertIsNotNone(self.manager.profile.total_time)
+
     # Further testing of manager occurs within acceptance tests in test_settings
+
+
+class TestSettingsIsolation(TestCase):
+
+    def setUp(self):
+        self.settings = {}
+        self.manager = SettingsManager()
+        self.manager.bind(self.settings)
+        self.manager.create_action_context('test')
+
+    def test_copy_on_first_modification(self):
+        module_settings = {
+            'APPS': ['a'],
+            'DATABASES': {'default': {'NAME': 'main'}, 'backup': {}},
+        }
+        self.manager.update_settings(module_settings, 'module')
+        self.manager.add_action('extend_setting', setting_name='APPS', values=['b'])
+        self.manager.add_action('extend_setting', setting_name='APPS', values=['c'])
+        self.manager.add_action('update_setting', setting_name='DATABASES', values={'other': {}})
+        self.manager.add_action('exclude_from_setting', setting_name='DATABASES', items=['backup'])
+        self.manager.process_standard_actions()
+        self.assertEqual(self.settings['APPS'], ['a', 'b', 'c'])
+        self.assertEqual(self.settings['DATABASES'], {'default': {'NAME': 'main'}, 'other': {}})
+        self.assertEqual(
+            module_settings,
+            {
+                'APPS': ['a'],
+                'DATABASES': {'default': {'NAME': 'main'}, 'backup': {}},
+            }
+        )
+        # Untouched nested values are still shared
+        self.assertIs(self.settings['DATABASES']['default'], module_settings['DATABASES']['default'])
+
+    def test_redefinition_is_shared_again(self):
+        first = ['a']
+        second = ['b']
+        self.manager.update_settings({'APPS': first}, 'module_1')
+        self.manager.add_action('extend_setting', setting_name='APPS', values=['c'])
+        self.manager.process_standard_actions()
+        self.manager.create_action_context('test')
+        self.manager.update_settings({'APPS': second}, 'module_2')
+        self.manager.add_action('extend_setting', setting_name='APPS', values=['d'])
+        self.manager.process_standard_actions()
+        self.assertEqual(self.settings['APPS'], ['b', 'd'])
+        self.assertEqual((first, second), (['a'], ['b']))
+
+
+class TestWorkStack(TestCase):
+
+    def setUp(self):
+        self.settings = {}
+        self.manager = SettingsManager()
+        self.manager.bind(self.settings)
+        self.depth = sys.getrecursionlimit() * 2
+
+    def test_deeply_nested_loads(self):
+        def load_settings_module(module_name, prefetched=None):
+            level = int(module_name.split('_')[1])
+            if level < self.depth:
+                self.manager.add_action('load', module_names=['level_{0}'.format(level + 1)])
+            module = types.ModuleType(module_name)
+            module.DEPTH = level
+            return module
+
+        with mock.patch('settings_composer.manager.load_settings_module', load_settings_module):
+            self.manager.apply_settings_module('level_0')
+        # Loaded modules are applied before the module that loads them
+        self.assertEqual(self.settings['DEPTH'], 0)
+        self.assertEqual(len(self.manager.settings_source['DEPTH']), self.depth + 1)
+        self.assertEqual(self.manager.settings_source['DEPTH'][0].split(' ')[0], 'level_{0}'.format(self.depth))
+
+    def test_cyclic_loads(self):
+        loads = {'a': ['b', 'c'], 'b': [], 'c': ['b', 'd'], 'd': ['a']}
+
+        def load_settings_module(module_name, prefetched=None):
+            self.manager.add_action('load', module_names=loads[module_name])
+            return types.ModuleType(module_name)
+
+        with mock.patch('settings_composer.manager.load_settings_module', load_settings_module):
+            # Loading the same module twice is fine, but not from itself
+            with self.assertRaises(ValueError) as context:
+                self.manager.apply_settings_module('a')
+        self.assertIn('Loading a would load it again (a -> c -> d -> a)', str(context.exception))
+
+    def test_cascading_clean_functions(self):
+        def clean(settings):
+            settings['CLEANED'] = settings.get('CLEANED', 0) + 1
+            if settings['CLEANED'] < self.depth:
+                self.manager.add_action('clean', function=clean)
+
+        self.manager.create_action_context('test')
+        self.manager.add_action('clean', function=clean)
+        self.manager.process_clean_actions()
+        self.assertEqual(self.settings['CLEANED'], self.depth)
+
+    def test_clean_order(self):
+        calls = []
+
+        def make_clean(name, *nested):
+            def clean(settings):
+                calls.append(name)
+                for function in nested:
+                    self.manager.add_action('clean', function=function)
+            clean.__name__ = name
+            return clean
+
+        self.manager.create_action_context('A')
+        self.manager.add_action('clean', function=make_clean('a1', make_clean('a1x'), make_clean('a1y')))
+        self.manager.add_action('clean', function=make_clean('a2'))
+        self.manager.create_action_context('B')
+        self.manager.add_action('clean', function=make_clean('b1'))
+        self.manager.process_clean_actions()
+        self.assertEqual(calls, ['b1', 'a1', 'a2', 'a1x', 'a1y'])
+
+
+class TestConditionalLoading(TestCase):
+
+    def setUp(self):
+        self.settings = {}
+        self.manager = SettingsManager()
+        self.manager.bind(self.settings)
+        self.manager.create_action_context('test')
+        patcher = mock.patch('settings_composer.manager.load_settings_module')
+        self.load_settings_module = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_condition(self):
+        self.manager.add_action('set', DEBUG=True)
+        self.manager.process_standard_actions()
+        self.manager.add_action(
+            'load',
+            module_names=['settings.debug_toolbar'],
+            condition=lambda settings: settings['DEBUG']
+        )
+        self.manager.add_action(
+            'load',
+            module_names=['settings.sentry'],
+            condition=lambda settings: not settings['DEBUG']
+        )
+        self.manager.process_load_actions()
+        # Modules are only imported if their condition is met
+        self.load_settings_module.assert_called_once_with('settings.debug_toolbar', None)
+
+    def test_role(self):
+        import settings_composer
+        with mock.patch('settings_composer.settings_manager', self.manager):
+            settings_composer.load_for_role(['worker', 'cron'], 'settings.celery')
+            settings_composer.load_for_role('web', 'settings.web')
+        with mock.patch.dict('os.environ', {'SETTINGS_COMPOSER_ROLE': 'worker'}):
+            self.manager.process_load_actions()
+        self.load_settings_module.assert_called_once_with('settings.celery', None)
+
+    def test_no_role(self):
+        self.assertTrue(has_role('web')({}))
+        with mock.patch.dict('os.environ', {'SETTINGS_COMPOSER_ROLE': 'cron'}):
+            self.assertFalse(has_role('web')({}))
+            self.assertTrue(has_role(['web', 'cron'])({}))
+
+
+class TestCustomActions(TestCase):
+
+    def setUp(self):
+        self.settings = {}
+        self.manager = SettingsManager()
+
+    def tearDown(self):
+        if 'add_hosts' in manager.CUSTOM_ACTION_HANDLERS:
+            unregister_action('add_hosts')
+
+    def add_hosts(self, settings_manager, source_name, hosts):
+        settings_manager.update_settings(
+            {'ALLOWED_HOSTS': settings_manager.target_settings['ALLOWED_HOSTS'] + hosts},
+            source_name
+        )
+
+    def test_register_action(self):
+        register_action('add_hosts', self.add_hosts)
+        self.assertEqual(ACTION_NAMES[-2:], ['add_hosts', 'clean'])
+        self.manager.bind(self.settings)
+        self.manager.create_action_context('test')
+        self.manager.add_action('add_hosts', hosts=['b.example.com'])
+        self.manager.add_action('set', ALLOWED_HOSTS=['a.example.com'])
+        self.manager.process_standard_actions()
+        # Custom actions are processed after the standard actions
+        self.assertEqual(self.settings['ALLOWED_HOSTS'], ['a.example.com', 'b.example.com'])
+        self.assertEqual(self.manager.settings_source['ALLOWED_HOSTS'], ['test', 'test'])
+
+    def test_register_while_bound(self):
+        self.manager.bind(self.settings)
+        register_action('add_hosts', self.add_hosts)
+        self.manager.create_action_context('test')
+        self.manager.add_action('set', ALLOWED_HOSTS=['a.example.com'])
+        self.manager.add_action('add_hosts', hosts=['b.example.com'])
+        self.manager.process_standard_actions()
+        self.assertEqual(self.settings['ALLOWED_HOSTS'], ['a.example.com', 'b.example.com'])
+
+    def test_register_existing_action(self):
+        with self.assertRaises(ValueError):
+            register_action('set', lambda settings_manager, source_name: None)
+
+    def test_unregister_action(self):
+        register_action('add_hosts', self.add_hosts)
+        unregister_action('add_hosts')
+        self.assertNotIn('add_hosts', ACTION_NAMES)
+        self.assertNotIn('add_hosts', manager.STANDARD_ACTION_NAMES)
+        with self.assertRaises(ValueError):
+            unregister_action('add_hosts')
+        with self.assertRaises(ValueError):
+            unregister_action('set')
+
+
+class TestConcurrentCleaning(TestCase):
+
+    def compose(self, clean_threads, functions):
+        settings = {}
+        settings_manager = SettingsManager()
+        with mock.patch.dict('os.environ', {'SETTINGS_COMPOSER_CLEAN_THREADS': clean_threads}):
+            settings_manager.bind(settings)
+        settings_manager.create_action_context('test')
+        settings_manager.update_settings({'MEDIA_ROOT': '/media', 'STATIC_ROOT': '/static', 'DEBUG': False}, 'test')
+        for function, reads, writes in functions:
+            kwargs = {'function': function}
+            if reads is not None:
+                kwargs.update(reads=reads, writes=writes)
+            settings_manager.add_action('clean', **kwargs)
+        with mock.patch('settings_composer.settings_manager', settings_manager):
+            settings_manager.process_clean_actions()
+        settings_manager.unbind()
+        return settings
+
+    def test_matches_serial(self):
+        import settings_composer
+        barrier = threading.Barrier(2, timeout=5)
+
+        def check_media(settings):
+            barrier.wait()  # Only passes if the functions run concurrently
+            settings_composer.set(MEDIA_OK=settings['MEDIA_ROOT'] == '/media')
+
+        def check_static(settings):
+            barrier.wait()
+            settings_composer.extend_setting('ALLOWED_HOSTS', [settings['STATIC_ROOT']])
+
+        def set_hosts(settings):
+            settings_composer.set(ALLOWED_HOSTS=['localhost'])
+
+        def finish(settings):
+            settings_composer.set(CHECKS=[settings['MEDIA_OK'], settings['ALLOWED_HOSTS']])
+
+        functions = [
+            (set_hosts, None, None),
+            (check_media, ['MEDIA_ROOT'], ['MEDIA_OK']),
+            (check_static, ['STATIC_ROOT'], ['ALLOWED_HOSTS']),
+            (finish, ['MEDIA_OK', 'ALLOWED_HOSTS'], ['CHECKS']),
+        ]
+        concurrent_settings = self.compose('2', functions)
+        barrier = mock.Mock()
+        self.assertEqual(concurrent_settings, self.compose('', functions))
+        self.assertEqual(concurrent_settings['CHECKS'], [True, ['localhost', '/static']])
+        self.assertEqual(
+            concurrent_settings['SETTINGS_COMPOSER_SOURCE']['ALLOWED_HOSTS'],
+            ["FUNCTION 'set_hosts' CALLED FROM test EXTENDED BY FUNCTION 'check_static' CALLED FROM test"]
+        )
+
+    def test_isolated_settings(self):
+        settings = {'ALLOWED_HOSTS': ['localhost'], 'DEBUG': False, 'MEDIA_ROOT': '/media'}
+        isolated_settings = IsolatedSettings(settings, lambda settings: None, ['ALLOWED_HOSTS', 'DEBUG'])
+        self.assertEqual(len(isolated_settings), 2)
+        self.assertEqual(sorted(isolated_settings.items()), [('ALLOWED_HOSTS', ['localhost']), ('DEBUG', False)])
+        self.assertEqual(sorted(isolated_settings.values(), key=repr), [False, ['localhost']])
+        # Values read can't be changed in place
+        isolated_settings['ALLOWED_HOSTS'].append('example.com')
+        self.assertEqual(settings['ALLOWED_HOSTS'], ['localhost'])
+
+    def test_undeclared_access(self):
+        import settings_composer
+
+        def read_debug(settings):
+            return settings.get('DEBUG')
+
+        def set_debug(settings):
+            settings_composer.set(DEBUG=True)
+
+        def load_module(settings):
+            settings_composer.load('settings.extra')
+
+        for function, message in [
+            (read_debug, "'read_debug' read DEBUG, which it doesn't declare"),
+            (set_debug, "'set_debug' changed DEBUG, which it doesn't declare"),
+            (load_module, "'load_module' can't add a 'load' action"),
+        ]:
+            with self.assertRaises(ValueError) as context:
+                self.compose('2', [(function, [], []), (lambda settings: None, [], [])])
+            self.assertIn(message, str(context.exception))
@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+import tempfile
+
+from unittest import TestCase
+
+import mock
+
+from settings_composer.matrix import (
+    NOT_SET,
+    SettingsMatrix,
+    build_settings_matrix,
+    parse_condition
+)
+
+
+class TestSettingsMatrix(TestCase):
+
+    def setUp(self):
+        self.matrix = SettingsMatrix()
+        redis = {'default': {'BACKEND': 'redis', 'LOCATION': 'redis://cache'}}
+        self.matrix.add_permutation('site_1', 'production', {'CACHES': redis, 'DEBUG': False})
+        self.matrix.add_permutation('site_2', 'production', {'CACHES': dict(redis), 'DEBUG': False})
+        self.matrix.add_permutation('site_3', 'production', {'CACHES': {'default': {'BACKEND': 'locmem'}}})
+        self.matrix.add_permutation('site_1', 'local', {'CACHES': {'default': {'BACKEND': 'locmem'}}, 'DEBUG': True})
+        self.matrix.add_error('site_4', 'production', ValueError('broken'))
+
+    def test_columns(self):
+        # Equal values are stored once
+        self.assertEqual(self.matrix.columns['CACHES'], [0, 0, 2, 2, -1])
+        self.assertEqual(self.matrix.columns['DEBUG'], [1, 1, -1, 3, -1])
+        self.assertEqual(len(self.matrix.values), 4)
+
+    def test_group_by(self):
+        groups = self.matrix.group_by('CACHES.default.BACKEND', [parse_condition('env=production')])
+        self.assertEqual(groups, [('redis', [0, 1]), ('locmem', [2])])
+        self.assertEqual(
+            self.matrix.group_by('site', [parse_condition('DEBUG=false')]),
+            [('site_1', [0]), ('site_2', [1])]
+        )
+        self.assertEqual(self.matrix.group_by('DEBUG')[1], (NOT_SET, [2]))
+        self.assertEqual(self.matrix.group_by('CACHES.default.0'), [(NOT_SET, [0, 1, 2, 3])])
+
+    def test_values_decoded_once(self):
+        self.matrix.add_permutation('site_2', 'local', {'DEBUG': True, 'ALLOWED_HOSTS': ['*']})
+        self.matrix.add_permutation('site_3', 'local', {'DEBUG': True, 'ALLOWED_HOSTS': ('*',)})
+        with mock.patch('json.loads', side_effect=json.loads) as loads:
+            self.assertEqual(self.matrix.select_rows([('DEBUG', True)]), [3, 5, 6])
+            self.assertEqual(self.matrix.group_by('DEBUG', [('env', 'local')]), [(True, [3, 5, 6])])
+            self.assertEqual(
+                self.matrix.group_by('CACHES.default.BACKEND'),
+                [('redis', [0, 1]), ('locmem', [2, 3]), (NOT_SET, [5, 6])]
+            )
+        # Each distinct value is decoded once, however many rows share it
+        self.assertEqual(sorted(call[0][0] for call in loads.call_args_list), sorted(set(self.matrix.values[:4])))
+        # Values with the same JSON are grouped together
+        self.assertEqual(self.matrix.group_by('ALLOWED_HOSTS', [('env', 'local')]), [(['*'], [5, 6]), (NOT_SET, [3])])
+
+    def test_parse_condition(self):
+        self.assertEqual(parse_condition('DEBUG=true'), ('DEBUG', True))
+        self.assertEqual(parse_condition('env=production'), ('env', 'production'))
+        with self.assertRaises(ValueError):
+            parse_condition('DEBUG')
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'matrix.gz')
+        self.matrix.save(path)
+        matrix = SettingsMatrix.load(path)
+        self.assertEqual(matrix.permutations, self.matrix.permutations)
+        self.assertEqual(matrix.columns, self.matrix.columns)
+        self.assertEqual(matrix.errors, {4: 'broken'})
+        with open(path, 'wb') as matrix_file:
+            matrix_file.write(b'not a matrix')
+        with self.assertRaises(ValueError):
+            SettingsMatrix.load(path)
+
+
+class TestBuildSettingsMatrix(TestCase):
+
+    def test_build(self):
+        matrix = build_settings_matrix('settings_composer.tests.settings')
+        self.assertEqual(len(matrix.permutations), 9)
+        self.assertEqual(matrix.errors, {})
+        self.assertNotIn('SETTINGS_COMPOSER_SOURCE', matrix.columns)
+        groups = matrix.group_by('LOADED_SITE_PRODUCTION_SETTINGS', [('env', 'production')])
+        self.assertEqual(
+            [(value, [matrix.permutations[row][0] for row in rows]) for value, rows in groups],
+            [(NOT_SET, ['', 'other_site']), (True, ['test_site'])]
+        )
@@ -0,0 +1,125 @@
+import types
+
+from unittest import TestCase
+
+import mock
+
+from settings_composer import merging
+from settings_composer.manager import SettingsManager
+
+
+class TestMergeStrategies(TestCase):
+
+    def test_default_extend(self):
+        strategy = merging.MergeStrategy()
+        value = ['a', 'b']
+        self.assertIs(strategy.extend(value, ['b', 'c']), value)
+        self.assertEqual(value, ['a', 'b', 'b', 'c'])
+        self.assertEqual(strategy.extend(('a',), ['b']), ('a', 'b'))
+
+    def test_default_exclude(self):
+        strategy = merging.MergeStrategy()
+        self.assertEqual(strategy.exclude(['a', 'b', 'c'], ['b', 'd']), ['a', 'c'])
+        self.assertEqual(strategy.exclude(('a', 'b'), ['a']), ('b',))
+        self.assertEqual(strategy.exclude({'a': 1, 'b': 2}, ['a', 'c']), {'b': 2})
+        self.assertEqual(strategy.exclude([[1], [2]], [[1]]), [[2]])
+
+    def test_ordered_set_extend(self):
+        strategy = merging.OrderedSetStrategy()
+        self.assertEqual(
+            strategy.extend(['a', 'b'], ['b', 'c', 'a', 'd', 'c']),
+            ['a', 'b', 'c', 'd']
+        )
+        self.assertEqual(strategy.extend(('a',), ('a', 'b')), ('a', 'b'))
+        self.assertEqual(strategy.extend([{'a': 1}], [{'a': 1}, {'b': 2}]), [{'a': 1}, {'b': 2}])
+
+    def test_deep_merge(self):
+        options = {'timeout': 10}
+        test_database = {'NAME': 'test'}
+        databases = {
+            'default': {'NAME': 'main', 'OPTIONS': options},
+            'test': test_database,
+        }
+        merged = merging.DeepMergeStrategy().update(
+            databases,
+            {'default': {'OPTIONS': {'sslmode': 'require'}}}
+        )
+        self.assertEqual(
+            merged,
+            {
+                'default': {'NAME': 'main', 'OPTIONS': {'timeout': 10, 'sslmode': 'require'}},
+                'test': {'NAME': 'test'},
+            }
+        )
+        # The original is left untouched, and unchanged branches are shared
+        self.assertEqual(options, {'timeout': 10})
+        self.assertIs(merged['test'], test_database)
+
+    def test_get_merge_strategy(self):
+        self.assertIsInstance(merging.get_merge_strategy('ordered_set'), merging.OrderedSetStrategy)
+        with self.assertRaises(ValueError):
+            merging.get_merge_strategy('no_such_strategy')
+
+
+class TestManagerMergeStrategies(TestCase):
+
+    def setUp(self):
+        self.settings = {}
+        self.manager = SettingsManager()
+        self.manager.bind(self.settings)
+        self.manager.create_action_context('test')
+
+    def test_extend_with_ordered_set(self):
+        self.manager.update_settings({'INSTALLED_APPS': ('a', 'b')}, 'test')
+        self.manager.set_merge_strategy('INSTALLED_APPS', 'ordered_set')
+        self.manager.add_action('extend_setting', setting_name='INSTALLED_APPS', values=['b', 'c'])
+        self.manager.add_action('extend_setting', setting_name='INSTALLED_APPS', values=['c', 'd'])
+        self.manager.process_standard_actions()
+        self.assertEqual(self.settings['INSTALLED_APPS'], ('a', 'b', 'c', 'd'))
+
+    def test_update_with_deep_merge(self):
+        self.manager.update_settings({'LOGGING': {'loggers': {'django': {'level': 'INFO'}}}}, 'test')
+        self.manager.set_merge_strategy('LOGGING', 'deep_merge')
+        self.manager.add_action(
+            'update_setting',
+            setting_name='LOGGING',
+            values={'loggers': {'django': {'handlers': ['console']}}}
+        )
+        self.manager.process_standard_actions()
+        self.assertEqual(
+            self.settings['LOGGING'],
+            {'loggers': {'django': {'level': 'INFO', 'handlers': ['console']}}}
+        )
+        self.assertEqual(
+            self.manager.settings_source['LOGGING'],
+            ['test UPDATED BY test']
+        )
+
+    def test_runtime_switch(self):
+        def load_settings_module(module_name, prefetched=None):
+            self.manager.add_action('extend_setting', setting_name='INSTALLED_APPS', values=['b', 'c'])
+            self.manager.add_action(
+                'update_setting',
+                setting_name='LOGGING',
+                values={'loggers': {'django': {'handlers': ['console']}}}
+            )
+            return types.ModuleType(module_name)
+
+        self.manager.update_settings(
+            {'INSTALLED_APPS': ['a', 'b'], 'LOGGING': {'loggers': {'django': {'level': 'INFO'}}}},
+            'test'
+        )
+        self.manager.set_merge_strategy('INSTALLED_APPS', 'ordered_set')
+        self.manager.set_merge_strategy('LOGGING', 'deep_merge')
+        self.manager.add_action('create_switch', group_name='logging', switch_name='on', module_or_settings='logging')
+        self.manager.process_standard_actions()
+        self.manager.unbind()
+        # Switches applied at runtime are merged just as they would have been
+        # during composition
+        with mock.patch('settings_composer.manager.load_settings_module', load_settings_module):
+            self.manager.apply_runtime_switch(self.settings, 'logging', 'on')
+        self.assertEqual(self.settings['INSTALLED_APPS'], ['a', 'b', 'c'])
+        self.assertEqual(
+            self.settings['LOGGING'],
+            {'loggers': {'django': {'level': 'INFO', 'handlers': ['console']}}}
+        )
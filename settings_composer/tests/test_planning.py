@@ -0,0 +1,123 @@
+from unittest import TestCase
+
+import mock
+
+from settings_composer import constants, planning
+from settings_composer.helpers import content_hash
+from settings_composer.switches import SwitchDelta
+
+
+def make_index(effects):
+    index = planning.SwitchEffectIndex()
+    for (group_name, switch_name), (reads, writes) in effects.items():
+        delta = SwitchDelta(group_name, switch_name, 'test')
+        delta.reads = set(reads)
+        delta.before = dict((name, None) for name in writes)
+        index.add_delta(delta)
+    return index
+
+
+class TestSwitchPlanning(TestCase):
+
+    def setUp(self):
+        self.index = make_index({
+            ('debug', 'on'): ([], ['DEBUG']),
+            ('debug', 'off'): ([], ['DEBUG']),
+            ('toolbar', 'on'): (['INSTALLED_APPS'], ['INSTALLED_APPS']),
+            ('toolbar', 'off'): ([], []),
+            ('apps', 'minimal'): ([], ['INSTALLED_APPS']),
+            ('apps', 'full'): ([], ['INSTALLED_APPS']),
+            ('apps', 'extra'): ([], ['INSTALLED_APPS']),
+            ('cache', 'memory'): ([], ['CACHES']),
+            ('cache', 'redis'): ([], ['CACHES']),
+        })
+
+    def test_interacting_groups(self):
+        self.assertEqual(
+            self.index.get_interacting_groups(),
+            [['apps', 'toolbar'], ['cache'], ['debug']]
+        )
+
+    def test_interaction_through_clean_functions(self):
+        index = make_index({
+            ('debug', 'on'): ([], ['DEBUG']),
+            ('logging', 'verbose'): ([], ['LOGGING']),
+            ('cache', 'redis'): ([], ['CACHES']),
+        })
+        # Sets LOGGING according to DEBUG
+        index.add_clean_effects([(('DEBUG',), ('LOGGING',))])
+        self.assertEqual(index.get_interacting_groups(), [['cache'], ['debug', 'logging']])
+        # Clean functions that don't declare their effects could combine anything
+        index.add_clean_effects([(None, None)])
+        self.assertEqual(index.get_interacting_groups(), [['cache', 'debug', 'logging']])
+
+    def test_plan_switch_combinations(self):
+        combinations = planning.plan_switch_combinations(self.index)
+        # apps x toolbar is the largest set of interacting choices
+        self.assertEqual(len(combinations), 6)
+        self.assertEqual(
+            sorted((c['apps'], c['toolbar']) for c in combinations),
+            sorted(
+                (apps, toolbar)
+                for apps in ('minimal', 'full', 'extra')
+                for toolbar in ('on', 'off')
+            )
+        )
+        self.assertEqual(set(c['cache'] for c in combinations), set(['memory', 'redis']))
+        self.assertEqual(set(c['debug'] for c in combinations), set(['on', 'off']))
+
+    def test_plan_selected_groups(self):
+        self.assertEqual(
+            planning.plan_switch_combinations(self.index, ['debug']),
+            [{'debug': 'on'}, {'debug': 'off'}]
+        )
+        self.assertEqual(planning.plan_switch_combinations(self.index, []), [{}])
+
+    def test_dedupe_switch_combinations(self):
+        results = {
+            'a': {'DEBUG': True, 'SETTINGS_COMPOSER_SOURCE': {'DEBUG': ['a']}},
+            'b': {'DEBUG': True, 'SETTINGS_COMPOSER_SOURCE': {'DEBUG': ['b']}},
+            'c': {'DEBUG': False},
+        }
+        unique = planning.dedupe_switch_combinations(
+            [{'x': 'a'}, {'x': 'b'}, {'x': 'c'}],
+            compose=lambda combination: results[combination['x']]
+        )
+        self.assertEqual(
+            unique,
+            [
+                ({'x': 'a'}, content_hash({'DEBUG': True})),
+                ({'x': 'c'}, content_hash({'DEBUG': False})),
+            ]
+        )
+
+    def test_build_switch_effect_index(self):
+        with mock.patch('settings_composer.environment.os') as _os, \
+                mock.patch('settings_composer.planning.os', _os):
+            _os.environ = {
+                constants.SETTINGS_MODULE_VARIABLE_NAME: 'settings_composer.tests.settings',
+                constants.ENV_VARIABLE_NAME: 'production',
+            }
+            index = planning.build_switch_effect_index()
+            combinations = planning.plan_switch_combinations(index)
+            unique = planning.dedupe_switch_combinations(combinations)
+        self.assertEqual(
+            index.writes[('debug', 'off')],
+            set(['DEBUG', 'TEMPLATE_DEBUG', 'DEBUG_PROPAGATE_EXCEPTIONS'])
+        )
+        self.assertEqual(index.writes[('thing', 'on')], set())
+        self.assertEqual(index.get_interacting_groups(), [['debug'], ['thing']])
+        self.assertEqual(len(combinations), 3)
+        self.assertEqual(len(unique), 3)
+
+
+class TestContentHash(TestCase):
+
+    def test_content_hash(self):
+        self.assertEqual(
+            content_hash({'A': [1, 2], 'B': {'x': (1, None)}, 'C': set(['b', 'a'])}),
+            content_hash({'C': set(['a', 'b']), 'B': {'x': (1, None)}, 'A': [1, 2]})
+        )
+        self.assertNotEqual(content_hash([1, 2]), content_hash((1, 2)))
+        self.assertNotEqual(content_hash({'A': 1}), content_hash({'A': True}))
+        self.assertEqual(content_hash(TestCase), content_hash(TestCase))
@@ -0,0 +1,80 @@
+import sys
+import textwrap
+
+from unittest import TestCase
+
+import mock
+
+from settings_composer.loading import collect_settings
+from settings_composer.prefetch import (
+    ModulePrefetcher,
+    get_external_imports,
+    prefetch_module,
+    run_prefetched_module
+)
+
+
+MODULE_NAMES = [
+    'settings_composer.tests.settings',
+    'settings_composer.tests.settings.env.local',
+    'settings_composer.tests.settings.sites.test_site',
+    'settings_composer.tests.settings.sites.test_site.env.local'
+]
+
+
+class TestPrefetch(TestCase):
+
+    def test_external_imports(self):
+        code = compile(textwrap.dedent('''
+            import os.path
+            import json as serialiser
+            from collections import OrderedDict
+            from . import defaults
+            from proj.settings import base
+            import settings_composer
+
+            def clean(settings):
+                import decimal
+        '''), 'settings.py', 'exec')
+        self.assertEqual(
+            get_external_imports(code, 'proj.settings.env'),
+            ['os.path', 'json', 'collections']
+        )
+
+    def test_prefetch_module(self):
+        spec, code = prefetch_module('settings_composer.tests.sample_settings')
+        self.assertEqual(spec.name, 'settings_composer.tests.sample_settings')
+        self.assertIn('THIS_IS_A_SETTING', code.co_names)
+
+    def test_parent_not_imported(self):
+        self.assertNotIn('notimported', sys.modules)
+        self.assertIsNone(prefetch_module('notimported.settings'))
+
+    def test_prefetcher(self):
+        prefetcher = ModulePrefetcher(2)
+        self.addCleanup(prefetcher.close)
+        prefetcher.prefetch(['settings_composer.tests.sample_settings', 'settings_composer.tests.missing'])
+        self.assertIsNotNone(prefetcher.pop('settings_composer.tests.sample_settings'))
+        self.assertIsNone(prefetcher.pop('settings_composer.tests.missing'))
+        self.assertIsNone(prefetcher.pop('settings_composer.tests.sample_settings'))
+
+
+class TestPrefetchedComposition(TestCase):
+
+    @mock.patch('settings_composer.loading.collate_settings_modules')
+    def test_same_as_serial(self, collate_settings_modules):
+        collate_settings_modules.return_value = MODULE_NAMES
+        serial_settings = {}
+        collect_settings(serial_settings)
+        prefetched_settings = {}
+        with mock.patch.dict('os.environ', {'SETTINGS_COMPOSER_PREFETCH_THREADS': '4'}):
+            with mock.patch(
+                'settings_composer.prefetch.run_prefetched_module',
+                wraps=run_prefetched_module
+            ) as run:
+                collect_settings(prefetched_settings)
+        self.assertIn(
+            'settings_composer.tests.settings.cleaning',
+            [call[0][0] for call in run.call_args_list]
+        )
+        self.assertEqual(prefetched_settings, serial_settings)
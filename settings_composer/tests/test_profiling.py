@@ -0,0 +1,105 @@
+import sys
+from unittest import TestCase
+
+import mock
+
+from settings_composer import constants, settings_manager
+from settings_composer.loading import collect_settings
+from settings_composer.profiling import CompositionProfile, deep_sizeof
+
+
+class TestDeepSizeof(TestCase):
+
+    def test_containers(self):
+        items = ['a' * 1000, 'b' * 1000]
+        self.assertEqual(
+            deep_sizeof(items),
+            sys.getsizeof(items) + sum(sys.getsizeof(item) for item in items)
+        )
+        self.assertGreater(deep_sizeof({'LARGE': items}), deep_sizeof(items))
+
+    def test_shared_values_counted_once(self):
+        item = 'a' * 1000
+        self.assertEqual(
+            deep_sizeof([item, item]),
+            sys.getsizeof([item, item]) + sys.getsizeof(item)
+        )
+
+    def test_modules_not_traversed(self):
+        self.assertEqual(deep_sizeof(sys), sys.getsizeof(sys))
+
+
+class TestCompositionProfile(TestCase):
+
+    def setUp(self):
+        self.profile = CompositionProfile()
+
+    @mock.patch('settings_composer.profiling.timer')
+    def test_module_times(self, timer):
+        timer.side_effect = [0.0, 1.0, 3.0, 4.0]
+        self.profile.enter_module('outer')
+        self.profile.enter_module('inner')
+        self.profile.exit_module()
+        self.profile.exit_module()
+        self.assertEqual(
+            self.profile.module_times,
+            [('inner', 2.0, 2.0), ('outer', 4.0, 2.0)]
+        )
+
+    def test_measure_settings(self):
+        self.profile.measure_settings(
+            {'LARGE': 'a' * 1000, 'SMALL': 1, 'SETTINGS_COMPOSER_SOURCE': {}},
+            {'LARGE': ['first', 'last'], 'SMALL': ['first']}
+        )
+        self.assertEqual(sorted(self.profile.setting_sizes), ['LARGE', 'SMALL'])
+        self.assertEqual(self.profile.setting_sizes['LARGE'][1], 'last')
+        self.assertEqual(
+            self.profile.get_source_sizes(),
+            {
+                'last': sys.getsizeof('a' * 1000),
+                'first': sys.getsizeof(1),
+            }
+        )
+
+    def test_check_budgets(self):
+        self.profile.total_time = 2.0
+        self.profile.setting_sizes = {'LARGE': (5000, 'settings'), 'SMALL': (10, 'settings')}
+        self.assertEqual(self.profile.check_budgets(3.0, 10000), [])
+        violations = self.profile.check_budgets(1.0, 1000)
+        self.assertEqual(len(violations), 2)
+        self.assertIn('LARGE', violations[1])
+        self.assertIn('settings', violations[1])
+
+
+class TestProfiledComposition(TestCase):
+
+    @mock.patch('settings_composer.loading.collate_settings_modules')
+    @mock.patch.dict('os.environ', {constants.PROFILE_VARIABLE_NAME: 'true'})
+    def test_profile_kept_after_unbind(self, collate_settings_modules):
+        collate_settings_modules.return_value = [
+            'settings_composer.tests.settings',
+            'settings_composer.tests.settings.env.local',
+        ]
+        settings = {}
+        collect_settings(settings)
+        profile = settings_manager.profile
+        self.assertIsNotNone(profile.total_time)
+        self.assertEqual(
+            [source_name for source_name, inclusive, exclusive in profile.module_times][-1],
+            'settings_composer.tests.settings.env.local'
+        )
+        self.assertIn(
+            'settings_composer.tests.settings.switch_definitions LOADED BY settings_composer.tests.settings',
+            [source_name for source_name, inclusive, exclusive in profile.module_times]
+        )
+        self.assertEqual(
+            profile.setting_sizes['LOADED_LOCAL_SETTINGS'][1],
+            'settings_composer.tests.settings.env.local'
+        )
+
+    @mock.patch('settings_composer.loading.collate_settings_modules')
+    @mock.patch.dict('os.environ', {constants.PROFILE_VARIABLE_NAME: ''})
+    def test_disabled_by_default(self, collate_settings_modules):
+        collate_settings_modules.return_value = ['settings_composer.tests.settings']
+        collect_settings({})
+        self.assertIsNone(settings_manager.profile)
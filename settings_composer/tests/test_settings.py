@@ -94,3 +94,18 @@ class SettingsAcceptanceTests(TestCase):
                 },
             }
         )
+
+    @mock.patch('settings_composer.loading.collate_settings_modules')
+    def test_modules_left_untouched(self, collate_settings_modules):
+        collate_settings_modules.return_value = [
+            'settings_composer.tests.settings',
+            'settings_composer.tests.settings.env.local',
+            'settings_composer.tests.settings.sites.test_site',
+            'settings_composer.tests.settings.sites.test_site.env.local'
+        ]
+        collect_settings(self.settings)
+        from .settings import recursion
+        self.assertEqual(recursion.main.RECURSION, {'LOADED': True})
+        self.assertEqual(recursion.main.RECURSION_TEST_LIST, [1, 2, 3])
+        from . import settings
+        self.assertEqual(settings.STUFF, {'something': 'other thing', 'nothing': 'not a thing'})
@@ -0,0 +1,130 @@
+from unittest import TestCase
+
+import mock
+
+from settings_composer import constants, helpers, sites
+from settings_composer.loading import collect_settings
+
+
+class TestSiteSettingsStore(TestCase):
+
+    def test_store(self):
+        shared_list = ['a']
+        store = sites.SiteSettingsStore({
+            'one': {'SHARED': shared_list, 'EQUAL': {'x': 1}, 'DIFFERENT': 1, 'PARTIAL': True},
+            'two': {'SHARED': shared_list, 'EQUAL': {'x': 1}, 'DIFFERENT': 2},
+            'three': {'SHARED': shared_list, 'EQUAL': {'x': 1}, 'DIFFERENT': 1},
+        })
+        self.assertEqual(sorted(store.common), ['EQUAL', 'SHARED'])
+        self.assertEqual(
+            store.overrides,
+            {
+                'one': {'DIFFERENT': 1, 'PARTIAL': True},
+                'two': {'DIFFERENT': 2},
+                'three': {'DIFFERENT': 1},
+            }
+        )
+        self.assertEqual(
+            store.get_settings('two'),
+            {'SHARED': ['a'], 'EQUAL': {'x': 1}, 'DIFFERENT': 2}
+        )
+
+    def test_proxy(self):
+        proxy = sites.SiteSettingsProxy()
+        with self.assertRaises(AttributeError):
+            proxy.FOO
+        proxy.install(
+            sites.SiteSettingsStore({
+                'one': {'FOO': 1, 'BAR': True},
+                'two': {'FOO': 2, 'BAR': True},
+            }),
+            'one'
+        )
+        self.assertEqual(proxy.FOO, 1)
+        with sites.site('two'):
+            self.assertEqual(proxy.FOO, 2)
+            self.assertTrue(proxy.BAR)
+            with self.assertRaises(AttributeError):
+                proxy.BAZ
+        self.assertEqual(proxy.FOO, 1)
+        with sites.site('three'):
+            with self.assertRaises(AttributeError):
+                proxy.FOO
+
+
+class TestSiteSettingsMiddleware(TestCase):
+
+    def setUp(self):
+        self.store = sites.SiteSettingsStore({
+            'one': {'ALLOWED_HOSTS': ['one.example.com']},
+            'two': {'ALLOWED_HOSTS': ['.two.example.com', '*']},
+        })
+        self.patcher = mock.patch.object(sites, 'settings', sites.SiteSettingsProxy())
+        self.patcher.start()
+        sites.settings.install(self.store, 'one')
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_resolve_site(self):
+        middleware = sites.SiteSettingsMiddleware()
+        request = mock.Mock(META={'HTTP_HOST': 'ONE.example.com:8000'})
+        self.assertEqual(middleware.resolve_site(request), 'one')
+        request = mock.Mock(META={'HTTP_HOST': 'www.two.example.com'})
+        self.assertEqual(middleware.resolve_site(request), 'two')
+        request = mock.Mock(META={'SERVER_NAME': 'unknown.com'})
+        self.assertIsNone(middleware.resolve_site(request))
+
+    def test_call(self):
+        seen_sites = []
+
+        def get_response(request):
+            seen_sites.append(sites.get_current_site())
+            return 'response'
+
+        middleware = sites.SiteSettingsMiddleware(get_response)
+        response = middleware(mock.Mock(META={'HTTP_HOST': 'two.example.com'}))
+        self.assertEqual(response, 'response')
+        self.assertEqual(seen_sites, ['two'])
+        self.assertIsNone(sites.get_current_site())
+
+
+class TestCollectSiteSettings(TestCase):
+
+    def setUp(self):
+        self.environment = {
+            constants.SETTINGS_MODULE_VARIABLE_NAME: 'settings_composer.tests.settings',
+            constants.ENV_VARIABLE_NAME: 'production',
+            constants.SITES_VARIABLE_NAME: 'test_site, other_site',
+        }
+
+    def test_collect_site_settings(self):
+        settings = {}
+        with mock.patch('settings_composer.environment.os') as _os:
+            _os.environ = self.environment
+            with mock.patch(
+                'settings_composer.manager.load_settings_module',
+                wraps=helpers.load_settings_module
+            ) as load_settings_module:
+                collect_settings(settings)
+        loaded_module_names = [call[0][0] for call in load_settings_module.call_args_list]
+        # The shared modules are only loaded once
+        self.assertEqual(loaded_module_names.count('settings_composer.tests.settings'), 1)
+        self.assertEqual(loaded_module_names.count('settings_composer.tests.settings.env.production'), 1)
+
+        # The first site is the default
+        self.assertTrue(settings['LOADED_SITE_PRODUCTION_SETTINGS'])
+        self.assertFalse(settings['DEBUG'])
+        self.assertFalse(sites.settings.DEBUG)
+        with sites.site('other_site'):
+            self.assertTrue(sites.settings.DEBUG)
+            self.assertTrue(sites.settings.LOADED_OTHER_SITE_SETTINGS)
+            with self.assertRaises(AttributeError):
+                sites.settings.LOADED_SITE_PRODUCTION_SETTINGS
+            self.assertEqual(
+                sites.settings.SETTINGS_COMPOSER_SOURCE['LOADED_OTHER_SITE_SETTINGS'],
+                ['settings_composer.tests.settings.sites.other_site']
+            )
+        store = sites.settings._store
+        self.assertIn('STUFF', store.common)
+        self.assertIn('DEBUG', store.overrides['other_site'])
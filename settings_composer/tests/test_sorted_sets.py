@@ -0,0 +1,107 @@
+import io
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+from unittest import TestCase
+
+import mock
+
+from settings_composer.export import export_settings
+from settings_composer.manager import SettingsManager
+from settings_composer.sorted_sets import SortedStringSet
+
+
+class SortedSetTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def make_set(self, items):
+        return SortedStringSet.from_items(items, directory=self.directory)
+
+
+class TestSortedStringSet(SortedSetTestCase):
+
+    def test_membership(self):
+        hosts = self.make_set(['b.example.com', u'\xe9.example.com', 'a.example.com', 'b.example.com'])
+        self.assertEqual(list(hosts), ['a.example.com', 'b.example.com', u'\xe9.example.com'])
+        self.assertEqual(len(hosts), 3)
+        self.assertIn(u'\xe9.example.com', hosts)
+        self.assertNotIn('c.example.com', hosts)
+        self.assertNotIn(None, hosts)
+        self.assertNotIn('a', self.make_set([]))
+
+    def test_merges(self):
+        hosts = self.make_set(['a', 'c', 'e'])
+        self.assertEqual(list(hosts.union(['d', 'a', 'b'])), ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(list(hosts.difference(['c', 'x'])), ['a', 'e'])
+        self.assertEqual(list(hosts), ['a', 'c', 'e'])
+        # Merges that change nothing return the same set
+        self.assertIs(hosts.union([]), hosts)
+        self.assertIs(hosts.difference(['x']), hosts)
+
+    def test_shared_by_content(self):
+        hosts = self.make_set(['a', 'b'])
+        same_hosts = self.make_set(['a']).union(['b'])
+        self.assertEqual(hosts.path, same_hosts.path)
+        self.assertEqual(hosts, same_hosts)
+        self.assertNotEqual(hosts, self.make_set(['a']))
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        self.assertEqual(pickle.loads(pickle.dumps(hosts)).path, hosts.path)
+
+    def test_intermediate_sets_removed(self):
+        hosts = self.make_set(['a'])
+        first = hosts.union(['b'])
+        second = first.union(['c'])
+        third = second.difference(['a'])
+        # Sets produced by merges are deleted once merged again
+        self.assertEqual(sorted(os.listdir(self.directory)), sorted(
+            os.path.basename(path) for path in (hosts.path, third.path)
+        ))
+        self.assertEqual(list(first), ['a', 'b'])
+        restored = pickle.loads(pickle.dumps(first))
+        self.assertEqual(list(restored), ['a', 'b'])
+        self.assertEqual(restored, first)
+
+    def test_default_directory(self):
+        with mock.patch('tempfile.gettempdir', return_value=self.directory):
+            hosts = SortedStringSet.from_items(['a'])
+        self.assertTrue(hosts.path.startswith(self.directory))
+        self.assertEqual(os.stat(hosts.directory).st_mode & 0o077, 0)
+
+    def test_invalid_file(self):
+        path = os.path.join(self.directory, 'invalid.set')
+        with open(path, 'wb') as invalid_file:
+            invalid_file.write(b'\0' * 64)
+        with self.assertRaises(ValueError):
+            SortedStringSet(path)
+
+    def test_export(self):
+        output = io.StringIO()
+        export_settings({'BLOCKED_HOSTS': self.make_set(['b', 'a'])}, output)
+        self.assertEqual(json.loads(output.getvalue()), {'BLOCKED_HOSTS': ['a', 'b']})
+
+
+class TestManagerSortedSets(SortedSetTestCase):
+
+    def test_extend_and_exclude(self):
+        blocked_hosts = self.make_set(['a.example.com', 'b.example.com'])
+        settings = {}
+        manager = SettingsManager()
+        manager.bind(settings)
+        manager.create_action_context('test')
+        manager.update_settings({'BLOCKED_HOSTS': blocked_hosts}, 'base')
+        manager.add_action('extend_setting', setting_name='BLOCKED_HOSTS', values=['c.example.com'])
+        manager.add_action('exclude_from_setting', setting_name='BLOCKED_HOSTS', items=['a.example.com'])
+        manager.process_standard_actions()
+        self.assertIsInstance(settings['BLOCKED_HOSTS'], SortedStringSet)
+        self.assertEqual(list(settings['BLOCKED_HOSTS']), ['b.example.com', 'c.example.com'])
+        self.assertEqual(list(blocked_hosts), ['a.example.com', 'b.example.com'])
+        self.assertEqual(
+            manager.settings_source['BLOCKED_HOSTS'],
+            ['base EXTENDED BY test EXCLUDED WITH test']
+        )
@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+
+from unittest import TestCase
+
+import mock
+
+from settings_composer import stores
+from settings_composer.manager import SettingsManager
+from settings_composer.stores import (
+    HTTPKeyValueStore,
+    KeyValueStore,
+    LocalKeyValueStore,
+    LocalStoreServer,
+    StoreCache,
+    StoreUnavailable,
+    read_store,
+    register_store
+)
+
+
+class StoreTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.store = LocalKeyValueStore({
+            'sites/site_1/ALLOWED_HOSTS': ['site1.example.com'],
+            'sites/site_1/FEATURES': {'search': True},
+        })
+        self.keys = ['sites/site_1/ALLOWED_HOSTS', 'sites/site_1/FEATURES', 'sites/site_1/MISSING']
+        register_store('config', self.store)
+        self.addCleanup(stores.STORES.pop, 'config')
+
+
+class TestReadStore(StoreTestCase):
+
+    def test_conditional_fetch(self):
+        cache = StoreCache(self.directory)
+        values = read_store('config', self.keys, cache)
+        self.assertEqual(values['sites/site_1/ALLOWED_HOSTS'][0], ['site1.example.com'])
+        self.assertNotIn('sites/site_1/MISSING', values)
+        self.store.set('sites/site_1/FEATURES', {'search': False})
+        with mock.patch.object(self.store, 'fetch', wraps=self.store.fetch) as fetch:
+            values = read_store('config', self.keys, cache)
+        # Keys are fetched together, each with the version already held
+        versions, = fetch.call_args[0]
+        self.assertEqual(versions['sites/site_1/ALLOWED_HOSTS'], self.store.versions['sites/site_1/ALLOWED_HOSTS'])
+        self.assertIsNone(versions['sites/site_1/MISSING'])
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(values['sites/site_1/FEATURES'][0], {'search': False})
+
+    def test_unavailable(self):
+        read_store('config', self.keys, StoreCache(self.directory))
+        self.store.available = False
+        # The values last fetched are used, even by a new process
+        values = read_store('config', self.keys, StoreCache(self.directory))
+        self.assertEqual(
+            values['sites/site_1/ALLOWED_HOSTS'],
+            (['site1.example.com'], self.store.versions['sites/site_1/ALLOWED_HOSTS'], True)
+        )
+        with self.assertRaises(Exception) as context:
+            read_store('config', self.keys, StoreCache())
+        self.assertIn('no cached value for sites/site_1/ALLOWED_HOSTS', str(context.exception))
+
+    def test_unknown_store(self):
+        with self.assertRaises(ValueError):
+            read_store('unknown', self.keys, StoreCache())
+
+    def test_default_cache(self):
+        with mock.patch('tempfile.gettempdir', return_value=self.directory), \
+                mock.patch.dict('os.environ', {'SETTINGS_COMPOSER_STORE_CACHE': ''}):
+            cache = stores.get_store_cache()
+        self.assertTrue(cache.directory.startswith(self.directory))
+        self.assertEqual(os.stat(cache.directory).st_mode & 0o077, 0)
+
+    def test_fetch_not_overridden(self):
+        with self.assertRaises(NotImplementedError):
+            KeyValueStore().fetch({})
+
+
+class TestHTTPKeyValueStore(StoreTestCase):
+
+    def setUp(self):
+        super(TestHTTPKeyValueStore, self).setUp()
+        self.server = LocalStoreServer(self.store).start()
+        self.addCleanup(self.server.stop)
+        self.client = HTTPKeyValueStore(self.server.url, batch_size=2)
+
+    def test_fetch(self):
+        results = self.client.fetch(dict((key, None) for key in self.keys))
+        self.assertEqual(results['sites/site_1/FEATURES'][1], {'search': True})
+        self.assertEqual(len(self.server.requests), 2)
+        version = results['sites/site_1/FEATURES'][0]
+        self.assertIs(
+            self.client.fetch({'sites/site_1/FEATURES': version})['sites/site_1/FEATURES'][1],
+            stores.NOT_MODIFIED
+        )
+
+    def test_unavailable(self):
+        self.store.available = False
+        with self.assertRaises(StoreUnavailable):
+            self.client.fetch({'sites/site_1/FEATURES': None})
+
+
+class TestStoreComposition(StoreTestCase):
+
+    def test_load_store(self):
+        import settings_composer
+        settings = {'ALLOWED_HOSTS': ['localhost']}
+        manager = SettingsManager()
+        manager.bind(settings)
+        manager.create_action_context('settings')
+        with mock.patch('settings_composer.settings_manager', manager), \
+                mock.patch.dict('os.environ', {'SETTINGS_COMPOSER_STORE_CACHE': self.directory}):
+            settings_composer.load_store('config', 'ALLOWED_HOSTS', 'MISSING', prefix='sites/site_1/')
+            manager.process_load_actions()
+        self.assertEqual(settings, {'ALLOWED_HOSTS': ['site1.example.com']})
+        self.assertEqual(
+            manager.settings_source['ALLOWED_HOSTS'],
+            [u"STORE 'config' KEY 'sites/site_1/ALLOWED_HOSTS' VERSION '{version}' LOADED BY settings".format(
+                version=self.store.versions['sites/site_1/ALLOWED_HOSTS']
+            )]
+        )
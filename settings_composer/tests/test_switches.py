@@ -0,0 +1,163 @@
+import types
+
+from unittest import TestCase
+
+import mock
+
+import settings_composer
+from settings_composer.loading import collect_settings
+from settings_composer.manager import SettingsManager
+from settings_composer.switches import (
+    MISSING,
+    AttributeSettings,
+    SwitchDelta,
+    SwitchHistory
+)
+
+
+class TestSwitchDelta(TestCase):
+
+    def setUp(self):
+        self.settings = {'FOO': [1, 2], 'BAR': True}
+        self.settings_source = {'FOO': ['module_a'], 'BAR': ['module_b']}
+        self.delta = SwitchDelta('group', 'switch', 'source')
+
+    def test_record(self):
+        self.delta.record_before('FOO', self.settings, self.settings_source)
+        self.delta.record_before('BAZ', self.settings, self.settings_source)
+        self.settings['FOO'].append(3)
+        self.settings['BAZ'] = 'new'
+        self.settings_source['FOO'][-1] += ' EXTENDED BY switch'
+        self.settings_source['BAZ'] = ['switch']
+        # Later changes within the same switch do not replace the prior state
+        self.delta.record_before('FOO', self.settings, self.settings_source)
+        self.delta.record_after(self.settings, self.settings_source)
+        self.assertEqual(
+            self.delta.before,
+            {
+                'FOO': ([1, 2], ['module_a']),
+                'BAZ': (MISSING, []),
+            }
+        )
+        self.assertEqual(
+            self.delta.after,
+            {
+                'FOO': ([1, 2, 3], ['module_a EXTENDED BY switch']),
+                'BAZ': ('new', ['switch']),
+            }
+        )
+
+    def test_inverse_apply(self):
+        self.delta.before = {'FOO': ([1, 2], ['module_a']), 'BAZ': (MISSING, [])}
+        self.delta.after = {'FOO': ([3], ['switch']), 'BAZ': ('new', ['switch'])}
+        self.delta.apply(self.settings, self.settings_source)
+        self.assertEqual(self.settings, {'FOO': [3], 'BAR': True, 'BAZ': 'new'})
+        self.delta.inverse().apply(self.settings, self.settings_source)
+        self.assertEqual(self.settings, {'FOO': [1, 2], 'BAR': True})
+        self.assertEqual(self.settings_source, {'FOO': ['module_a'], 'BAR': ['module_b']})
+
+    def test_apply_attribute_settings(self):
+        settings_object = mock.Mock(spec=[])
+        settings_object.FOO = [1, 2]
+        self.delta.after = {'FOO': ([3], ['switch']), 'BAZ': ('new', ['switch'])}
+        self.delta.apply(settings_object, self.settings_source)
+        self.assertEqual(settings_object.FOO, [3])
+        self.assertEqual(settings_object.BAZ, 'new')
+        self.assertEqual(sorted(AttributeSettings(settings_object).keys()), ['BAZ', 'FOO'])
+
+
+class TestSwitchHistory(TestCase):
+
+    def test_get_last_delta(self):
+        history = SwitchHistory()
+        first = SwitchDelta('debug', 'on', 'a')
+        second = SwitchDelta('debug', 'on', 'b')
+        history.record(first)
+        history.record(second)
+        self.assertIs(history.get_last_delta('debug', 'on'), second)
+        self.assertEqual(history.get_applied_switches(), [('debug', 'on'), ('debug', 'on')])
+        with self.assertRaises(ValueError):
+            history.get_last_delta('debug', 'off')
+
+
+class TestRuntimeSwitches(TestCase):
+
+    def setUp(self):
+        self.settings = {}
+        with mock.patch('settings_composer.loading.collate_settings_modules') as collate_settings_modules:
+            collate_settings_modules.return_value = [
+                'settings_composer.tests.settings',
+                'settings_composer.tests.settings.env.local',
+            ]
+            collect_settings(self.settings)
+
+    def test_composition_records_deltas(self):
+        self.assertEqual(
+            settings_composer.settings_manager.switch_history.get_applied_switches(),
+            [('debug', 'on'), ('thing', 'off')]
+        )
+        delta = settings_composer.settings_manager.switch_history.get_last_delta('debug', 'on')
+        self.assertEqual(
+            sorted(delta.changed_keys),
+            ['DEBUG', 'DEBUG_PROPAGATE_EXCEPTIONS', 'TEMPLATE_DEBUG']
+        )
+
+    def test_apply_and_revert_runtime_switch(self):
+        original_source = list(self.settings['SETTINGS_COMPOSER_SOURCE']['DEBUG'])
+        delta = settings_composer.apply_runtime_switch(self.settings, 'debug', 'propagate')
+        self.assertEqual(
+            sorted(delta.changed_keys),
+            ['DEBUG', 'DEBUG_PROPAGATE_EXCEPTIONS', 'TEMPLATE_DEBUG']
+        )
+        self.assertTrue(self.settings['DEBUG_PROPAGATE_EXCEPTIONS'])
+        self.assertEqual(
+            self.settings['SETTINGS_COMPOSER_SOURCE']['DEBUG'][-1],
+            '[SWITCH <debug: propagate> DEFINED IN settings_composer.tests.settings.switch_definitions '
+            'LOADED BY settings_composer.tests.settings] SET BY [Runtime]'
+        )
+        settings_composer.revert_runtime_switch(self.settings, 'debug', 'propagate')
+        self.assertFalse(self.settings['DEBUG_PROPAGATE_EXCEPTIONS'])
+        self.assertEqual(self.settings['SETTINGS_COMPOSER_SOURCE']['DEBUG'], original_source)
+
+    def test_revert_composition_switch(self):
+        settings_composer.revert_runtime_switch(self.settings, 'debug', 'on')
+        self.assertNotIn('DEBUG', self.settings)
+        self.assertNotIn('DEBUG', self.settings['SETTINGS_COMPOSER_SOURCE'])
+        self.assertTrue(self.settings['LOADED_LOCAL_SETTINGS'])
+
+
+class TestRuntimeSwitchCleaning(TestCase):
+
+    def setUp(self):
+        self.settings = {}
+        self.manager = SettingsManager()
+        self.manager.bind(self.settings)
+        self.manager.create_action_context('test')
+        self.manager.update_settings({'CACHES': {}, 'MIDDLEWARE': ['common'], 'SESSION_ENGINE': 'db'}, 'test')
+        self.manager.add_action('create_switch', group_name='cache', switch_name='on', module_or_settings='cache')
+        self.manager.process_standard_actions()
+        self.manager.unbind()
+
+    def load_settings_module(self, module_name, prefetched=None):
+        def clean(settings):
+            settings['CACHES'] = {'default': {'BACKEND': 'redis'}}
+            del settings['SESSION_ENGINE']
+            self.manager.add_action('extend_setting', setting_name='MIDDLEWARE', values=['cache'])
+
+        self.manager.add_action('clean', function=clean)
+        return types.ModuleType(module_name)
+
+    def test_revert_clean_changes(self):
+        original_settings = dict(self.settings)
+        original_source = dict(
+            (name, list(sources)) for name, sources in self.settings['SETTINGS_COMPOSER_SOURCE'].items()
+        )
+        with mock.patch('settings_composer.manager.load_settings_module', self.load_settings_module):
+            delta = self.manager.apply_runtime_switch(self.settings, 'cache', 'on')
+        # Changes made by the clean functions the switch queued are its own
+        self.assertEqual(sorted(delta.changed_keys), ['CACHES', 'MIDDLEWARE', 'SESSION_ENGINE'])
+        self.assertEqual(self.settings['MIDDLEWARE'], ['common', 'cache'])
+        self.assertNotIn('SESSION_ENGINE', self.settings)
+        self.manager.revert_runtime_switch(self.settings, 'cache', 'on')
+        self.assertEqual(self.settings, original_settings)
+        self.assertEqual(self.settings['SETTINGS_COMPOSER_SOURCE'], original_source)
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import mock
+
+from django.conf import LazySettings
+
+from settings_composer.tracking import (
+    AccessTracker,
+    get_unread_settings,
+    read_access_log
+)
+
+
+class SampleSettings(object):
+    DEBUG = True
+    ALLOWED_HOSTS = ['example.com']
+
+
+@mock.patch('settings_composer.tracking.atexit')
+class TestAccessTracker(TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.log_path = os.path.join(self.path, 'access.json')
+        self.settings = SampleSettings()
+
+    def test_record_reads(self, atexit):
+        tracker = AccessTracker(1, self.log_path)
+        tracker.install(self.settings)
+        self.assertIsInstance(self.settings, SampleSettings)
+        for read in range(2):
+            self.settings.DEBUG
+        self.settings.__class__
+        self.assertEqual(tracker.counts, {'DEBUG': 2})
+        tracker.uninstall()
+        self.assertIs(type(self.settings), SampleSettings)
+        location, = tracker.locations['DEBUG']
+        self.assertEqual(location.split(':')[0], __file__.replace('.pyc', '.py'))
+        atexit.register.assert_called_with(tracker.save)
+
+    def test_sampling(self, atexit):
+        tracker = AccessTracker(0.1, self.log_path)
+        tracker.install(self.settings)
+        for read in range(21):
+            self.settings.DEBUG
+        self.settings.ALLOWED_HOSTS
+        # The first read of each setting is always recorded
+        self.assertEqual(tracker.counts, {'DEBUG': 21, 'ALLOWED_HOSTS': 1})
+
+    def test_django_settings(self, atexit):
+        settings = LazySettings()
+        settings.configure(DEBUG=True)
+        tracker = AccessTracker(1, self.log_path)
+        tracker.install(settings)
+        self.assertIsInstance(settings, LazySettings)
+        self.assertTrue(settings.DEBUG)
+        self.assertTrue(settings.DEBUG)  # Cached by LazySettings
+        self.assertEqual(tracker.counts, {'DEBUG': 2})
+        # Other instances are not tracked
+        other_settings = LazySettings()
+        other_settings.configure(DEBUG=False)
+        self.assertFalse(other_settings.DEBUG)
+        self.assertEqual(tracker.counts, {'DEBUG': 2})
+        self.assertNotIn('__getattribute__', vars(LazySettings))
+        tracker.uninstall()
+        self.assertIs(type(settings), LazySettings)
+        self.assertTrue(settings.DEBUG)
+        self.assertEqual(tracker.counts, {'DEBUG': 2})
+
+    def test_save_aggregates(self, atexit):
+        for worker in range(2):
+            tracker = AccessTracker(1, self.log_path)
+            tracker.install(SampleSettings())
+            tracker.record('DEBUG', mock.Mock(f_code=mock.Mock(co_filename='views.py'), f_lineno=1))
+            tracker.save()
+            tracker.save()
+        self.assertEqual(
+            read_access_log(self.log_path),
+            {'DEBUG': {'count': 2, 'locations': {'views.py:1': 2}}}
+        )
+
+    def test_default_path(self, atexit):
+        with mock.patch('tempfile.gettempdir', return_value=self.path):
+            tracker = AccessTracker(1)
+            tracker.record('DEBUG', mock.Mock(f_code=mock.Mock(co_filename='views.py'), f_lineno=1))
+            tracker.save()
+            self.assertEqual(read_access_log()['DEBUG']['count'], 1)
+        # Kept in a directory only the current user can access
+        self.assertEqual(os.stat(os.path.dirname(tracker.path)).st_mode & 0o077, 0)
+        self.assertEqual(os.path.dirname(os.path.dirname(os.path.dirname(tracker.path))), self.path)
+
+
+class TestUnreadSettings(TestCase):
+
+    def test_grouped_by_source(self):
+        settings = {
+            'DEBUG': True,
+            'LEGACY': 1,
+            'UNUSED': 2,
+            'SETTINGS_COMPOSER_SOURCE': {
+                'DEBUG': ['settings'],
+                'LEGACY': ['settings', 'settings.legacy LOADED BY settings'],
+                'UNUSED': ['settings.legacy LOADED BY settings'],
+            },
+        }
+        self.assertEqual(
+            get_unread_settings(settings, {'DEBUG': {'count': 1, 'locations': {}}}),
+            {'settings.legacy LOADED BY settings': ['LEGACY', 'UNUSED']}
+        )
@@ -0,0 +1,165 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from settings_composer import validation
+from settings_composer.manager import SettingsManager
+from settings_composer.validation import (
+    Setting,
+    ValidationCache,
+    get_validation_errors,
+    validate_settings
+)
+
+
+VALIDATED = []
+
+
+def must_be_positive(value):
+    VALIDATED.append(value)
+    if value <= 0:
+        raise ValueError('must be positive')
+
+
+class TestSetting(TestCase):
+
+    def test_required(self):
+        self.assertEqual(Setting(bool).validate(validation.MISSING), ['is required'])
+        self.assertEqual(Setting(bool, required=False).validate(validation.MISSING), [])
+
+    def test_type(self):
+        self.assertEqual(Setting(bool).validate(True), [])
+        self.assertEqual(Setting(bool).validate('yes'), ['must be bool, not str'])
+        self.assertEqual(Setting((list, tuple)).validate(()), [])
+
+    def test_choices(self):
+        rule = Setting(str, choices=['DEBUG', 'INFO'])
+        self.assertEqual(rule.validate('INFO'), [])
+        self.assertEqual(rule.validate('LOUD'), ["must be one of 'DEBUG', 'INFO', not 'LOUD'"])
+
+    def test_item_type(self):
+        rule = Setting(list, item_type=str)
+        self.assertEqual(rule.validate(['a', 'b']), [])
+        self.assertEqual(rule.validate(['a', 1]), ['must only contain str, not int'])
+        self.assertEqual(Setting(dict, item_type=int).validate({'a': 'b'}), ['must only contain int, not str'])
+
+    def test_validator(self):
+        rule = Setting(int, validator=must_be_positive)
+        self.assertEqual(rule.validate(1), [])
+        self.assertEqual(rule.validate(0), ['must be positive'])
+
+
+class TestValidateSettings(TestCase):
+
+    def setUp(self):
+        self.schema = {
+            'DEBUG': Setting(bool),
+            'LOG_LEVEL': Setting(str, choices=['DEBUG', 'INFO']),
+            'SECRET_KEY': Setting(str),
+            'WORKERS': Setting(int, validator=must_be_positive),
+        }
+        self.settings = {'DEBUG': 'no', 'LOG_LEVEL': 'INFO', 'WORKERS': 4}
+        self.settings_source = {'DEBUG': ['settings', 'settings.env.local']}
+        del VALIDATED[:]
+
+    def test_all_errors_reported(self):
+        self.assertEqual(
+            get_validation_errors(self.settings, self.settings_source, self.schema),
+            [
+                'DEBUG must be bool, not str (set by settings.env.local)',
+                'SECRET_KEY is required',
+            ]
+        )
+        with self.assertRaises(Exception) as context:
+            validate_settings(self.settings, self.settings_source, self.schema)
+        self.assertIn('2 invalid setting(s)', str(context.exception))
+
+    def test_cache(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        cache_path = os.path.join(path, 'validation.json')
+        get_validation_errors(self.settings, self.settings_source, self.schema, ValidationCache(cache_path))
+        # Valid settings are not validated again, even by a new process
+        get_validation_errors(self.settings, self.settings_source, self.schema, ValidationCache(cache_path))
+        self.assertEqual(VALIDATED, [4])
+        # Invalid settings are never cached
+        self.assertEqual(
+            len(get_validation_errors(self.settings, self.settings_source, self.schema, ValidationCache(cache_path))),
+            2
+        )
+        self.settings['WORKERS'] = 0
+        self.assertIn(
+            'WORKERS must be positive',
+            get_validation_errors(self.settings, self.settings_source, self.schema, ValidationCache(cache_path))
+        )
+
+    def test_cache_keys(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        cache = ValidationCache(os.path.join(path, 'validation.json'))
+
+        def get_errors(validator, value=1):
+            return get_validation_errors({'LIMIT': value}, {}, {'LIMIT': Setting(validator=validator)}, cache)
+
+        def check_limit(maximum):
+            def validator(value):
+                if value > maximum:
+                    raise ValueError('must be at most {0}'.format(maximum))
+            return validator
+
+        self.assertEqual(get_errors(lambda value: None), [])
+        # Validators are identified by their code and closure, not just by name
+        with self.assertRaises(Exception):
+            get_errors(lambda value: 1 / 0)
+        self.assertEqual(get_errors(check_limit(1)), [])
+        self.assertEqual(get_errors(check_limit(0)), ['LIMIT must be at most 0'])
+
+        # Values only identified by their repr are never cached
+        class Limit(object):
+            def __gt__(self, other):
+                VALIDATED.append(self)
+                return False
+
+        limit = Limit()
+        get_errors(check_limit(1), limit)
+        get_errors(check_limit(1), limit)
+        self.assertEqual(VALIDATED.count(limit), 2)
+
+
+class TestSchemaComposition(TestCase):
+
+    def setUp(self):
+        self.settings = {}
+        self.manager = SettingsManager()
+        self.manager.bind(self.settings)
+
+    def test_validated_after_clean(self):
+        self.manager.add_schema({'DEBUG': Setting(bool)})
+        self.manager.create_action_context('test')
+        self.manager.add_action('set', DEBUG='yes')
+        self.manager.add_action('clean', function=lambda settings: settings.update(DEBUG=False))
+        self.manager.process_standard_actions()
+        self.manager.process_clean_actions()
+        self.manager.validate_settings()
+        self.manager.add_schema({'MISSING': Setting(bool)})
+        with self.assertRaises(Exception) as context:
+            self.manager.validate_settings()
+        self.assertIn('MISSING is required', str(context.exception))
+
+    def test_validated_after_runtime_switch(self):
+        self.manager.add_schema({'DEBUG': Setting(bool)})
+        self.manager.create_action_context('test')
+        self.manager.add_action('set', DEBUG=False)
+        self.manager.add_action(
+            'create_switch',
+            group_name='debug',
+            switch_name='on',
+            module_or_settings={'DEBUG': 'yes'}
+        )
+        self.manager.process_standard_actions()
+        self.manager.validate_settings()
+        self.manager.unbind()
+        with self.assertRaises(Exception) as context:
+            self.manager.apply_runtime_switch(self.settings, 'debug', 'on')
+        self.assertIn('DEBUG', str(context.exception))
@@ -0,0 +1,161 @@
+import atexit
+import json
+import os
+import sys
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+from . import environment
+from .helpers import get_private_dir
+
+
+def get_default_access_log_path():
+    """
+    Return the access log used when none is configured, which is private to
+    the current user.
+    """
+    return os.path.join(get_private_dir('access'), 'access.json')
+
+
+def set_class(instance, instance_class):
+    # Lazy objects (such as django.conf.settings) proxy __class__ to the object
+    # they wrap, so the class is set through object's own descriptor
+    object.__dict__['__class__'].__set__(instance, instance_class)
+
+
+class AccessTracker(object):
+    """
+    Records which settings are read from a settings object, how often, and
+    from where. The first read of each setting is always recorded, so that
+    unread settings can be found reliably; after that, only one in every
+    sample_interval reads is recorded, and counted as sample_interval reads.
+    """
+
+    def __init__(self, sample_rate, path=None):
+        self.sample_interval = max(1, int(round(1.0 / sample_rate)))
+        self.countdown = self.sample_interval
+        self.path = path or get_default_access_log_path()
+        self.seen = set()
+        self.counts = {}
+        self.locations = {}
+
+    def record(self, name, frame):
+        if name in self.seen:
+            self.countdown -= 1
+            if self.countdown:
+                return
+            self.countdown = self.sample_interval
+            count = self.sample_interval
+        else:
+            self.seen.add(name)
+            count = 1
+        location = u'{0}:{1}'.format(frame.f_code.co_filename, frame.f_lineno)
+        self.counts[name] = self.counts.get(name, 0) + count
+        locations = self.locations.setdefault(name, {})
+        locations[location] = locations.get(location, 0) + count
+
+    def install(self, settings_object):
+        """
+        Start tracking reads of uppercase attributes from a settings object
+        (such as django.conf.settings), by switching it to a subclass of its
+        own class, so that no other object is affected. Counts are saved when
+        the process exits.
+        """
+        tracker = self
+        settings_class = type(settings_object)
+        original_getattribute = settings_class.__getattribute__
+
+        def __getattribute__(self, name):
+            if name.isupper():
+                tracker.record(name, sys._getframe(1))
+            return original_getattribute(self, name)
+
+        self.settings_object = settings_object
+        self.settings_class = settings_class
+        set_class(settings_object, type(
+            settings_class.__name__,
+            (settings_class,),
+            {'__getattribute__': __getattribute__}
+        ))
+        atexit.register(self.save)
+
+    def uninstall(self):
+        """
+        Stop tracking reads, restoring the settings object's own class.
+        """
+        set_class(self.settings_object, self.settings_class)
+        del self.settings_object
+        del self.settings_class
+
+    def save(self):
+        """
+        Add the counts recorded since the last save to those in the access
+        log. The log is locked while it is updated, so that several processes
+        can share it.
+        """
+        if not self.counts:
+            return
+        with open(self.path, 'a+') as log_file:
+            if fcntl is not None:
+                fcntl.flock(log_file, fcntl.LOCK_EX)
+            log_file.seek(0)
+            try:
+                data = json.load(log_file)
+            except ValueError:
+                data = {}
+            for name, count in self.counts.items():
+                entry = data.setdefault(name, {'count': 0, 'locations': {}})
+                entry['count'] += count
+                for location, location_count in self.locations[name].items():
+                    entry['locations'][location] = entry['locations'].get(location, 0) + location_count
+            log_file.seek(0)
+            log_file.truncate()
+            json.dump(data, log_file, indent=1, sort_keys=True)
+            log_file.flush()
+            if fcntl is not None:
+                fcntl.flock(log_file, fcntl.LOCK_UN)
+        self.counts = {}
+        self.locations = {}
+
+
+def install_access_tracker():
+    """
+    Track reads of django.conf.settings if an access sample rate has been set
+    in the environment. Does nothing if Django isn't installed.
+    """
+    sample_rate = environment.get_access_sample_rate()
+    if not sample_rate:
+        return None
+    try:
+        from django.conf import settings
+    except ImportError:
+        return None
+    tracker = AccessTracker(sample_rate, environment.get_access_log_path())
+    tracker.install(settings)
+    return tracker
+
+
+def read_access_log(path=None):
+    try:
+        with open(path or get_default_access_log_path()) as log_file:
+            return json.load(log_file)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def get_unread_settings(settings, access_log):
+    """
+    Return the settings that have never been read, grouped by the source of
+    their current value.
+    """
+    settings_source = settings.get('SETTINGS_COMPOSER_SOURCE', {})
+    unread_settings = {}
+    for name in sorted(settings):
+        if name == 'SETTINGS_COMPOSER_SOURCE' or not name.isupper() or name in access_log:
+            continue
+        sources = settings_source.get(name) or ['<UNKNOWN>']
+        unread_settings.setdefault(sources[-1], []).append(name)
+    return unread_settings
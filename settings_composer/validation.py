@@ -0,0 +1,166 @@
+import json
+import os
+
+from . import environment
+from .exceptions import improperly_configured
+from .helpers import content_hash
+
+
+MISSING = object()
+
+
+def _type_names(value_type):
+    if isinstance(value_type, tuple):
+        return u' or '.join(item_type.__name__ for item_type in value_type)
+    return value_type.__name__
+
+
+class Setting(object):
+    """
+    Describes a valid value for a setting: its type, whether it is required,
+    the values it is allowed to take, the type of its items (for lists,
+    tuples, sets and dictionary values) and any further validator. Validators
+    are called with the value, and raise ValueError if it is invalid.
+    """
+
+    def __init__(self, value_type=None, required=True, choices=None, item_type=None, validator=None):
+        self.value_type = value_type
+        self.required = required
+        self.choices = choices
+        self.item_type = item_type
+        self.validator = validator
+
+    def validate(self, value):
+        """
+        Return a list of messages describing what is wrong with the value.
+        """
+        if value is MISSING:
+            return [u"is required"] if self.required else []
+        if self.value_type is not None and not isinstance(value, self.value_type):
+            return [u"must be {expected}, not {actual}".format(
+                expected=_type_names(self.value_type),
+                actual=type(value).__name__
+            )]
+        errors = []
+        if self.choices is not None and value not in self.choices:
+            errors.append(u"must be one of {choices}, not {value!r}".format(
+                choices=u', '.join(repr(choice) for choice in self.choices),
+                value=value
+            ))
+        if self.item_type is not None:
+            items = value.values() if hasattr(value, 'keys') else value
+            for item in items:
+                if not isinstance(item, self.item_type):
+                    errors.append(u"must only contain {expected}, not {actual}".format(
+                        expected=_type_names(self.item_type),
+                        actual=type(item).__name__
+                    ))
+                    break
+        if self.validator is not None and not errors:
+            try:
+                self.validator(value)
+            except ValueError as error:
+                errors.append(u'{0}'.format(error))
+        return errors
+
+
+class ValidationCache(object):
+    """
+    Remembers the content hash of every setting that has passed validation
+    (together with the rule it was validated against, including the code of
+    its validator), so unchanged settings are not validated again. If a path
+    is given, the cache is persisted there so that it survives restarts.
+    """
+
+    VERSION = 2
+
+    def __init__(self, path=None):
+        self.path = path
+        self.hashes = set()
+        self.changed = False
+        if path and os.path.isfile(path):
+            try:
+                with open(path) as cache_file:
+                    data = json.load(cache_file)
+            except (IOError, OSError, ValueError):
+                data = {}
+            if data.get('version') == self.VERSION:
+                self.hashes = set(data.get('hashes', []))
+
+    def __contains__(self, validation_hash):
+        return validation_hash in self.hashes
+
+    def add(self, validation_hash):
+        if validation_hash not in self.hashes:
+            self.hashes.add(validation_hash)
+            self.changed = True
+
+    def save(self):
+        if self.path and self.changed:
+            temporary_path = self.path + '.tmp'
+            with open(temporary_path, 'w') as cache_file:
+                json.dump({'version': self.VERSION, 'hashes': sorted(self.hashes)}, cache_file)
+            os.rename(temporary_path, self.path)
+            self.changed = False
+
+
+_validation_cache = None
+
+
+def get_validation_cache():
+    global _validation_cache
+    path = environment.get_validation_cache_path()
+    if _validation_cache is None or _validation_cache.path != path:
+        _validation_cache = ValidationCache(path)
+    return _validation_cache
+
+
+def get_validation_errors(settings, settings_source, schema, cache=None):
+    """
+    Validate each setting in the schema, in a single pass. Returns a list of
+    messages, each naming the setting and the source of its value.
+    """
+    errors = []
+    for name in sorted(schema):
+        rule = schema[name]
+        value = settings[name] if name in settings else MISSING
+        validation_hash = None
+        if cache is not None and value is not MISSING:
+            try:
+                validation_hash = content_hash([name, vars(rule), value], strict=True)
+            except (ValueError, RuntimeError):
+                # Settings and rules that can't be identified by their content
+                # (or validators by their code) are always validated
+                validation_hash = None
+            if validation_hash in cache:
+                continue
+        messages = rule.validate(value)
+        if not messages:
+            if validation_hash is not None:
+                cache.add(validation_hash)
+            continue
+        sources = settings_source.get(name)
+        for message in messages:
+            errors.append(u"{name} {message}{source}".format(
+                name=name,
+                message=message,
+                source=u' (set by {0})'.format(sources[-1]) if sources else u''
+            ))
+    if cache is not None:
+        cache.save()
+    return errors
+
+
+def validate_settings(settings, settings_source, schema, cache=None):
+    """
+    Raise ImproperlyConfigured listing every setting that does not match the
+    schema.
+    """
+    errors = get_validation_errors(settings, settings_source, schema, cache)
+    if errors:
+        raise improperly_configured(
+            u"Settings Composer: {count} invalid setting(s):\n  {errors}".format(
+                count=len(errors),
+                errors=u'\n  '.join(errors)
+            )
+        )